@@ -1,5 +1,4 @@
 import streamlit as st
-import tempfile
 import os
 import subprocess
 import sys
@@ -7,8 +6,13 @@ from pytube import YouTube
 import requests
 import traceback
 import time
-from azure_openai import transcribe_audio, summarize_text, azure_text_to_speech
-import base64
+from http_client import get_client
+from jobs import get_job_manager
+from batch import start_batch, get_batch, format_report, BATCH_CONCURRENCY
+from workspace import get_workspace_manager
+from media_server import (MEDIA_BASE_URL, artifact_url, live_stream_url, get_live_stream, get_artifact_store,
+                          start_media_server)
+from transcript_index import load_index, answer_question, format_timestamp
 from yt_dlp import YoutubeDL
 import random
 from components import render_key_features, render_how_it_works
@@ -28,69 +32,30 @@ def is_ffmpeg_installed():
     except (subprocess.CalledProcessError, FileNotFoundError):
         return False
 
-# Audio extraction from YouTube with progress indicator
-def extract_audio_from_youtube(url, progress_bar=None):
-    try:
-        # Remove unnecessary URL parameters
-        url = url.split('&')[0]  
-
-        temp_dir = tempfile.mkdtemp()
-        audio_file_path = os.path.join(temp_dir, '%(title)s.%(ext)s')
+# Queue a pipeline job and remember it in the URL so a refresh or second tab reattaches to it
+def submit_job(source, title, digest=None):
+    job_id = get_job_manager().submit(source, title, digest)
+    st.session_state.source = source
+    st.session_state.podcast_title = title
+    st.session_state.job_id = job_id
+    st.session_state.start_processing = True
+    st.query_params["job"] = job_id
 
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': audio_file_path,
-            'quiet': True,
-            'no_warnings': True,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-        }
 
-        # Update progress
-        if progress_bar:
-            progress_bar.progress(0.2, text="Fetching video information...")
-
-        with YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=False)
-            title = info_dict.get('title', 'Unknown Title')
-            
-            if progress_bar:
-                progress_bar.progress(0.3, text=f"Downloading audio from '{title}'...")
-            
-            info_dict = ydl.extract_info(url, download=True)
-            downloaded_file = ydl.prepare_filename(info_dict).rsplit('.', 1)[0] + ".mp3"
+# Private working directory of this browser session; every rerun renews its lease
+def session_workspace():
+    manager = get_workspace_manager()
+    if not st.session_state.get("workspace"):
+        st.session_state.workspace = manager.create().name
+    return manager.create(st.session_state.workspace)
 
-            if progress_bar:
-                progress_bar.progress(0.6, text="Audio extraction complete")
 
-        if os.path.exists(downloaded_file):
-            return downloaded_file, title
-        else:
-            st.error("Audio extraction failed. File not found.")
-            return None, None
-    except Exception as e:
-        st.error(f"Error extracting audio: {str(e)}")
-        st.error(traceback.format_exc())
-        return None, None
-
-
-# Force delete files (for cleanup)
-def force_delete_file(file_path, retries=5):
-    """
-    Tries to delete the file multiple times, waiting between attempts.
-    """
-    for attempt in range(retries):
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            break  # Exit loop if successful
-        except PermissionError:
-            time.sleep(1)  # Wait 1 second before retrying
-    else:
-        st.warning("Could not delete the file after multiple attempts. It may still be in use.")
+# Hand the session's files to the background sweeper (nothing is deleted in the request path)
+def release_session_workspace():
+    if st.session_state.get("workspace"):
+        get_workspace_manager().create(st.session_state.workspace).release()
+        del st.session_state["workspace"]
+    st.session_state.pop("spooled_uploads", None)
 
 
 # Create loading animation with audio waves
@@ -184,18 +149,42 @@ def show_loading_animation(message="Processing your podcast..."):
     return st.markdown(loading_html, unsafe_allow_html=True)
 
 
+# Start the artifact media server once per process, if browsers can reach it
+# (PODCAST_MEDIA_BASE_URL); otherwise Streamlit's widgets serve the media
+@st.cache_resource
+def get_media_server():
+    if not MEDIA_BASE_URL:
+        return None
+    try:
+        return start_media_server(get_artifact_store())
+    except OSError:
+        # Port taken (e.g. a second app instance); fall back to Streamlit's media handling
+        return None
+
+
+# Local copy of a finished output in the artifact store. The job's workspace, where
+# the pipeline wrote it, is collected once the job has finished.
+def artifact_path(artifact_id):
+    path, _ = get_artifact_store().get(artifact_id)
+    return path
+
+
 # Get a file download link
-def get_download_link(file_path, file_name="summary.mp3"):
-    with open(file_path, "rb") as file:
-        file_bytes = file.read()
-    
-    b64 = base64.b64encode(file_bytes).decode()
-    # Created a proper link that will be styled by our CSS
-    href = f'<a href="data:audio/mp3;base64,{b64}" download="{file_name}" class="podcast-button">Download MP3</a>'
+def get_download_link(artifact_id, file_name="summary.mp3", label="Download MP3"):
+    # Links to the artifact by ID; the file itself is streamed by the media server
+    href = f'<a href="{artifact_url(artifact_id, file_name)}" download="{file_name}" class="podcast-button">{label}</a>'
     
     return href
 
 
+# Player for summary audio that is still being synthesized. Rendered with the same
+# markup into the same slot while processing and on the results page, so playback
+# that started early is not interrupted when the job finishes.
+def render_live_player(slot, stream_id):
+    slot.markdown(f'<audio controls preload="none" src="{live_stream_url(stream_id)}" style="width: 100%;"></audio>',
+                  unsafe_allow_html=True)
+
+
 # Modern upload card UI
 def render_upload_card():
     # Create the card header
@@ -286,8 +275,8 @@ def render_upload_card():
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
-        # Use two columns within the center column to make buttons narrower
-        btn_col1, btn_col2 = st.columns(2)
+        # Use three columns within the center column to make buttons narrower
+        btn_col1, btn_col2, btn_col3 = st.columns(3)
         
         with btn_col1:
             audio_tab_button = st.button("🎵 Audio File", 
@@ -298,12 +287,19 @@ def render_upload_card():
             youtube_tab_button = st.button("🔗 YouTube Link", 
                                            use_container_width=True, 
                                            key="youtube_tab_button")
+        
+        with btn_col3:
+            batch_tab_button = st.button("📚 Batch", 
+                                         use_container_width=True, 
+                                         key="batch_tab_button")
     
     # Handle button clicks to set upload mode
     if audio_tab_button:
         st.session_state.upload_mode = "audio"
     elif youtube_tab_button:
         st.session_state.upload_mode = "youtube"
+    elif batch_tab_button:
+        st.session_state.upload_mode = "batch"
     
     audio_file_path = None
     podcast_title = None
@@ -350,16 +346,22 @@ def render_upload_card():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Save uploaded file
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-                temp_file.write(uploaded_file.getvalue())
-                audio_file_path = temp_file.name
+                # Spool the upload to disk once per distinct file, not on every rerun. The
+                # digest computed while spooling identifies the episode, so it is not hashed again.
+                # Streamlit's uploader already holds the whole file in memory, so peak memory
+                # still grows with the upload size; spooling only keeps the pipeline's copies on disk.
+                spooled = st.session_state.setdefault("spooled_uploads", {})
+                upload_id = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+                audio_file_path, upload_digest = spooled.get(upload_id) or (None, None)
+                if not audio_file_path or not os.path.exists(audio_file_path):
+                    suffix = os.path.splitext(uploaded_file.name)[1] or '.mp3'
+                    audio_file_path, upload_digest = session_workspace().spool("upload", uploaded_file, suffix)
+                    spooled[upload_id] = (audio_file_path, upload_digest)
                 podcast_title = uploaded_file.name.split('.')[0]
                 
                 if st.button("Generate Summary", key="generate_file_summary", use_container_width=True):
                     st.session_state.audio_path = audio_file_path
-                    st.session_state.podcast_title = podcast_title
-                    st.session_state.start_processing = True
+                    submit_job(audio_file_path, podcast_title, upload_digest)
                     st.rerun()
     
     # YouTube Link Upload Tab
@@ -409,20 +411,83 @@ def render_upload_card():
                         pass
                 
                 if st.button("Generate Summary", key="generate_youtube_summary", use_container_width=True):
-                    with st.spinner("Extracting audio from YouTube..."):
-                        progress_bar = st.progress(0.1, text="Starting audio extraction...")
-                        audio_file_path, podcast_title = extract_audio_from_youtube(youtube_url, progress_bar)
-                        progress_bar.progress(1.0, text="Ready for processing")
-                        
-                        if audio_file_path:
-                            st.session_state.audio_path = audio_file_path
-                            st.session_state.podcast_title = podcast_title
-                            st.session_state.start_processing = True
-                            st.rerun()
+                    submit_job(youtube_url, None)
+                    st.rerun()
+    
+    # Batch Tab
+    elif st.session_state.upload_mode == "batch":
+        # Create columns to control width
+        col1, col2, col3 = st.columns([1, 2, 1])
+        
+        with col2:
+            st.markdown("""
+            <div style="text-align: center; margin-bottom: 25px; margin-top: 10px;">
+                <div style="display: inline-block; background-color: rgba(13, 110, 253, 0.1); padding: 8px 16px; border-radius: 20px;">
+                    <span style="color: #0d6efd; font-weight: 500;">Summarize a whole playlist or feed</span>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            st.markdown("Paste a YouTube playlist or channel URL, or a podcast RSS feed")
+            batch_spec = st.text_input(
+                "Playlist or feed URL",
+                placeholder="https://www.youtube.com/playlist?list=...",
+                label_visibility="collapsed"
+            )
+            concurrency = st.slider("Episodes at a time", 1, 8, BATCH_CONCURRENCY)
+            
+            if batch_spec and st.button("Summarize All Episodes", key="generate_batch_summary", use_container_width=True):
+                # Rerunning the same playlist resumes it: finished episodes are skipped
+                st.session_state.batch_dir = start_batch(batch_spec, concurrency=concurrency).output_dir
+                st.rerun()
     
     return audio_file_path, podcast_title
 
 
+# Progress and throughput of a running or finished batch
+def render_batch_progress():
+    st.markdown("<h2 class='centered' style='margin: 2rem 0;'>Batch Summary</h2>", unsafe_allow_html=True)
+    runner = get_batch(st.session_state.batch_dir)
+    
+    if runner is None:
+        st.warning("This batch is no longer running on the server. Start it again to resume where it stopped.")
+    else:
+        report = runner.report()
+        finished = report["done"] + report["failed"] + report["skipped"]
+        st.progress(finished / report["total"] if report["total"] else 0.0, text=format_report(report))
+        
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("Episodes", f"{finished}/{report['total']}")
+        metric_col2.metric("Episodes/hour", f"{report['episodes_per_hour']:.1f}")
+        metric_col3.metric("Audio-minutes/minute", f"{report['audio_minutes_per_minute']:.1f}")
+        
+        if report["error"]:
+            st.error(f"Batch failed: {report['error']}")
+        
+        rows = []
+        for episode in runner.episodes:
+            record = runner.records.get(episode["source"], {})
+            status = record.get("status") or ("running" if episode["source"] in runner.running else "pending")
+            rows.append({"#": episode["index"] + 1, "Episode": record.get("title") or episode["title"] or episode["source"],
+                         "Status": status, "Seconds": round(record.get("seconds") or 0)})
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        
+        if runner.is_running():
+            time.sleep(2)
+            st.rerun()
+        
+        st.markdown(f"Summaries were saved to `{report['output_dir']}`")
+        for episode in runner.episodes:
+            record = runner.records.get(episode["source"], {})
+            if record.get("status") == "done":
+                with st.expander(record["title"]):
+                    with open(record["summary_path"], "r", encoding="utf-8") as f:
+                        st.write(f.read())
+    
+    if st.button("Start Another Batch", use_container_width=True):
+        del st.session_state["batch_dir"]
+        st.rerun()
+
+
 # Main App Layout
 def main():
     # Header Section
@@ -433,8 +498,30 @@ def main():
     if not is_ffmpeg_installed():
         st.warning("⚠️ FFmpeg is not installed. Some features may not work properly. Please contact your administrator to install FFmpeg on this server.")
     
+    # Keep this session's uploads alive while it is in use
+    if st.session_state.get("workspace"):
+        session_workspace()
+    
+    # Reattach to a job referenced in the URL (browser refresh, shared tab)
+    if not st.session_state.get("job_id") and st.query_params.get("job"):
+        job = get_job_manager().status(st.query_params["job"])
+        if job:
+            st.session_state.job_id = job["id"]
+            st.session_state.source = job["source"]
+            st.session_state.podcast_title = job["title"]
+            st.session_state.start_processing = True
+        else:
+            st.warning("The summary job in this link could not be found. Please start a new one.")
+            del st.query_params["job"]
+    
+    # Slot of the live summary player, placed ahead of the processing and results views
+    live_player = st.empty()
+    
     # Check if we should render the upload card or processing/results
-    if not st.session_state.get("audio_path"):
+    if st.session_state.get("batch_dir"):
+        render_batch_progress()
+    
+    elif not st.session_state.get("source"):
         # Render the upload card interface
         audio_file_path, podcast_title = render_upload_card()
     
@@ -442,35 +529,53 @@ def main():
         # Show processing animation with audio waves
         show_loading_animation("AI is processing your podcast...")
         
-        # Start the actual processing
-        try:
-            with st.spinner("Transcribing audio..."):
-                transcript = transcribe_audio(st.session_state.audio_path)
-            
-            with st.spinner("Summarizing transcript..."):
-                summary = summarize_text(transcript)
-                st.session_state.summary_text = summary
+        # Poll the background job instead of computing in the script thread
+        job = get_job_manager().status(st.session_state.job_id)
+        if job is None:
+            # The job is gone (e.g. the jobs database was reset); start over
+            st.error("This summary job could not be found. Please start a new one.")
+            st.query_params.clear()
+            for key in ["source", "job_id", "live_stream_id", "start_processing"]:
+                st.session_state.pop(key, None)
+            st.stop()
+        
+        st.progress(job["progress"], text=job["message"])
+        
+        # The first paragraphs can be played while the rest of the summary is produced
+        if job.get("live_stream_id") and get_media_server():
+            st.session_state.live_stream_id = job["live_stream_id"]
+            render_live_player(live_player, job["live_stream_id"])
+            st.caption("▶ The summary audio is ready to play; the rest is still being generated.")
+        
+        if job["status"] in ("queued", "running"):
+            time.sleep(1)
+            st.rerun()
+        elif job["status"] == "failed":
+            st.error(f"An error occurred: {job['message']}")
+            st.error(job["error"])
+            st.session_state.start_processing = False
+        else:
+            result = job["result"]
+            st.session_state.audio_path = result["audio_path"]
+            st.session_state.podcast_title = result["title"]
+            st.session_state.summary_text = result["summary"]
+            st.session_state.summary_stats = result["summary_stats"]
+            st.session_state.key_points = result["key_points"]
+            st.session_state.run_trace = result["trace"]
+            st.session_state.index_key = result["index_key"]
+            st.session_state.extra_outputs = result["outputs"]
+            st.session_state.preprocess_report = result["preprocess"]
+            st.session_state.transcript_source = result["transcript_source"]
+            st.session_state.audio_summary_path = result["audio_summary_path"]
+            st.session_state.audio_artifact_id = result["audio_artifact_id"]
+            st.session_state.text_artifact_id = result["text_artifact_id"]
             
-            with st.spinner("Converting summary to speech..."):
-                try:
-                    audio_summary_path = azure_text_to_speech(summary)
-                    st.session_state.audio_summary_path = audio_summary_path
-                except Exception as e:
-                    st.error(f"Error converting summary to speech: {str(e)}")
-                    st.error("This is likely due to missing FFmpeg. The text summary will still be available.")
-                    # Create a temporary file with the summary as text for download
-                    temp_text_file = tempfile.NamedTemporaryFile(delete=False, suffix='.txt')
-                    temp_text_file.write(summary.encode('utf-8'))
-                    temp_text_file.close()
-                    st.session_state.text_summary_path = temp_text_file.name
+            if result["tts_error"]:
+                st.error(f"Error converting summary to speech: {result['tts_error']}")
+                st.error("This is likely due to missing FFmpeg. The text summary will still be available.")
             
             st.session_state.start_processing = False
             st.rerun()
-            
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            st.error(traceback.format_exc())
-            st.session_state.start_processing = False
     
     elif st.session_state.get("summary_text"):
         # Show results section with minimal UI
@@ -479,24 +584,112 @@ def main():
         # Title only
         st.markdown(f"<h3 style='text-align: center; color: #0d6efd;'>{st.session_state.podcast_title}</h3>", unsafe_allow_html=True)
         
+        # Key points come back with the summary in structured mood mode
+        if st.session_state.get("key_points"):
+            st.markdown("### Key Points")
+            st.markdown("\n".join(f"- {point}" for point in st.session_state.key_points))
+        
+        # Follow-up questions are answered from the transcript index, not by summarizing again
+        if st.session_state.get("index_key"):
+            with st.expander("Ask about this episode"):
+                question = st.text_input("Question", key="episode_question",
+                                         placeholder="What did they say about ...?")
+                if st.button("Ask", key="ask_episode") and question.strip():
+                    index = load_index(st.session_state.index_key)
+                    if index is None:
+                        st.warning("The transcript index has expired; summarize the episode again to ask questions.")
+                    else:
+                        try:
+                            with st.spinner("Searching the transcript..."):
+                                st.session_state.episode_answer = answer_question(index, question)
+                        except Exception as e:
+                            st.error(f"Could not answer the question: {e}")
+                answer = st.session_state.get("episode_answer")
+                if answer:
+                    st.write(answer["answer"])
+                    if answer["passages"]:
+                        st.caption("From the transcript at " + ", ".join(
+                            f"{format_timestamp(passage['start'])}–{format_timestamp(passage['end'])}"
+                            for passage in answer["passages"]))
+        
+        # Other lengths and formats produced by the same run (PODCAST_OUTPUTS)
+        for name, output in (st.session_state.get("extra_outputs") or {}).items():
+            with st.expander(f"Summary: {name}"):
+                if output.get("error"):
+                    st.warning(f"Could not produce this output: {output['error']}")
+                    continue
+                # Like the main summary: a media server URL, so reruns do not re-read the MP3
+                if get_media_server() and output.get("audio_artifact_id"):
+                    st.markdown(f'<audio controls preload="metadata" src="{artifact_url(output["audio_artifact_id"])}" '
+                                f'style="width: 100%;"></audio>', unsafe_allow_html=True)
+                elif output.get("audio_artifact_id") and artifact_path(output["audio_artifact_id"]):
+                    st.audio(artifact_path(output["audio_artifact_id"]), format="audio/mp3")
+                st.markdown(output["text"])
+        
+        # Per-stage summarization timings
+        if st.session_state.get("summary_stats"):
+            stats = st.session_state.summary_stats
+            with st.expander("Processing details"):
+                st.write(f"Transcript segments: {stats['segments']}")
+                st.write(f"Map stage: {stats['map_seconds']:.1f}s")
+                for level, seconds in enumerate(stats["reduce_seconds"], start=1):
+                    st.write(f"Reduce level {level}: {seconds:.1f}s")
+                compaction = stats.get("compaction")
+                if compaction:
+                    st.write(f"Transcript compacted: {compaction['tokens_before']:,} → {compaction['tokens_after']:,} tokens "
+                             f"({compaction['reduction']:.0%} fewer input tokens)")
+                source = st.session_state.get("transcript_source")
+                if source and source["kind"] == "captions":
+                    kind = "automatic captions" if source["automatic"] else "subtitles"
+                    st.write(f"Transcript: the video's {source['language']} {kind} (no audio transcribed)")
+                report = st.session_state.get("preprocess_report")
+                if report:
+                    st.write(f"Audio optimized for upload: {report['bytes_in'] / 1e6:.1f} MB → "
+                             f"{report['bytes_out'] / 1e6:.1f} MB "
+                             f"({report['upload_speedup']:.1f}x faster upload, {report['seconds']:.1f}s to convert)")
+                trace = st.session_state.get("run_trace")
+                if trace:
+                    st.write(f"Stage timings (total {trace['seconds']:.1f}s):")
+                    st.dataframe([{"Stage": stage, "Seconds": round(span["seconds"], 1),
+                                   "Requests": span["requests"], "Retries": span["retries"],
+                                   "API seconds": round(span["api_seconds"], 1),
+                                   "Tokens in": span["tokens_in"], "Tokens out": span["tokens_out"],
+                                   "MB in": round(span["bytes_in"] / 1e6, 2), "MB out": round(span["bytes_out"] / 1e6, 2)}
+                                  for stage, span in trace["stages"].items()],
+                                 hide_index=True, use_container_width=True)
+                http_stats = get_client().snapshot()
+                st.write(f"Azure requests: {http_stats['requests']} "
+                         f"(retries: {http_stats['retries']}, throttled: {http_stats['throttles']})")
+        
         # Display text summary if audio conversion failed
         if not st.session_state.get("audio_summary_path") and st.session_state.get("summary_text"):
             st.markdown("### Summary Text")
             st.write(st.session_state.summary_text)
             
             # Text download option
-            if st.session_state.get("text_summary_path"):
-                with open(st.session_state.get("text_summary_path"), "r") as f:
-                    text_content = f.read()
-                text_b64 = base64.b64encode(text_content.encode()).decode()
-                download_text_link = f'<a href="data:text/plain;base64,{text_b64}" download="{st.session_state.podcast_title.replace(" ", "_")}_summary.txt" class="podcast-button">Download Text Summary</a>'
+            text_file_name = f"{st.session_state.podcast_title.replace(' ', '_')}_summary.txt"
+            if st.session_state.get("text_artifact_id") and get_media_server():
+                download_text_link = get_download_link(st.session_state.text_artifact_id, text_file_name,
+                                                       "Download Text Summary")
                 st.markdown(download_text_link, unsafe_allow_html=True)
+            else:
+                st.download_button("Download Text Summary", st.session_state.summary_text,
+                                   file_name=text_file_name, mime="text/plain")
         
-        # Use Streamlit's built-in audio player if available
+        # Stream the audio from the media server; nothing is read or encoded on rerun
         if st.session_state.get("audio_summary_path"):
-            with open(st.session_state.audio_summary_path, "rb") as audio_file:
-                audio_bytes = audio_file.read()
-            st.audio(audio_bytes, format="audio/mp3")
+            media_server = get_media_server()
+            audio_file_path = artifact_path(st.session_state.get("audio_artifact_id"))
+            live_stream_id = st.session_state.get("live_stream_id")
+            if media_server and live_stream_id and get_live_stream(live_stream_id):
+                render_live_player(live_player, live_stream_id)
+            elif media_server and st.session_state.get("audio_artifact_id"):
+                st.markdown(f'<audio controls preload="metadata" src="{artifact_url(st.session_state.audio_artifact_id)}" '
+                            f'style="width: 100%;"></audio>', unsafe_allow_html=True)
+            elif audio_file_path:
+                st.audio(audio_file_path, format="audio/mp3")
+            else:
+                st.info("The audio summary is no longer available.")
             
             # Create a container for buttons
             col1, col2, col3 = st.columns([1, 2, 1])
@@ -509,15 +702,11 @@ def main():
                     # Reset button
                     if st.button("Summarize Another Podcast", use_container_width=True):
                         # Clean up files
-                        if st.session_state.get("audio_path"):
-                            force_delete_file(st.session_state.audio_path)
-                        if st.session_state.get("audio_summary_path"):
-                            force_delete_file(st.session_state.audio_summary_path)
-                        if st.session_state.get("text_summary_path"):
-                            force_delete_file(st.session_state.text_summary_path)
+                        release_session_workspace()
                         
                         # Reset session state
-                        for key in ["audio_path", "podcast_title", "summary_text", "audio_summary_path", "text_summary_path", "start_processing"]:
+                        st.query_params.clear()
+                        for key in ["audio_path", "podcast_title", "summary_text", "audio_summary_path", "audio_artifact_id", "text_artifact_id", "summary_stats", "key_points", "run_trace", "index_key", "extra_outputs", "episode_answer", "preprocess_report", "transcript_source", "source", "job_id", "live_stream_id", "start_processing"]:
                             if key in st.session_state:
                                 del st.session_state[key]
                         
@@ -525,38 +714,36 @@ def main():
                 
                 with btn_col2:
                     # Download button
-                    download_link = get_download_link(st.session_state.audio_summary_path, 
-                                f"{st.session_state.podcast_title.replace(' ', '_')}_summary.mp3")
-                    
-                    # Extract base64 data from the download_link
-                    b64_data = download_link.split('base64,')[1].split('"')[0]
-                    
-                    # Style the download button to match Streamlit button
-                    styled_download_link = f"""
-                    <div style="display: flex; justify-content: center; width: 100%;">
-                        <a href="data:audio/mp3;base64,{b64_data}" 
-                           download="{st.session_state.podcast_title.replace(' ', '_')}_summary.mp3" 
-                           style="background-color: #F0F2F6; border: 1px solid rgba(49, 51, 63, 0.2); 
-                                  border-radius: 0.25rem; color: rgb(49, 51, 63); 
-                                  text-decoration: none; padding: 0.25rem 0.75rem;
-                                  font-size: 14px; font-weight: 400; text-align: center;
-                                  display: inline-block; width: 100%; box-sizing: border-box;">
-                            Download MP3
-                        </a>
-                    </div>
-                    """
-                    st.markdown(styled_download_link, unsafe_allow_html=True)
+                    file_name = f"{st.session_state.podcast_title.replace(' ', '_')}_summary.mp3"
+                    if media_server and st.session_state.get("audio_artifact_id"):
+                        # Style the download button to match Streamlit button
+                        styled_download_link = f"""
+                        <div style="display: flex; justify-content: center; width: 100%;">
+                            <a href="{artifact_url(st.session_state.audio_artifact_id, file_name)}" 
+                               download="{file_name}" 
+                               style="background-color: #F0F2F6; border: 1px solid rgba(49, 51, 63, 0.2); 
+                                      border-radius: 0.25rem; color: rgb(49, 51, 63); 
+                                      text-decoration: none; padding: 0.25rem 0.75rem;
+                                      font-size: 14px; font-weight: 400; text-align: center;
+                                      display: inline-block; width: 100%; box-sizing: border-box;">
+                                Download MP3
+                            </a>
+                        </div>
+                        """
+                        st.markdown(styled_download_link, unsafe_allow_html=True)
+                    elif audio_file_path:
+                        with open(audio_file_path, "rb") as audio_file:
+                            st.download_button("Download MP3", audio_file, file_name=file_name,
+                                               mime="audio/mpeg", use_container_width=True)
         else:
             # If no audio, only show the "Summarize Another" button
             if st.button("Summarize Another Podcast", use_container_width=True):
                 # Clean up files
-                if st.session_state.get("audio_path"):
-                    force_delete_file(st.session_state.audio_path)
-                if st.session_state.get("text_summary_path"):
-                    force_delete_file(st.session_state.text_summary_path)
+                release_session_workspace()
                 
                 # Reset session state
-                for key in ["audio_path", "podcast_title", "summary_text", "audio_summary_path", "text_summary_path", "start_processing"]:
+                st.query_params.clear()
+                for key in ["audio_path", "podcast_title", "summary_text", "audio_summary_path", "audio_artifact_id", "text_artifact_id", "summary_stats", "key_points", "run_trace", "index_key", "extra_outputs", "episode_answer", "preprocess_report", "transcript_source", "source", "job_id", "live_stream_id", "start_processing"]:
                     if key in st.session_state:
                         del st.session_state[key]
                 
@@ -573,7 +760,7 @@ if __name__ == "__main__":
         st.session_state.start_processing = False
     
     # Make sure all required state variables are initialized
-    for key in ["audio_path", "podcast_title", "summary_text", "audio_summary_path", "text_summary_path"]:
+    for key in ["source", "audio_path", "podcast_title", "summary_text", "audio_summary_path", "audio_artifact_id", "text_artifact_id", "job_id", "live_stream_id"]:
         if key not in st.session_state:
             st.session_state[key] = None
     
@@ -0,0 +1,78 @@
+import os
+import time
+import subprocess
+import metrics
+
+# Whisper-oriented audio preprocessing.
+# Whisper works on mono 16 kHz audio internally, so anything richer is wasted
+# upload bandwidth. Downmixing, resampling and encoding at a speech bitrate
+# typically shrinks podcast files 5-10x; optionally, long silences are cut too.
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_BITRATE_KBPS = 32
+REMOVE_SILENCE = os.environ.get("PODCAST_REMOVE_SILENCE", "0") == "1"
+SILENCE_THRESHOLD_DB = -40
+MIN_SILENCE_SECONDS = 1.0
+KEEP_SILENCE_SECONDS = 0.3  # pause left in place of each removed silence
+
+
+def silence_filter(threshold_db=SILENCE_THRESHOLD_DB, min_silence=MIN_SILENCE_SECONDS, keep=KEEP_SILENCE_SECONDS):
+    """
+    FFmpeg filter that shortens every silence longer than min_silence to keep seconds.
+    """
+    return (f"silenceremove=stop_periods=-1:stop_duration={min_silence}"
+            f":stop_threshold={threshold_db}dB:stop_silence={keep}")
+
+
+def whisper_encoder_args(remove_silence=REMOVE_SILENCE):
+    """
+    FFmpeg output arguments for mono 16 kHz speech-bitrate MP3.
+    """
+    args = ['-vn', '-ac', '1', '-ar', str(PREPROCESS_SAMPLE_RATE)]
+    if remove_silence:
+        args += ['-af', silence_filter()]
+    return args + ['-c:a', 'libmp3lame', '-b:a', f'{PREPROCESS_BITRATE_KBPS}k']
+
+
+def preprocess_for_whisper(input_path, output_path=None, remove_silence=REMOVE_SILENCE):
+    """
+    Convert input_path to a compact Whisper-friendly MP3.
+
+    Returns (output_path, report) where report holds the byte counts, the
+    bytes saved, the expected upload speedup and the time spent converting.
+    """
+    if output_path is None:
+        output_path = os.path.splitext(input_path)[0] + ".whisper.mp3"
+
+    started = time.perf_counter()
+    cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-i', input_path]
+    cmd += whisper_encoder_args(remove_silence) + [output_path]
+    completed = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Audio preprocessing failed: {completed.stderr.strip()}")
+
+    bytes_in = os.path.getsize(input_path)
+    bytes_out = os.path.getsize(output_path)
+    report = {
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "bytes_saved": bytes_in - bytes_out,
+        # Upload time scales with payload size, so this is the expected transfer speedup
+        "upload_speedup": bytes_in / bytes_out if bytes_out else 0.0,
+        "silence_removed": remove_silence,
+        "seconds": time.perf_counter() - started,
+    }
+    metrics.record(bytes_in=bytes_in, bytes_out=bytes_out)
+    return output_path, report
+
+
+def probe_duration(path):
+    """
+    Duration of an audio file in seconds (via ffprobe), or None if it cannot be read.
+    """
+    completed = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        return float(completed.stdout.strip())
+    except ValueError:
+        return None
@@ -0,0 +1,101 @@
+import subprocess
+import numpy as np
+import mp3
+
+# Leading-silence removal for synthesized summaries.
+# Only the first few seconds are decoded to find where speech starts (frame
+# energy computed with NumPy); the MP3 is then cut on the nearest frame
+# boundary before that point, so the rest of the file is never decoded or
+# re-encoded and nothing is cut when the audio starts with speech.
+# The same frame energies find the quietest point to cut a stream at.
+TRIM_SCAN_SECONDS = 15      # how much of the start is decoded for analysis
+TRIM_SAMPLE_RATE = 16000    # analysis sample rate (mono)
+TRIM_WINDOW_MS = 20         # energy window
+TRIM_THRESHOLD_DB = -45     # windows louder than this (dBFS) count as sound
+TRIM_MIN_SPEECH_MS = 150    # sound must last this long to count as speech onset
+TRIM_KEEP_MS = 150          # lead-in kept before the detected onset
+SPLIT_DECODER_WARMUP_MS = 200  # start of a decoded stream tail that is ignored
+
+
+def decode_head(data, seconds=TRIM_SCAN_SECONDS, sample_rate=TRIM_SAMPLE_RATE):
+    """
+    Decode only the first `seconds` of an MP3 to mono int16 samples.
+    """
+    head = data[:mp3.offset_at(data, seconds * 1000)]
+    completed = subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-f', 'mp3', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'],
+        input=head, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Could not decode audio: {completed.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(completed.stdout, dtype=np.int16)
+
+
+def speech_onset_ms(samples, sample_rate=TRIM_SAMPLE_RATE, window_ms=TRIM_WINDOW_MS,
+                    threshold_db=TRIM_THRESHOLD_DB, min_speech_ms=TRIM_MIN_SPEECH_MS):
+    """
+    Start of the first sustained run of non-silent windows, in ms (0 if none is found).
+    """
+    window = sample_rate * window_ms // 1000
+    count = len(samples) // window
+    if count == 0:
+        return 0
+
+    frames = samples[:count * window].reshape(count, window).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    loud = 20 * np.log10(rms + 1e-10) > threshold_db
+
+    run = max(min_speech_ms // window_ms, 1)
+    sustained = np.convolve(loud.astype(np.int32), np.ones(run, dtype=np.int32), mode="valid") >= run
+    if not sustained.any():
+        return 0
+    return int(np.argmax(sustained)) * window_ms
+
+
+def quietest_ms(samples, sample_rate=TRIM_SAMPLE_RATE, window_ms=TRIM_WINDOW_MS, skip_ms=0):
+    """
+    Middle of the quietest stretch of the samples after skip_ms, in ms: the
+    longest run of windows about as quiet as the quietest one (the latest
+    run on ties). skip_ms if there are no samples.
+    """
+    window = sample_rate * window_ms // 1000
+    skip = skip_ms // window_ms
+    count = len(samples) // window
+    if count <= skip:
+        return skip_ms
+    frames = samples[skip * window:count * window].reshape(count - skip, window).astype(np.float32)
+    energy = np.mean(frames * frames, axis=1)
+    quiet = (energy <= 2 * energy.min() + 1.0).astype(np.int8)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], quiet, [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    best = len(starts) - 1 - int(np.argmax((ends - starts)[::-1]))
+    return (skip * window_ms) + (starts[best] + ends[best]) * window_ms // 2
+
+
+def split_at_pause(data, search_ms):
+    """
+    Split an MP3 on the frame boundary nearest the quietest point of its last
+    search_ms, decoding only that tail. Returns (head, tail) audio frames;
+    audio shorter than twice search_ms is not split.
+    """
+    total_ms = mp3.duration_ms(data)
+    if total_ms <= 2 * search_ms:
+        return mp3.audio_frames(data), b""
+    start = mp3.offset_at(data, max(total_ms - search_ms, 0))
+    tail = data[start:]
+    # A decoder starting mid-stream outputs silence until its bit reservoir fills
+    quiet_ms = quietest_ms(decode_head(tail, seconds=search_ms / 1000.0), skip_ms=SPLIT_DECODER_WARMUP_MS)
+    cut = start + mp3.offset_at(tail, quiet_ms)
+    return mp3.audio_frames(data[:cut]), mp3.audio_frames(data[cut:])
+
+
+def trim_leading_silence(data, keep_ms=TRIM_KEEP_MS):
+    """
+    Remove the non-speech lead-in of an MP3 on a frame boundary.
+
+    Returns (trimmed_bytes, trimmed_ms).
+    """
+    onset = speech_onset_ms(decode_head(data))
+    cut = max(onset - keep_ms, 0)
+    trimmed = mp3.cut_leading(data, cut)
+    return trimmed, mp3.duration_ms(mp3.audio_frames(data)) - mp3.duration_ms(trimmed)
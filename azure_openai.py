@@ -1,132 +1,680 @@
 
 import os
-from dotenv import load_dotenv
-import requests
-import streamlit as st
 import re
-from pydub import AudioSegment
-
-ENDPOINT = st.secrets["AZURE_OPENAI_ENDPOINT"]
-API_KEY = st.secrets["AZURE_OPENAI_API_KEY"]
-DEPLOYMENT = st.secrets["AZURE_OPENAI_DEPLOYMENT"]
-API_VERSION = st.secrets["AZURE_OPENAI_API_VERSION"]
-
-
-headers = {
-    "Content-Type": "application/json",
-    "api-key": API_KEY
-}
+import json
+import shutil
+import uuid
+import tempfile
+import difflib
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import get_config
+from http_client import get_client
+import mp3
+import metrics
+from compaction import count_tokens
+from mood import normalize_mood, classify_mood, MOOD_MODE
+from ssml import SSMLBuilder, format_ssml_text, build_ssml
+from workspace import get_workspace_manager
+
+# Settings come from config.get_config() when a request is made, and heavy
+# dependencies (pydub, NumPy) are imported by the functions that need them,
+# so importing this module needs neither Streamlit nor credentials.
+# Callers pass a workspace path for the files a function writes; without one
+# they go to a scratch workspace of this process, which the workspace sweeper
+# removes WORKSPACE_TTL after its last use.
+_SCRATCH_WORKSPACE = f"scratch-{uuid.uuid4().hex}"
+
+
+def scratch_workspace():
+    """
+    The workspace for files written when the caller did not say where (lease renewed).
+    """
+    return get_workspace_manager().create(_SCRATCH_WORKSPACE)
 
 # GPT-4o Summarization
-def summarize_text(transcript):
-    url = f"{ENDPOINT}openai/deployments/{DEPLOYMENT}/chat/completions?api-version={API_VERSION}"
-    
+# Transcripts that do not fit in one request are summarized map-reduce style:
+# token-budgeted segments are summarized in parallel, then the partial summaries
+# are combined in groups of SUMMARY_FAN_IN until a single final pass remains.
+SUMMARY_MINUTES = 6  # spoken length of the main summary; other lengths are derived (see outputs.py)
+SUMMARY_PROMPT = (f"Summarize the following podcast transcript into key points suitable for a {SUMMARY_MINUTES}-minute "
+                  f"audio summary.")
+SEGMENT_PROMPT = ("You are summarizing part {index} of a podcast transcript. "
+                  "List the key points, arguments and notable examples from this part in concise bullet points.")
+COMBINE_PROMPT = ("The following are summaries of consecutive parts of one podcast. "
+                  "Merge them into a single set of key points, keeping the order of the conversation and removing repetition.")
+# Structured mode asks for the mood and key points in the same (JSON mode) request.
+# The mood comes first so that a streamed reply reveals it before the summary text.
+STRUCTURED_SUMMARY_FORMAT = (" Respond with a JSON object with the keys, in this order, "
+                             "\"mood\" (the overall tone: \"joyful\", \"serious\" or \"neutral\"), "
+                             "\"summary\" (the summary text, paragraphs separated by blank lines) and "
+                             "\"key_points\" (a list of short strings).")
+SUMMARY_SEGMENT_TOKENS = 6000    # transcript tokens per map request
+SUMMARY_SEGMENT_MAX_TOKENS = 500  # completion budget for each partial summary
+SUMMARY_FAN_IN = 8               # partial summaries combined per reduce request
+SUMMARY_MAX_TOKENS = 800         # completion budget for the final summary
+STRUCTURED_SUMMARY_MAX_TOKENS = 1000
+SUMMARY_MAX_WORKERS = 4
+
+
+def chat_completion(system_prompt, user_content, max_tokens, temperature=0.3, json_mode=False):
+    config = get_config()
+    url = config.url(config.deployment, "chat/completions")
+
     payload = {
         "messages": [
-            {"role": "system", "content": "Summarize the following podcast transcript into key points suitable for a 6-minute audio summary."},
-            {"role": "user", "content": transcript}
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
         ],
-        "max_tokens": 800,
-        "temperature": 0.3
+        "max_tokens": max_tokens,
+        "temperature": temperature
     }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = get_client().post(url, headers=config.headers, json=payload)
     response.raise_for_status()
 
-    summary = response.json()["choices"][0]["message"]["content"]
-    return summary
+    data = response.json()
+    usage = data.get("usage") or {}
+    metrics.record(tokens_in=usage.get("prompt_tokens", 0), tokens_out=usage.get("completion_tokens", 0))
+    return data["choices"][0]["message"]["content"]
 
-def detect_mood(summary_text):
+
+def stream_chat_completion(system_prompt, user_content, max_tokens, temperature=0.3, json_mode=False):
     """
-    Analyze the summary and classify the tone as joyful, serious, or neutral.
+    Like chat_completion, but yield the reply piece by piece as it is
+    generated (server-sent events).
     """
-    url = f"{ENDPOINT}openai/deployments/{DEPLOYMENT}/chat/completions?api-version={API_VERSION}"
+    config = get_config()
+    url = config.url(config.deployment, "chat/completions")
 
     payload = {
         "messages": [
-            {"role": "system", "content": "Analyze the tone of the following podcast summary and classify it as one of: 'joyful', 'serious', or 'neutral'."},
-            {"role": "user", "content": summary_text}
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
         ],
-        "max_tokens": 10,
-        "temperature": 0.3
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True
     }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
 
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
+    response = get_client().post(url, headers=config.headers, json=payload, stream=True)
+    pieces, received = [], 0
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            received += len(line) + 1
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            choices = json.loads(data).get("choices")
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                pieces.append(delta)
+                yield delta
+    finally:
+        response.close()
+        # Streamed replies carry no usage; the token counts are estimated locally
+        metrics.record(bytes_in=received, tokens_in=count_tokens(system_prompt) + count_tokens(user_content),
+                       tokens_out=count_tokens("".join(pieces)))
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for English text (about four characters per token).
+    """
+    return len(text) // 4 + 1
+
+
+def _sentences(transcript, max_tokens):
+    for sentence in re.split(r'(?<=[.!?])\s+', transcript.strip()):
+        if estimate_tokens(sentence) <= max_tokens:
+            yield sentence
+            continue
+        # Unpunctuated text (e.g. automatic captions) is cut into runs of words that fit
+        words = sentence.split()
+        step = max(max_tokens * 3 // 4, 1)
+        for start in range(0, len(words), step):
+            yield " ".join(words[start:start + step])
+
+
+def split_transcript(transcript, max_tokens=SUMMARY_SEGMENT_TOKENS):
+    """
+    Split a transcript into segments of at most max_tokens, breaking between sentences.
+    """
+    segments, current, current_tokens = [], [], 0
+    for sentence in _sentences(transcript, max_tokens):
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            segments.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+
+def summarize_segment(segment, index):
+    """
+    Map step: summarize one transcript segment (index is 1-based).
+    """
+    return chat_completion(SEGMENT_PROMPT.format(index=index), segment, SUMMARY_SEGMENT_MAX_TOKENS)
+
+
+def parse_structured_summary(content):
+    """
+    {"summary", "mood", "key_points"} from a JSON-mode reply. If the reply is
+    not the expected JSON it is used as the summary and mood is None.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get("summary"), str):
+        return {"summary": content.strip(), "mood": None, "key_points": []}
+    key_points = data.get("key_points")
+    return {
+        "summary": data["summary"].strip(),
+        "mood": normalize_mood(data.get("mood")),
+        "key_points": [str(point) for point in key_points if point] if isinstance(key_points, list) else [],
+    }
+
+
+_MOOD_FIELD = re.compile(r'"mood"\s*:\s*"([^"\\]*)"')
+_SUMMARY_FIELD = re.compile(r'"summary"\s*:\s*"')
+_STRING_CHARS = re.compile(r'[^"\\]+')
+_HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB]')
+
+
+class StructuredSummaryReader:
+    """
+    Incremental reader of a streamed structured summary: the mood as soon as
+    its value is complete, and the summary text as it is generated.
+    """
+
+    def __init__(self):
+        self.content = ""
+        self.mood = None
+        self._position = None  # next undecoded character of the summary string
+        self._finished = False
+
+    def feed(self, delta):
+        """
+        Add the next piece of the reply; returns the summary text it completes.
+        """
+        self.content += delta
+        if self.mood is None:
+            match = _MOOD_FIELD.search(self.content)
+            if match:
+                self.mood = normalize_mood(match.group(1))
+        if self._position is None:
+            match = _SUMMARY_FIELD.search(self.content)
+            if not match:
+                return ""
+            self._position = match.end()
+
+        content, position, pieces = self.content, self._position, []
+        while not self._finished and position < len(content):
+            run = _STRING_CHARS.match(content, position)
+            if run:
+                pieces.append(run.group())
+                position = run.end()
+            elif content[position] == '"':
+                self._finished = True
+            else:
+                # Escape sequence, decoded once all of it has arrived (surrogate pairs together)
+                length = 2
+                if content.startswith("\\u", position):
+                    length = 12 if _HIGH_SURROGATE.match(content, position) else 6
+                escape = content[position:position + length]
+                if len(escape) < length:
+                    break
+                try:
+                    pieces.append(json.loads(f'"{escape}"'))
+                except ValueError:
+                    pass
+                position += length
+        self._position = position
+        return "".join(pieces)
+
+
+def final_summary(content, structured=False, on_text=None, on_mood=None):
+    """
+    The final summarization request: the summary text, or with structured=True
+    a dict with the summary, its mood and key points from a single JSON-mode call.
+
+    With on_text the reply is streamed: on_text is called with each new piece
+    of summary text as it is generated, and on_mood with the mood as soon as
+    a structured reply contains it.
+    """
+    if on_text is None:
+        if structured:
+            return parse_structured_summary(chat_completion(SUMMARY_PROMPT + STRUCTURED_SUMMARY_FORMAT, content,
+                                                            STRUCTURED_SUMMARY_MAX_TOKENS, json_mode=True))
+        return chat_completion(SUMMARY_PROMPT, content, SUMMARY_MAX_TOKENS)
+
+    if structured:
+        reader = StructuredSummaryReader()
+        for delta in stream_chat_completion(SUMMARY_PROMPT + STRUCTURED_SUMMARY_FORMAT, content,
+                                            STRUCTURED_SUMMARY_MAX_TOKENS, json_mode=True):
+            mood = reader.mood
+            text = reader.feed(delta)
+            if on_mood and mood is None and reader.mood:
+                on_mood(reader.mood)
+            if text:
+                on_text(text)
+        return parse_structured_summary(reader.content)
+
+    pieces = []
+    for delta in stream_chat_completion(SUMMARY_PROMPT, content, SUMMARY_MAX_TOKENS):
+        pieces.append(delta)
+        on_text(delta)
+    return "".join(pieces)
+
+
+def combine_summaries(summaries, fan_in=SUMMARY_FAN_IN, executor=None, stats=None):
+    """
+    Intermediate reduce levels: combine partial summaries in groups of fan_in
+    until at most fan_in remain, which fit in one final request.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("reduce_seconds", [])
+
+    while len(summaries) > fan_in:
+        started = time.perf_counter()
+        groups = ["\n\n".join(summaries[i:i + fan_in]) for i in range(0, len(summaries), fan_in)]
+        combine = lambda group: chat_completion(COMBINE_PROMPT, group, SUMMARY_SEGMENT_MAX_TOKENS)
+        summaries = list(executor.map(metrics.bind(combine), groups) if executor else map(combine, groups))
+        stats["reduce_seconds"].append(time.perf_counter() - started)
+    return summaries
+
+
+def reduce_summaries(summaries, fan_in=SUMMARY_FAN_IN, executor=None, stats=None, structured=False,
+                     on_text=None, on_mood=None):
+    """
+    Reduce step: combine partial summaries level by level into the final script
+    (a dict as returned by final_summary when structured; on_text/on_mood
+    stream the final request, see final_summary).
+    """
+    if stats is None:
+        stats = {}
+    summaries = combine_summaries(summaries, fan_in, executor, stats)
+
+    started = time.perf_counter()
+    summary = final_summary("\n\n".join(summaries), structured, on_text, on_mood)
+    stats["reduce_seconds"].append(time.perf_counter() - started)
+    return summary
+
+
+def summarize_text(transcript, segment_tokens=SUMMARY_SEGMENT_TOKENS, fan_in=SUMMARY_FAN_IN,
+                   max_workers=SUMMARY_MAX_WORKERS, stats=None, structured=False, on_text=None, on_mood=None):
+    """
+    Summarize a transcript of any length into a SUMMARY_MINUTES-minute script. With
+    structured=True the result is a dict with the summary, mood and key points;
+    on_text/on_mood stream the final request (see final_summary).
+
+    If a dict is passed as stats it is filled with the segment count and the
+    wall time of the map stage and of each reduce level.
+    """
+    if stats is None:
+        stats = {}
+
+    segments = split_transcript(transcript, segment_tokens)
+    stats["segments"] = len(segments)
+    stats["reduce_seconds"] = []
+
+    if len(segments) <= 1:
+        started = time.perf_counter()
+        summary = final_summary(transcript, structured, on_text, on_mood)
+        stats["map_seconds"] = 0.0
+        stats["reduce_seconds"].append(time.perf_counter() - started)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        started = time.perf_counter()
+        summaries = list(executor.map(metrics.bind(lambda item: summarize_segment(item[1], item[0] + 1)),
+                                      enumerate(segments)))
+        stats["map_seconds"] = time.perf_counter() - started
+        return reduce_summaries(summaries, fan_in=fan_in, executor=executor, stats=stats, structured=structured,
+                                on_text=on_text, on_mood=on_mood)
+
+def detect_mood(summary_text):
+    """
+    Analyze the summary and classify the tone as joyful, serious, or neutral.
+    """
+    mood = chat_completion(
+        "Analyze the tone of the following podcast summary and classify it as one of: 'joyful', 'serious', or 'neutral'.",
+        summary_text,
+        10
+    )
 
-    mood = response.json()["choices"][0]["message"]["content"].strip().lower()
-    
     # Ensure mood is one of the expected values
-    if mood not in ["joyful", "serious", "neutral"]:
-        mood = "neutral"
+    return normalize_mood(mood) or "neutral"
+
+
+# Embeddings, used by the transcript index (see transcript_index.py)
+EMBEDDING_BATCH = 64  # inputs per request
+
+
+def embed_texts(texts, deployment):
+    """
+    Embedding vectors of texts, in order, from the given embeddings deployment.
+    """
+    config = get_config()
+    url = config.url(deployment, "embeddings")
 
-    return mood
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH):
+        response = get_client().post(url, headers=config.headers, json={"input": texts[start:start + EMBEDDING_BATCH]})
+        response.raise_for_status()
+
+        data = response.json()
+        metrics.record(tokens_in=(data.get("usage") or {}).get("prompt_tokens", 0))
+        vectors.extend(item["embedding"] for item in sorted(data["data"], key=lambda item: item["index"]))
+    return vectors
 
 
 # Whisper Premium Speech-to-Text (Azure-hosted OpenAI)
-def transcribe_audio(audio_file_path):
-    whisper_endpoint = f"{ENDPOINT}openai/deployments/whisper/audio/transcriptions?api-version={API_VERSION}"
-    
+# Long episodes are split into overlapping chunks cut at the quietest point near
+# each boundary, transcribed concurrently and stitched back together in order.
+# With timestamps, Whisper's segments are returned too, shifted to episode time.
+WHISPER_CHUNK_MS = 10 * 60 * 1000   # nominal chunk length (10 min)
+WHISPER_OVERLAP_MS = 5 * 1000       # audio shared by neighbouring chunks
+WHISPER_SEARCH_MS = 20 * 1000       # how far back to look for a quiet cut point
+WHISPER_MAX_WORKERS = 4
+WHISPER_CHUNK_EXPORT = {"format": "mp3", "bitrate": "32k", "parameters": ["-ac", "1", "-ar", "16000"]}
+
+
+def find_quiet_point(audio, start_ms, end_ms, window_ms=100):
+    """
+    Return the position (ms) of the quietest window between start_ms and end_ms.
+    """
+    best_pos, best_rms = end_ms, None
+    for pos in range(max(start_ms, 0), max(end_ms - window_ms, start_ms) + 1, window_ms):
+        rms = audio[pos:pos + window_ms].rms
+        if best_rms is None or rms < best_rms:
+            best_pos, best_rms = pos + window_ms // 2, rms
+    return best_pos
+
+
+def plan_chunks(audio, chunk_ms=WHISPER_CHUNK_MS, overlap_ms=WHISPER_OVERLAP_MS, search_ms=WHISPER_SEARCH_MS):
+    """
+    Split an AudioSegment into (start_ms, end_ms) ranges cut at quiet points.
+    Every chunk except the last extends overlap_ms past its cut point.
+    """
+    total = len(audio)
+    chunks = []
+    start = 0
+    while total - start > chunk_ms:
+        cut = find_quiet_point(audio, start + chunk_ms - search_ms, start + chunk_ms)
+        chunks.append((start, min(cut + overlap_ms, total)))
+        start = cut
+    chunks.append((start, total))
+    return chunks
+
+
+def transcribe_chunk(audio_file_path, endpoint=None, timestamps=False, offset=0.0):
+    """
+    Send a single audio file to the Whisper deployment and return its text.
+    With timestamps, return {"text", "duration", "segments": [{"start", "end",
+    "text"}]} instead, with times in seconds plus offset.
+    """
+    config = get_config()
+    whisper_endpoint = (f"{endpoint or config.endpoint}openai/deployments/whisper/audio/transcriptions"
+                        f"?api-version={config.api_version}")
+
     with open(audio_file_path, "rb") as audio_file:
         files = {'file': audio_file}
         data = {'model': 'whisper'}
+        if timestamps:
+            data['response_format'] = 'verbose_json'
 
-        response = requests.post(whisper_endpoint, headers={"api-key": API_KEY}, files=files, data=data)
+        response = get_client().post(whisper_endpoint, headers={"api-key": config.api_key}, files=files, data=data)
         response.raise_for_status()
 
-        transcript = response.json()["text"]
-        return transcript
-    
+        if not timestamps:
+            return response.json()["text"]
+        reply = response.json()
+        segments = [{"start": round(segment["start"] + offset, 2), "end": round(segment["end"] + offset, 2),
+                     "text": segment["text"].strip()} for segment in reply.get("segments") or []]
+        duration = reply.get("duration") or (segments[-1]["end"] - offset if segments else 0.0)
+        return {"text": reply["text"], "duration": float(duration), "segments": segments}
+
+
+def _normalize_words(words):
+    return [re.sub(r"[^\w']", "", word.lower()) for word in words]
+
+
+def merge_transcripts(texts, max_overlap_words=60, min_match_words=3):
+    """
+    Join chunk transcripts in order, dropping the words repeated at each overlap.
+    """
+    merged = []
+    for text in texts:
+        words = text.split()
+        if merged and words:
+            tail = merged[-max_overlap_words:]
+            head = words[:max_overlap_words]
+            matcher = difflib.SequenceMatcher(None, _normalize_words(tail), _normalize_words(head), autojunk=False)
+            match = matcher.find_longest_match(0, len(tail), 0, len(head))
+            if match.size >= min_match_words:
+                # Keep the earlier chunk up to the shared run, then continue from the later one
+                del merged[len(merged) - len(tail) + match.a:]
+                words = words[match.b:]
+        merged.extend(words)
+    return " ".join(merged)
+
+
+def merge_segments(segments, new_segments, tolerance=0.5):
+    """
+    Append timestamped segments of the next chunk, skipping those that start
+    inside the audio already covered (the overlap between chunks).
+    """
+    covered = segments[-1]["end"] - tolerance if segments else float("-inf")
+    segments.extend(segment for segment in new_segments if segment["start"] >= covered)
+    return segments
 
 
-def format_ssml_text(text):
+def iter_transcript_chunks(audio_file_path, max_workers=WHISPER_MAX_WORKERS, chunk_ms=WHISPER_CHUNK_MS,
+                           overlap_ms=WHISPER_OVERLAP_MS, endpoint=None, work_dir=None, timestamps=False):
     """
-    Convert plain text into SSML by adding pauses and formatting sentences.
+    Yield the transcript of each chunk, in order, as soon as it (and every
+    chunk before it) is ready. Chunks are transcribed by max_workers threads
+    and exported into a directory under work_dir (by default, the scratch
+    workspace). With timestamps, the transcripts are transcribe_chunk() dicts
+    in episode time.
     """
-    # Add a 1-second pause after each sentence for natural flow
-    text = re.sub(r'(\.|\?|!) ', r'\1 <break time="1s"/> ', text)
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(audio_file_path)
+    if len(audio) <= chunk_ms + overlap_ms:
+        yield transcribe_chunk(audio_file_path, endpoint=endpoint, timestamps=timestamps)
+        return
+
+    if work_dir is None:
+        chunk_dir = scratch_workspace().subdir("whisper_chunks_")
+    else:
+        chunk_dir = tempfile.mkdtemp(prefix="whisper_chunks_", dir=work_dir)
+
+    def _transcribe_range(index, start_ms, end_ms):
+        chunk_path = os.path.join(chunk_dir, f"chunk_{index:04d}.mp3")
+        audio[start_ms:end_ms].export(chunk_path, **WHISPER_CHUNK_EXPORT)
+        return transcribe_chunk(chunk_path, endpoint=endpoint, timestamps=timestamps, offset=start_ms / 1000.0)
 
-    # Add slight pauses at commas for better pacing
-    text = text.replace(",", "<break time='500ms'/>")
+    try:
+        ranges = plan_chunks(audio, chunk_ms=chunk_ms, overlap_ms=overlap_ms)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            transcribe_range = metrics.bind(_transcribe_range)
+            futures = [executor.submit(transcribe_range, i, start, end) for i, (start, end) in enumerate(ranges)]
+            for future in futures:
+                yield future.result()
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
 
-    # Add emphasis on important words (optional)
-    text = re.sub(r'\b(important|key|critical|note)\b', r'<emphasis level="strong">\1</emphasis>', text)
 
-    return text
+def iter_transcribe_files(audio_file_paths, max_workers=WHISPER_MAX_WORKERS, endpoint=None, timestamps=False):
+    """
+    Transcribe audio files from an iterable that may still be producing them
+    (e.g. a download in progress), yielding their texts in order. With
+    timestamps, yield transcribe_chunk() dicts, the files taken as consecutive
+    parts of one recording.
+    """
+    futures = queue.Queue()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def feed():
+            try:
+                for path in audio_file_paths:
+                    futures.put(executor.submit(metrics.bind(transcribe_chunk), path, endpoint=endpoint,
+                                                timestamps=timestamps))
+            except BaseException as exc:
+                futures.put(exc)
+            futures.put(None)
+
+        feeder = threading.Thread(target=metrics.bind(feed), daemon=True)
+        feeder.start()
+        offset = 0.0
+        while True:
+            item = futures.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            result = item.result()
+            if timestamps:
+                # Parts are transcribed independently; shift each by the length of those before it
+                for segment in result["segments"]:
+                    segment["start"], segment["end"] = round(segment["start"] + offset, 2), round(segment["end"] + offset, 2)
+                offset += result["duration"]
+            yield result
+        feeder.join()
+
+
+def transcribe_audio(audio_file_path, max_workers=WHISPER_MAX_WORKERS, chunk_ms=WHISPER_CHUNK_MS,
+                     overlap_ms=WHISPER_OVERLAP_MS, endpoint=None):
+    """
+    Transcribe an audio file of any length with Whisper.
+
+    Short files are uploaded as-is; longer ones are chunked and the chunks are
+    transcribed by a pool of max_workers threads.
+    """
+    return merge_transcripts(iter_transcript_chunks(audio_file_path, max_workers=max_workers, chunk_ms=chunk_ms,
+                                                    overlap_ms=overlap_ms, endpoint=endpoint))
+    
 
 
 # Azure Text-to-Speech (TTS) 
+# Long summaries are split at paragraph/sentence boundaries and the parts are
+# synthesized concurrently, then joined frame by frame into one MP3.
+TTS_PART_CHARS = 1200
+TTS_FIRST_PART_CHARS = 200  # a streamed summary's first part is cut early to start audio sooner
+TTS_MAX_WORKERS = 6
+TTS_PART_ATTEMPTS = 3
+
+def voice_for_mood(mood):
+    """
+    Map a detected mood to a (voice, speaking style) pair.
+    """
+    if mood == "joyful":
+        return "shimmer", "cheerful"
+    if mood == "serious":
+        return "onyx", "serious"
+    return "nova", "neutral"
 
-def azure_text_to_speech(text, output_audio_path="summary.mp3"):
-    tts_endpoint = f"{ENDPOINT}openai/deployments/tts/audio/speech?api-version={API_VERSION}"
 
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": API_KEY
-    }
+def split_tts_text(text, max_chars=TTS_PART_CHARS):
+    """
+    Split text into parts of at most max_chars for separate TTS requests.
+    Parts break between paragraphs where possible, otherwise between sentences.
+    """
+    units = []
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            units.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                units.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            units.append(current)
+
+    parts, current = [], ""
+    for unit in units:
+        if current and len(current) + len(unit) + 2 > max_chars:
+            parts.append(current)
+            current = unit
+        else:
+            current = f"{current}\n\n{unit}" if current else unit
+    if current:
+        parts.append(current)
+    return parts
+
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+')
+
+
+class TTSPartSplitter:
+    """
+    split_tts_text for text that is still being generated: feed() returns the
+    parts that are complete, flush() the rest. A part is handed out as soon as
+    its paragraph ends; the first part is cut at a sentence end once
+    first_part_chars have arrived, so synthesis starts before the first paragraph is done.
+    """
 
-    # Detect mood and set expressive voice
-    mood = detect_mood(text)
-    if mood == "joyful":
-        voice = "shimmer"
-        style = "cheerful"
-    elif mood == "serious":
-        voice = "onyx"
-        style = "serious"
-    else:
-        voice = "nova"
-        style = "neutral"
-
-    # Convert text to SSML
-    ssml = f"""<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>
-        <voice name='{voice}'>
-            <mstts:express-as style='{style}'>
-                <prosody rate="medium">
-                    {format_ssml_text(text)}
-                </prosody>
-            </mstts:express-as>
-        </voice>
-    </speak>"""
+    def __init__(self, max_chars=TTS_PART_CHARS, first_part_chars=TTS_FIRST_PART_CHARS):
+        self.max_chars = max_chars
+        self.first_part_chars = first_part_chars
+        self.buffer = ""
+        self.parts = 0
+
+    def _take(self, text):
+        parts = split_tts_text(text, self.max_chars) if text.strip() else []
+        self.parts += len(parts)
+        return parts
+
+    def feed(self, text):
+        self.buffer += text
+        parts = []
+        match = _PARAGRAPH_BREAK.search(self.buffer)
+        while match:
+            parts += self._take(self.buffer[:match.start()])
+            self.buffer = self.buffer[match.end():]
+            match = _PARAGRAPH_BREAK.search(self.buffer)
+
+        # Within an unfinished paragraph, cut at the last sentence end once it is long enough
+        limit = self.max_chars if self.parts else self.first_part_chars
+        if len(self.buffer) >= limit:
+            ends = [end.end() for end in _SENTENCE_END.finditer(self.buffer, 0, self.max_chars)]
+            if ends:
+                parts += self._take(self.buffer[:ends[-1]])
+                self.buffer = self.buffer[ends[-1]:]
+        return parts
+
+    def flush(self):
+        parts, self.buffer = self._take(self.buffer), ""
+        return parts
+
+
+def synthesize_ssml(ssml, voice):
+    """
+    Send one SSML document to the TTS deployment and return the MP3 bytes.
+    """
+    config = get_config()
+    tts_endpoint = config.url("tts", "audio/speech")
 
     payload = {
         "input": ssml,
@@ -135,27 +683,60 @@ def azure_text_to_speech(text, output_audio_path="summary.mp3"):
         "response_format": "mp3"
     }
 
-    response = requests.post(tts_endpoint, headers=headers, json=payload)
+    response = get_client().post(tts_endpoint, headers=config.headers, json=payload)
 
     if response.status_code != 200:
         raise Exception(f"Azure TTS API Error: {response.status_code} - {response.text}")
 
-    # Save the original audio file
-    raw_audio_path = "raw_summary.mp3"
-    with open(raw_audio_path, "wb") as audio_file:
-        audio_file.write(response.content)
+    return response.content
 
-    # Trim the first 10 seconds
-    audio = AudioSegment.from_file(raw_audio_path, format="mp3")
-    trimmed_audio = audio[10000:]  # Trim first 10,000 milliseconds (10 sec)
 
-    # Save the trimmed audio file
-    trimmed_audio.export(output_audio_path, format="mp3")
+def synthesize_part(ssml, voice, attempts=TTS_PART_ATTEMPTS):
+    """
+    Synthesize one part, retrying just this part if it fails or comes back without audio.
+    """
+    for attempt in range(attempts):
+        try:
+            audio = synthesize_ssml(ssml, voice)
+            if mp3.audio_frames(audio):
+                return audio
+            error = Exception("Azure TTS API Error: response contained no audio frames")
+        except Exception as e:
+            error = e
+    raise error
+
+
+def render_speech(ssml_bodies, voice, style, output_audio_path=None, max_workers=TTS_MAX_WORKERS):
+    """
+    Synthesize formatted SSML parts concurrently, join them without gaps,
+    drop any non-speech lead-in and save the MP3 (to a new file in the
+    scratch workspace unless output_audio_path is given).
+    """
+    documents = [build_ssml(body, voice, style) for body in ssml_bodies]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(executor.map(metrics.bind(lambda document: synthesize_part(document, voice)), documents))
 
-    return output_audio_path
+    with metrics.stage("postprocess"):
+        # Cut the lead-in on an MP3 frame boundary; the audio itself is not re-encoded
+        from audio_trim import trim_leading_silence
+        trimmed_audio, _ = trim_leading_silence(mp3.concat(parts))
 
+        if output_audio_path is None:
+            output_audio_path = scratch_workspace().new_file(".mp3", "speech_")
+        with open(output_audio_path, "wb") as audio_file:
+            audio_file.write(trimmed_audio)
+        metrics.record(bytes_in=sum(len(part) for part in parts), bytes_out=len(trimmed_audio))
 
+    return output_audio_path
 
 
+def azure_text_to_speech(text, output_audio_path=None, mood=None):
+    # Detect mood (unless already known) and set expressive voice
+    if mood is None:
+        mood = classify_mood(text) if MOOD_MODE == "lexicon" else detect_mood(text)
+    voice, style = voice_for_mood(mood)
 
+    # Convert the text to SSML parts in one pass and synthesize the parts in parallel
+    ssml_bodies = SSMLBuilder().parts(text, TTS_PART_CHARS)
 
+    return render_speech(ssml_bodies, voice, style, output_audio_path)
@@ -0,0 +1,325 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import threading
+import traceback
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from audio_preprocess import probe_duration
+from cache import text_digest
+from config import configure
+from ingest import is_youtube_url, is_youtube_collection, list_youtube_videos, download_audio_url
+from pipeline import process_podcast
+from scheduler import get_scheduler
+from workspace import get_workspace_manager
+
+# Batch mode: summarize every episode of a YouTube playlist/channel, a podcast
+# RSS feed or a local folder. Episodes run concurrently (each through the
+# regular pipeline) while an optional requests-per-minute cap on the shared
+# Azure client keeps the deployments within quota. Finished episodes are
+# appended to a JSONL manifest, so rerunning the same batch after a crash
+# skips them and only processes what is left.
+BATCH_DIR = os.environ.get("PODCAST_BATCH_DIR", os.path.join(".cache", "batches"))
+BATCH_CONCURRENCY = int(os.environ.get("PODCAST_BATCH_CONCURRENCY", 3))
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac", ".opus")
+MANIFEST_NAME = "manifest.jsonl"
+
+_ITUNES_NS = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+
+
+def _parse_duration(value):
+    # itunes:duration is either seconds or [HH:]MM:SS
+    try:
+        seconds = 0.0
+        for part in (value or "").strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds or None
+    except ValueError:
+        return None
+
+
+def list_folder(path):
+    """
+    Audio files in a local folder, in name order.
+    """
+    return [{"source": os.path.join(path, name), "title": os.path.splitext(name)[0], "duration": None}
+            for name in sorted(os.listdir(path)) if name.lower().endswith(AUDIO_EXTENSIONS)]
+
+
+def list_rss(url):
+    """
+    Episodes of a podcast RSS feed (the audio enclosure of every item).
+    """
+    response = requests.get(url, timeout=(10, 60))
+    response.raise_for_status()
+    episodes = []
+    for item in ElementTree.fromstring(response.content).iter("item"):
+        enclosure = item.find("enclosure")
+        if enclosure is None or not enclosure.get("url"):
+            continue
+        episodes.append({
+            "source": enclosure.get("url"),
+            "title": (item.findtext("title") or "").strip() or os.path.basename(enclosure.get("url")),
+            "duration": _parse_duration(item.findtext(f"{_ITUNES_NS}duration")),
+        })
+    return episodes
+
+
+def expand_sources(spec):
+    """
+    The episodes of a batch: a folder path, a YouTube playlist/channel URL,
+    a single YouTube video or an RSS feed URL.
+    """
+    if os.path.isdir(spec):
+        return list_folder(spec)
+    if is_youtube_collection(spec):
+        return list_youtube_videos(spec)
+    if is_youtube_url(spec):
+        return [{"source": spec, "title": None, "duration": None}]
+    return list_rss(spec)
+
+
+def batch_dir_for(spec):
+    return os.path.join(BATCH_DIR, text_digest(spec)[:16])
+
+
+class Manifest:
+    """
+    Append-only JSONL record of finished episodes; the last record per source wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def load(self):
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # line cut short by a crash
+                    records[record["source"]] = record
+        except OSError:
+            pass
+        return records
+
+    def append(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchRunner:
+    """
+    Process the episodes of spec with up to `concurrency` running at once,
+    writing summaries (text and MP3) and the manifest to output_dir.
+    """
+
+    def __init__(self, spec, output_dir=None, concurrency=BATCH_CONCURRENCY, max_rpm=None, limit=None):
+        self.spec = spec
+        self.output_dir = os.path.abspath(output_dir or batch_dir_for(spec))
+        self.concurrency = concurrency
+        self.max_rpm = max_rpm
+        self.limit = limit
+        self.manifest = Manifest(os.path.join(self.output_dir, MANIFEST_NAME))
+        self.episodes = []
+        self.records = {}         # source -> manifest record, including earlier runs
+        self.skipped = 0          # episodes already finished by an earlier run
+        self.run_records = []     # records produced by this run
+        self.running = set()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Run the batch on a background thread and return immediately.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True, name="podcast-batch")
+        self._thread.start()
+        return self
+
+    def is_running(self):
+        return self.finished is None
+
+    def run(self):
+        """
+        Process every pending episode and return the throughput report.
+        """
+        self.started = time.time()
+        try:
+            if self.max_rpm:
+                get_scheduler().set_request_limit(self.max_rpm)
+            self.episodes = expand_sources(self.spec)[:self.limit]
+            self.records = self.manifest.load()
+            pending = []
+            for index, episode in enumerate(self.episodes):
+                episode["index"] = index
+                if self.records.get(episode["source"], {}).get("status") == "done":
+                    self.skipped += 1
+                else:
+                    pending.append(episode)
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="podcast-batch") as executor:
+                list(executor.map(self._process, pending))
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            self.finished = time.time()
+        return self.report()
+
+    def _process(self, episode):
+        with self._lock:
+            self.running.add(episode["source"])
+        workspace = get_workspace_manager().create()
+        record = {"source": episode["source"], "title": episode["title"], "index": episode["index"]}
+        started = time.time()
+        try:
+            source = episode["source"]
+            if re.match(r'https?://', source) and not is_youtube_url(source):
+                source = download_audio_url(source, workspace.root)
+            duration = episode["duration"] or (None if is_youtube_url(source) else probe_duration(source))
+
+            result = asyncio.run(process_podcast(source, title=episode["title"], workspace=workspace))
+            if duration is None and result["audio_path"]:
+                duration = probe_duration(result["audio_path"])
+
+            outputs = self._write_outputs(episode, result)
+            record.update(status="done", title=result["title"], audio_seconds=duration, mood=result["mood"],
+                          tts_error=result["tts_error"], **outputs)
+        except Exception as e:
+            record.update(status="failed", error=str(e), traceback=traceback.format_exc())
+        finally:
+            workspace.release()
+
+        record.update(seconds=time.time() - started, finished_at=time.time())
+        self.manifest.append(record)
+        with self._lock:
+            self.records[record["source"]] = record
+            self.run_records.append(record)
+            self.running.discard(episode["source"])
+        return record
+
+    def _write_outputs(self, episode, result):
+        slug = re.sub(r'[^\w-]+', '_', result["title"] or "episode").strip('_')[:80]
+        base = os.path.join(self.output_dir, f"{episode['index'] + 1:03d}_{slug}")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(result["summary"])
+        outputs = {"summary_path": base + ".txt", "audio_summary_path": None}
+        if result["audio_summary_path"]:
+            shutil.copyfile(result["audio_summary_path"], base + ".mp3")
+            outputs["audio_summary_path"] = base + ".mp3"
+        return outputs
+
+    def report(self):
+        """
+        Progress and aggregate throughput of this run.
+        """
+        with self._lock:
+            run_records = list(self.run_records)
+            running = len(self.running)
+        done = [record for record in run_records if record["status"] == "done"]
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        audio_minutes = sum(record.get("audio_seconds") or 0 for record in done) / 60.0
+        return {
+            "total": len(self.episodes),
+            "done": len(done),
+            "failed": len(run_records) - len(done),
+            "skipped": self.skipped,
+            "running": running,
+            "pending": len(self.episodes) - self.skipped - len(run_records),
+            "elapsed_seconds": elapsed,
+            "audio_minutes": audio_minutes,
+            "episodes_per_hour": len(done) / (elapsed / 3600.0) if elapsed else 0.0,
+            "audio_minutes_per_minute": audio_minutes / (elapsed / 60.0) if elapsed else 0.0,
+            "output_dir": self.output_dir,
+            "error": self.error,
+        }
+
+
+_runners = {}
+_runners_lock = threading.Lock()
+
+
+def start_batch(spec, **options):
+    """
+    Start (or return the already running) batch for spec in this process.
+    """
+    output_dir = os.path.abspath(options.get("output_dir") or batch_dir_for(spec))
+    with _runners_lock:
+        runner = _runners.get(output_dir)
+        if runner is None or not runner.is_running():
+            runner = BatchRunner(spec, **{**options, "output_dir": output_dir}).start()
+            _runners[output_dir] = runner
+        return runner
+
+
+def get_batch(output_dir):
+    with _runners_lock:
+        return _runners.get(os.path.abspath(output_dir))
+
+
+def format_report(report):
+    return (f"{report['done']} done, {report['failed']} failed, {report['skipped']} already done, "
+            f"{report['pending']} pending in {report['elapsed_seconds'] / 60:.1f} min | "
+            f"{report['episodes_per_hour']:.1f} episodes/hour, "
+            f"{report['audio_minutes_per_minute']:.1f} audio-minutes/minute")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize every episode of a playlist, channel, RSS feed or folder.")
+    parser.add_argument("spec", help="YouTube playlist/channel URL, podcast RSS feed URL or folder of audio files")
+    parser.add_argument("-o", "--output-dir", help="where summaries and the manifest go (rerun with the same "
+                                                   "directory to resume); defaults to a folder under " + BATCH_DIR)
+    parser.add_argument("-j", "--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="episodes processed at the same time")
+    parser.add_argument("--max-rpm", type=int, help="cap on Azure requests per minute to each deployment, "
+                                                     "across all episodes")
+    parser.add_argument("--limit", type=int, help="only the first N episodes")
+    parser.add_argument("--config", help="TOML or JSON file with the AZURE_OPENAI_* settings")
+    args = parser.parse_args(argv)
+    if args.config:
+        configure(args.config)
+
+    runner = BatchRunner(args.spec, output_dir=args.output_dir, concurrency=args.concurrency,
+                         max_rpm=args.max_rpm, limit=args.limit)
+    runner.start()
+    reported = 0
+    while True:
+        finished = not runner.is_running()
+        new_records = runner.run_records[reported:]
+        for record in new_records:
+            outcome = "done" if record["status"] == "done" else f"FAILED: {record['error']}"
+            print(f"[{record['index'] + 1}/{len(runner.episodes)}] {record['title']}: {outcome} "
+                  f"({record['seconds']:.0f}s)", flush=True)
+        reported += len(new_records)
+        if finished:
+            break
+        time.sleep(1)
+
+    report = runner.report()
+    if report["error"]:
+        print(f"Batch failed: {report['error']}", file=sys.stderr)
+        return 1
+    print(format_report(report))
+    print(f"Summaries and manifest: {report['output_dir']}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Compare the ways of getting the summary's mood (which picks the TTS voice):
+a separate chat request after the summary, the mood returned by the
+summarization request itself (JSON mode), and the local lexicon classifier.
+
+    python benchmarks/bench_mood.py [--latency 0.8] [--runs 5]
+
+Requests go to an in-process stand-in for the Azure chat endpoint that waits
+--latency seconds per request, so the numbers show the round trips saved,
+not model speed. For each mode the script reports the wall time of
+summary + mood and the number of chat requests.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import configure
+from http_client import get_client
+from azure_openai import summarize_text, detect_mood
+from mood import classify_mood
+
+SUMMARY = ("The hosts celebrate a successful product launch and laugh about the early prototypes. "
+           "They share what they enjoyed most and why the team is excited about the next release.")
+TRANSCRIPT = " ".join(["We talked about the launch and how much fun the team had building it."] * 200)
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.latency)
+        if request.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps({"summary": SUMMARY, "mood": "joyful",
+                                  "key_points": ["Product launch", "Early prototypes", "Next release"]})
+        elif "tone" in request["messages"][0]["content"]:
+            content = "joyful"
+        else:
+            content = SUMMARY
+        body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def separate():
+    summary = summarize_text(TRANSCRIPT)
+    return detect_mood(summary)
+
+
+def structured():
+    return summarize_text(TRANSCRIPT, structured=True)["mood"]
+
+
+def lexicon():
+    return classify_mood(summarize_text(TRANSCRIPT))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds per stub chat request")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    StubChatHandler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    configure(endpoint=f"http://127.0.0.1:{server.server_port}/", api_key="bench", deployment="gpt-4o",
+              api_version="2024-06-01")
+
+    print(f"{'mode':<12}{'mood':<10}{'wall s':>8}{'requests':>10}")
+    for name, method in (("separate", separate), ("structured", structured), ("lexicon", lexicon)):
+        requests_before = get_client().snapshot()["requests"]
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            mood = method()
+        wall = (time.perf_counter() - started) / args.runs
+        requests = (get_client().snapshot()["requests"] - requests_before) / args.runs
+        print(f"{name:<12}{mood:<10}{wall:>8.3f}{requests:>10.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
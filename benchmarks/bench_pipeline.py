@@ -0,0 +1,203 @@
+"""
+End-to-end pipeline benchmark against the local mock Azure OpenAI server.
+
+    python benchmarks/bench_pipeline.py [--lengths 1,5,15] [--runs 3] [--output results.json]
+    python benchmarks/bench_pipeline.py --compare results-before.json
+
+Synthetic episodes of the given lengths (minutes) are generated once with
+FFmpeg. Each is processed --runs times through the full pipeline (preprocess,
+Whisper, summary, mood, TTS) with an empty cache, against benchmarks/mock_azure.py
+with the profile given on the command line. For every length the script
+reports the median end-to-end time, time to first audio, audio minutes
+processed per minute and per-stage time, requests and retries from the
+run traces. The results, with the commit and the mock profile, are written as
+JSON; --compare prints the change against an earlier results file, so
+performance work can be validated on any commit without cloud spend.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_azure import MockAzureServer, PROFILE
+
+DEFAULT_LENGTHS = "1,5,15"
+CORPUS_DIR = os.path.join(ROOT, ".cache", "bench_corpus")
+
+
+def make_episode(path, minutes):
+    # A podcast-like MP3 (stereo, 44.1 kHz, 128 kbps): 3 s of "speech" tone, 1 s pause
+    subprocess.run(['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+                    '-f', 'lavfi', '-i', f'sine=f=180:d={minutes * 60}:sample_rate=44100',
+                    '-af', "volume='if(lt(mod(t,4),3),0.5,0)':eval=frame",
+                    '-ac', '2', '-c:a', 'libmp3lame', '-b:a', '128k', path], check=True)
+
+
+def corpus(lengths, corpus_dir=CORPUS_DIR):
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = {}
+    for minutes in lengths:
+        path = os.path.join(corpus_dir, f"episode_{minutes:g}min.mp3")
+        if not os.path.exists(path):
+            print(f"generating {os.path.basename(path)}...", file=sys.stderr, flush=True)
+            make_episode(path + ".tmp.mp3", minutes)
+            os.replace(path + ".tmp.mp3", path)
+        paths[minutes] = path
+    return paths
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_once(path, workers):
+    """
+    Process one episode; returns the measurements of the run.
+    """
+    from pipeline import process_podcast
+
+    first_audio = []
+    started = time.perf_counter()
+
+    def on_event(event):
+        if event["type"] == "audio_segment" and not first_audio:
+            first_audio.append(time.perf_counter() - started)
+
+    result = asyncio.run(process_podcast(path, title="bench", max_workers=workers, on_event=on_event))
+    seconds = time.perf_counter() - started
+    if not first_audio and result["audio_summary_path"]:
+        first_audio.append(seconds)  # not streamed: the audio arrives with the result
+    return {
+        "seconds": seconds,
+        "first_audio_seconds": first_audio[0] if first_audio else None,
+        "tts_error": result["tts_error"],
+        "stages": result["trace"]["stages"],
+    }
+
+
+def summarize_runs(minutes, runs):
+    seconds = [run["seconds"] for run in runs]
+    first_audio = [run["first_audio_seconds"] for run in runs if run["first_audio_seconds"] is not None]
+    stages = {}
+    for stage in runs[0]["stages"]:
+        spans = [run["stages"][stage] for run in runs if stage in run["stages"]]
+        stages[stage] = {
+            "seconds": statistics.median(span["seconds"] for span in spans),
+            "requests": statistics.median(span["requests"] for span in spans),
+            "retries": statistics.median(span["retries"] for span in spans),
+            "api_seconds": statistics.median(span["api_seconds"] for span in spans),
+            "queue_seconds": statistics.median(span.get("queue_seconds", 0) for span in spans),
+        }
+    median = statistics.median(seconds)
+    return {
+        "minutes": minutes,
+        "runs": len(runs),
+        "seconds": median,
+        "seconds_min": min(seconds),
+        "seconds_max": max(seconds),
+        "first_audio_seconds": statistics.median(first_audio) if first_audio else None,
+        "audio_minutes_per_minute": minutes / (median / 60.0),
+        "errors": sum(bool(run["tts_error"]) for run in runs),
+        "stages": stages,
+    }
+
+
+def print_results(results, baseline=None):
+    base = {entry["minutes"]: entry for entry in (baseline or {}).get("summary", [])}
+
+    def delta(value, old):
+        return f" ({(value - old) / old:+.0%})" if old else ""
+
+    print(f"commit {results['commit']}, {results['runs']} run(s) per length")
+    print(f"{'episode':<10}{'total s':>18}{'first audio s':>20}{'audio min/min':>16}{'errors':>8}")
+    for entry in results["summary"]:
+        old = base.get(entry["minutes"], {})
+        first = entry["first_audio_seconds"]
+        first_text = f"{first:.2f}{delta(first, old.get('first_audio_seconds'))}" if first is not None else "-"
+        print(f"{entry['minutes']:>6g} min{entry['seconds']:>10.2f}{delta(entry['seconds'], old.get('seconds')):>8}"
+              f"{first_text:>20}{entry['audio_minutes_per_minute']:>16.1f}{entry['errors']:>8}")
+
+    print(f"\n{'episode':<10}{'stage':<13}{'seconds':>9}{'requests':>10}{'retries':>9}{'api s':>8}{'queue s':>9}")
+    for entry in results["summary"]:
+        old_stages = base.get(entry["minutes"], {}).get("stages", {})
+        for stage, values in entry["stages"].items():
+            old = old_stages.get(stage, {}).get("seconds")
+            print(f"{entry['minutes']:>6g} min {stage:<13}{values['seconds']:>9.2f}{values['requests']:>10g}"
+                  f"{values['retries']:>9g}{values['api_seconds']:>8.2f}{values.get('queue_seconds', 0):>9.2f}"
+                  f"{delta(values['seconds'], old)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lengths", default=DEFAULT_LENGTHS, help="episode lengths in minutes, comma separated")
+    parser.add_argument("--runs", type=int, default=3, help="runs per episode (the median is reported)")
+    parser.add_argument("--workers", type=int, default=4, help="pipeline workers per stage")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR)
+    for name, default in PROFILE.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default,
+                            help=f"mock profile (default: {default})")
+    args = parser.parse_args()
+
+    lengths = [float(value) for value in args.lengths.split(",")]
+    episodes = corpus(lengths, args.corpus_dir)
+    profile = {name: getattr(args, name) for name in PROFILE}
+
+    # Everything the pipeline writes goes to a scratch directory; set before the pipeline is imported
+    scratch = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.environ["PODCAST_WORKSPACE_DIR"] = os.path.join(scratch, "workspaces")
+    os.environ["PODCAST_TRACE_FILE"] = ""
+    import cache
+    from config import configure
+
+    server = MockAzureServer(profile).start()
+    configure(endpoint=server.url, api_key="bench", deployment="gpt-4o", api_version="2024-06-01")
+
+    runs = {}
+    for minutes, path in episodes.items():
+        for index in range(args.runs):
+            # A fresh cache per run, so every stage does its work
+            cache._cache = cache.ResultCache(os.path.join(scratch, f"cache_{minutes:g}_{index}"))
+            run = run_once(path, args.workers)
+            runs.setdefault(minutes, []).append(run)
+            print(f"{minutes:g} min run {index + 1}: {run['seconds']:.2f}s", file=sys.stderr, flush=True)
+    server.stop()
+
+    results = {
+        "commit": git_commit(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "workers": args.workers,
+        "profile": profile,
+        "mock_requests": dict(server.stats),
+        "summary": [summarize_runs(minutes, minute_runs) for minutes, minute_runs in runs.items()],
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != profile:
+            print("warning: the baseline was recorded with a different mock profile", file=sys.stderr)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
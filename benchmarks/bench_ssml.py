@@ -0,0 +1,102 @@
+"""
+Compare the previous three-pass SSML formatting with the single-pass
+builder.
+
+    python benchmarks/bench_ssml.py [--words 1000,10000,100000] [--runs 5]
+
+Summaries of the given lengths are generated from a fixed vocabulary with
+the punctuation, emphasis words and special characters model output
+contains. For each length the script reports the median time to format the
+text (whole, and as TTS parts) and whether the complete SSML document parses
+as XML. Correctness on hostile input is checked by tests/test_ssml.py.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import statistics
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ssml import SSMLBuilder, build_ssml
+from azure_openai import split_tts_text, TTS_PART_CHARS
+
+VOCABULARY = ("the guest explained how their team built a product for small companies and why pricing "
+              "matters more than features in the first year of a startup").split()
+EXTRAS = ["important", "key", "critical", "note", "R&D", "<5%", '"quoted"', "it's", "Q&A", "AT&T", "x > y"]
+SPECIALS = list("&<>\"',.!?;:- \n\t\r") + ["\n\n", "...", "\x00", "\x0b", "\x1f", "\ud800", "\ufffe", "é", "€", "🎙"]
+
+
+def previous_format(text, sentence_pause="1s"):
+    # The implementation in azure_openai before the builder
+    text = re.sub(r'(\.|\?|!) ', rf'\1 <break time="{sentence_pause}"/> ', text)
+    text = text.replace(",", "<break time='500ms'/>")
+    text = re.sub(r'\b(important|key|critical|note)\b', r'<emphasis level="strong">\1</emphasis>', text)
+    return text
+
+
+def make_summary(words, seed=0):
+    rng = random.Random(seed)
+    out, sentence = [], 0
+    for index in range(words):
+        out.append(rng.choice(EXTRAS) if rng.random() < 0.03 else rng.choice(VOCABULARY))
+        sentence += 1
+        if rng.random() < 0.05:
+            out[-1] += ","
+        if sentence >= rng.randint(12, 25):
+            out[-1] += rng.choice(".....?!")
+            sentence = 0
+            if rng.random() < 0.2:
+                out[-1] += "\n\n"
+    return " ".join(out).replace("\n\n ", "\n\n")
+
+
+def parses(body):
+    try:
+        ET.fromstring(build_ssml(body, "nova", "neutral"))
+        return True
+    except ET.ParseError:
+        return False
+
+
+def timed(func, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def benchmark(lengths, runs):
+    builder = SSMLBuilder()
+    print(f"{'words':>8}  {'method':<22}{'ms':>10}{'MB/s':>8}  valid")
+    for words in lengths:
+        text = make_summary(words)
+        megabytes = len(text.encode("utf-8")) / 1e6
+        cases = (
+            ("previous (3 passes)", lambda: [previous_format(text)]),
+            ("builder", lambda: [builder.format(text)]),
+            ("previous, TTS parts", lambda: [previous_format(part) for part in split_tts_text(text)]),
+            ("builder, TTS parts", lambda: builder.parts(text, TTS_PART_CHARS)),
+        )
+        for name, func in cases:
+            seconds, bodies = timed(func, runs)
+            valid = all(parses(body) for body in bodies)
+            print(f"{words:>8}  {name:<22}{seconds * 1000:>10.2f}{megabytes / seconds:>8.1f}  {'yes' if valid else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", default="1000,10000,100000", help="summary lengths in words, comma separated")
+    parser.add_argument("--runs", type=int, default=5, help="runs per length (the median is reported)")
+    args = parser.parse_args()
+
+    benchmark([int(value) for value in args.words.split(",")], args.runs)
+
+
+if __name__ == "__main__":
+    main()
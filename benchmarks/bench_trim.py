@@ -0,0 +1,91 @@
+"""
+Compare the old fixed 10-second trim (full decode + slice + MP3 re-encode)
+with frame-boundary leading-silence removal.
+
+    python benchmarks/bench_trim.py
+
+Synthetic summaries are generated with FFmpeg: a silent lead-in of known
+length followed by a tone standing in for speech, encoded like the TTS output.
+For each case the script reports wall and CPU time (including FFmpeg child
+processes) and how much speech was cut or silence left in.
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydub import AudioSegment
+import mp3
+from audio_trim import trim_leading_silence
+
+CASES = [
+    # (lead-in seconds, speech seconds)
+    (0, 60),
+    (2, 60),
+    (12, 60),
+    (2, 360),
+]
+
+
+def make_summary(path, lead_in, speech):
+    sources = []
+    if lead_in:
+        sources += ['-f', 'lavfi', '-i', f'anullsrc=r=24000:cl=mono:d={lead_in}']
+    sources += ['-f', 'lavfi', '-i', f'sine=f=220:d={speech}:sample_rate=24000']
+    inputs = len(sources) // 4
+    subprocess.run(['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', *sources,
+                    '-filter_complex', ''.join(f'[{i}]' for i in range(inputs)) + f'concat=n={inputs}:v=0:a=1',
+                    '-c:a', 'libmp3lame', '-b:a', '48k', path], check=True)
+
+
+def measure(func):
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    result = func()
+    wall = time.perf_counter() - started
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = sum(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+              for before, after in ((self_before, self_after), (children_before, children_after)))
+    return result, wall, cpu
+
+
+def fixed_trim(path, output_path):
+    # The previous implementation in azure_text_to_speech
+    audio = AudioSegment.from_file(path, format="mp3")
+    audio[10000:].export(output_path, format="mp3")
+    return 10000.0
+
+
+def frame_trim(path, output_path):
+    with open(path, "rb") as f:
+        data = f.read()
+    trimmed, trimmed_ms = trim_leading_silence(data)
+    with open(output_path, "wb") as f:
+        f.write(trimmed)
+    return trimmed_ms
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix="bench_trim_")
+    print(f"{'case':<16}{'method':<14}{'wall s':>8}{'cpu s':>8}{'speech cut ms':>15}{'silence left ms':>17}")
+    for lead_in, speech in CASES:
+        source = os.path.join(work_dir, f"summary_{lead_in}_{speech}.mp3")
+        make_summary(source, lead_in, speech)
+        total_ms = mp3.duration_ms(mp3.audio_frames(open(source, "rb").read()))
+        for name, method in (("fixed 10 s", fixed_trim), ("leading trim", frame_trim)):
+            output = os.path.join(work_dir, f"out_{name.replace(' ', '_')}.mp3")
+            cut_ms, wall, cpu = measure(lambda: method(source, output))
+            cut_ms = min(cut_ms, total_ms)
+            speech_cut = max(cut_ms - lead_in * 1000, 0)
+            silence_left = max(lead_in * 1000 - cut_ms, 0)
+            print(f"{f'{lead_in}s + {speech}s':<16}{name:<14}{wall:>8.3f}{cpu:>8.3f}{speech_cut:>15.0f}{silence_left:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
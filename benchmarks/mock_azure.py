@@ -0,0 +1,313 @@
+"""
+Local stand-in for the Azure OpenAI endpoints used by the pipeline: chat
+completions (plain, JSON mode and streamed), Whisper transcriptions, TTS and
+embeddings.
+
+    python benchmarks/mock_azure.py --port 18600 --throttle-rate 0.05
+
+Point the app or the CLI at it with AZURE_OPENAI_ENDPOINT=http://127.0.0.1:18600/
+(any key, deployment and API version). Latency, throttling (429 with
+Retry-After) and payload sizes come from a profile (see PROFILE), and all
+randomness is seeded, so runs are repeatable and cost nothing.
+"""
+import os
+import re
+import math
+import zlib
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import collections
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mp3
+
+PROFILE = {
+    "chat_latency": 0.4,              # seconds until the first token
+    "chat_tokens_per_second": 80,     # generation speed
+    "answer_words": 60,               # follow-up question answers
+    "embedding_latency": 0.1,
+    "summary_words": 450,             # final summary length
+    "segment_summary_words": 120,     # map/combine summary length
+    "whisper_latency": 0.5,
+    "whisper_seconds_per_audio_minute": 1.5,
+    "words_per_audio_second": 2.5,    # transcript density
+    "tts_latency": 0.3,
+    "tts_chars_per_second": 800,      # synthesis speed
+    "tts_speech_chars_per_second": 15,  # speaking rate of the returned audio
+    "tts_bitrate_kbps": 48,
+    "throttle_rate": 0.0,             # fraction of requests answered with 429
+    "max_rpm": 0,                     # requests per minute per endpoint before 429 (0 = unlimited)
+    "retry_after": 1,                 # seconds, sent with every 429
+    "jitter": 0.1,                    # +/- relative latency variation
+    "seed": 0,
+}
+
+WORDS = ("the market growth team product people research data question model future company story idea "
+         "interview guest host episode listener example problem solution result change policy history "
+         "science design money energy health learning community technology experience decision").split()
+FILLERS = ("um", "uh", "you know,", "like", "I mean,")
+MOODS = ("joyful", "serious", "neutral")
+
+
+def _tone_frames(bitrate_kbps):
+    # One second of a 220 Hz tone, used as the building block of every TTS reply
+    completed = subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=f=220:d=1:sample_rate=24000',
+         '-ac', '1', '-c:a', 'libmp3lame', '-b:a', f'{bitrate_kbps}k', '-f', 'mp3', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return mp3.audio_frames(completed.stdout)
+
+
+class MockAzureServer:
+    """
+    The stand-in server, run on a background thread. `stats` counts requests
+    and throttled requests per endpoint.
+    """
+
+    def __init__(self, profile=None, host="127.0.0.1", port=0):
+        self.profile = {**PROFILE, **(profile or {})}
+        self.random = random.Random(self.profile["seed"])
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._recent = collections.defaultdict(collections.deque)  # endpoint -> request times
+        self._tone = _tone_frames(self.profile["tts_bitrate_kbps"])
+        handler = type("BoundMockAzureHandler", (MockAzureHandler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True, name="mock-azure").start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def wait(self, seconds):
+        jitter = self.profile["jitter"]
+        with self._lock:
+            factor = 1 + self.random.uniform(-jitter, jitter)
+        time.sleep(max(seconds * factor, 0))
+
+    def throttled(self, endpoint):
+        """
+        Count the request and decide whether it is answered with 429.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.stats[endpoint] += 1
+            recent = self._recent[endpoint]
+            while recent and now - recent[0] > 60:
+                recent.popleft()
+            limited = self.profile["max_rpm"] and len(recent) >= self.profile["max_rpm"]
+            if limited or self.random.random() < self.profile["throttle_rate"]:
+                self.stats[f"{endpoint}_throttled"] += 1
+                return True
+            recent.append(now)
+            return False
+
+    def choice(self, options):
+        with self._lock:
+            return self.random.choice(options)
+
+    def words(self, count, fillers=0.0):
+        with self._lock:
+            words = []
+            for index in range(count):
+                if fillers and self.random.random() < fillers:
+                    words.append(self.random.choice(FILLERS))
+                word = self.random.choice(WORDS)
+                words.append(word.capitalize() if index % 12 == 0 else word)
+                if index % 12 == 11:
+                    words[-1] += "."
+            return " ".join(words) + "."
+
+    def summary_text(self, words):
+        # Paragraphs of about 80 words, like a spoken summary script
+        paragraphs = [self.words(min(80, words - start)) for start in range(0, words, 80)]
+        return "\n\n".join(paragraphs)
+
+    def speech(self, text):
+        seconds = max(len(text) / self.profile["tts_speech_chars_per_second"], 1)
+        frames = self._tone * int(seconds + 1)
+        return frames[:mp3.offset_at(frames, seconds * 1000)]
+
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urllib.parse.urlsplit(self.path).path
+        if path.endswith("/chat/completions"):
+            endpoint = "chat"
+        elif path.endswith("/audio/transcriptions"):
+            endpoint = "whisper"
+        elif path.endswith("/audio/speech"):
+            endpoint = "tts"
+        elif path.endswith("/embeddings"):
+            endpoint = "embeddings"
+        else:
+            self._send(404, b'{"error": {"message": "unknown endpoint"}}')
+            return
+
+        if self.mock.throttled(endpoint):
+            self._send(429, b'{"error": {"code": "429", "message": "Rate limit exceeded"}}',
+                       {"Retry-After": str(self.mock.profile["retry_after"])})
+            return
+        getattr(self, f"_{endpoint}")(body)
+
+    def _send(self, status, body, headers=None, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chat(self, body):
+        profile = self.mock.profile
+        request = json.loads(body)
+        system = request["messages"][0]["content"]
+        prompt_words = sum(len(message["content"].split()) for message in request["messages"])
+
+        if "tone" in system and "classify" in system:
+            content = self.mock.choice(MOODS)
+        elif "questions" in system:
+            content = self.mock.words(profile["answer_words"])
+        elif "chapters" in system:
+            starts = re.findall(r"^\[([\d:?]+)\]", request["messages"][1]["content"], re.M)
+            content = json.dumps({"chapters": [{"start": start, "title": self.mock.words(4).rstrip(".")}
+                                               for start in starts[::max(len(starts) // 5, 1)]]})
+        elif "bullet" in system:
+            content = "\n".join("- " + self.mock.words(10) for _ in range(6))
+        elif re.search(r"about (\d+) words", system):
+            content = self.mock.summary_text(int(re.search(r"about (\d+) words", system).group(1)))
+        elif "part" in system or "Merge" in system:
+            content = self.mock.words(profile["segment_summary_words"])
+        else:
+            content = self.mock.summary_text(profile["summary_words"])
+        if request.get("response_format", {}).get("type") == "json_object" and "chapters" not in system:
+            content = json.dumps({"mood": self.mock.choice(MOODS), "summary": content,
+                                  "key_points": [self.mock.words(8) for _ in range(5)]})
+
+        pieces = re.findall(r"\S+\s*", content)
+        usage = {"prompt_tokens": int(prompt_words * 1.3), "completion_tokens": int(len(pieces) * 1.3)}
+        self.mock.wait(profile["chat_latency"])
+        if not request.get("stream"):
+            self.mock.wait(usage["completion_tokens"] / profile["chat_tokens_per_second"])
+            self._send(200, json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}],
+                                        "usage": usage}).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = 1.3 / profile["chat_tokens_per_second"]
+        for piece in pieces:
+            time.sleep(delay)
+            self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _whisper(self, body):
+        profile = self.mock.profile
+        fields = _multipart_fields(body, self.headers.get("Content-Type", ""))
+        audio = fields.get("file", b"")
+        seconds = mp3.duration_ms(audio) / 1000.0 if audio else 0.0
+        self.mock.wait(profile["whisper_latency"] + seconds / 60.0 * profile["whisper_seconds_per_audio_minute"])
+
+        text = self.mock.words(max(int(seconds * profile["words_per_audio_second"]), 1), fillers=0.05)
+        reply = {"text": text}
+        if fields.get("response_format", b"").decode() == "verbose_json":
+            words = text.split()
+            per_segment = 30
+            step = seconds / max(len(words) / per_segment, 1)
+            reply.update(duration=seconds, language="english", segments=[
+                {"id": i, "start": round(i * step, 2), "end": round(min((i + 1) * step, seconds), 2),
+                 "text": " ".join(words[start:start + per_segment])}
+                for i, start in enumerate(range(0, len(words), per_segment))])
+        self._send(200, json.dumps(reply).encode())
+
+    def _tts(self, body):
+        profile = self.mock.profile
+        text = json.loads(body).get("input", "")
+        self.mock.wait(profile["tts_latency"] + len(text) / profile["tts_chars_per_second"])
+        self._send(200, self.mock.speech(re.sub(r"<[^>]+>", "", text)), content_type="audio/mpeg")
+
+    def _embeddings(self, body):
+        inputs = json.loads(body)["input"]
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        self.mock.wait(self.mock.profile["embedding_latency"])
+        reply = {"data": [{"index": i, "embedding": _hashed_embedding(text)} for i, text in enumerate(inputs)],
+                 "usage": {"prompt_tokens": sum(int(len(text.split()) * 1.3) for text in inputs)}}
+        self._send(200, json.dumps(reply).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _hashed_embedding(text, dims=64):
+    # Bag of hashed words: texts sharing words get similar vectors
+    vector = [0.0] * dims
+    for word in re.findall(r"\w+", text.lower()):
+        vector[zlib.crc32(word.encode()) % dims] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _multipart_fields(body, content_type):
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        return {}
+    fields = {}
+    for part in body.split(b"--" + match.group(1).encode()):
+        head, _, value = part.partition(b"\r\n\r\n")
+        name = re.search(rb'name="([^"]+)"', head)
+        if name:
+            fields[name.group(1).decode()] = value[:-2] if value.endswith(b"\r\n") else value
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock Azure OpenAI server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18600)
+    for name, default in PROFILE.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+    args = parser.parse_args()
+
+    profile = {name: getattr(args, name) for name in PROFILE}
+    server = MockAzureServer(profile, args.host, args.port)
+    print(f"Mock Azure OpenAI listening on {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(dict(server.stats)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# On-disk, content-addressed cache for pipeline stage outputs.
+# Entries are plain files named by the SHA-256 of everything that influenced
+# them (input content, prompt, model, parameters), so a repeat request for the
+# same episode is served from disk without touching the Azure deployments.
+CACHE_DIR = os.environ.get("PODCAST_CACHE_DIR", os.path.join(".cache", "results"))
+CACHE_MAX_BYTES = int(os.environ.get("PODCAST_CACHE_MAX_BYTES", 2 * 1024 ** 3))   # 2 GB
+CACHE_MAX_AGE = int(os.environ.get("PODCAST_CACHE_MAX_AGE", 7 * 24 * 3600))      # 7 days
+EVICT_INTERVAL = 60  # seconds between eviction sweeps triggered by writes
+
+
+def file_digest(file_path, block_size=1024 * 1024):
+    """
+    SHA-256 of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Directory of cache entries with size- and age-based eviction.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, stage, **parts):
+        """
+        Build a cache key from a stage name and the values that determine its output.
+        """
+        material = json.dumps({"stage": stage, **parts}, sort_keys=True, default=str)
+        return f"{stage}-{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def contains_path(self, file_path):
+        """
+        True if file_path is a cache entry (callers must not delete those).
+        """
+        return bool(file_path) and os.path.abspath(file_path).startswith(self.root + os.sep)
+
+    def get_path(self, key):
+        """
+        Return the path of a live entry, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            os.utime(path)  # refresh for LRU eviction
+        except OSError:
+            return None
+        return path
+
+    def put_file(self, key, file_path, move=False):
+        """
+        Copy (or move) file_path into the cache and return the entry path.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        if move:
+            shutil.move(file_path, tmp_path)
+        else:
+            shutil.copyfile(file_path, tmp_path)
+        return self._commit(key, tmp_path)
+
+    def put_bytes(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(key, tmp_path)
+
+    def _commit(self, key, tmp_path):
+        path = self._path(key)
+        os.replace(tmp_path, path)  # atomic, so readers never see partial entries
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self.evict()
+        return path
+
+    def get_json(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put_json(self, key, value):
+        return self.put_bytes(key, json.dumps(value).encode("utf-8"))
+
+    def evict(self):
+        """
+        Drop expired entries, then the least recently used ones until under max_bytes.
+        """
+        with self._lock:
+            self._last_evict = time.time()
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    # Leftover from an interrupted write
+                    if self._last_evict - stat.st_mtime > 3600:
+                        self._remove(path)
+                    continue
+                if self._last_evict - stat.st_mtime > self.max_age:
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_text(cache, key, compute):
+    """
+    Return the cached text for key, computing and storing it on a miss.
+    """
+    value = cache.get_json(key)
+    if value is None:
+        value = compute()
+        cache.put_json(key, value)
+    return value
+
+
+def cached_file(cache, key, compute, move=False):
+    """
+    Return the cached file path for key; on a miss compute() must return a file
+    path, which is copied (or moved) into the cache.
+    """
+    path = cache.get_path(key)
+    if path is None:
+        path = cache.put_file(key, compute(), move=move)
+    return path
+
+
+_cache = None
+
+
+def get_cache():
+    """
+    Process-wide cache configured from the PODCAST_CACHE_* environment variables.
+    """
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
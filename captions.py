@@ -0,0 +1,197 @@
+import os
+import re
+import html
+import requests
+import xml.etree.ElementTree as ET
+import metrics
+
+# Transcripts from YouTube captions.
+# Many videos already have subtitles, listed in the yt-dlp info dict we fetch
+# anyway. When a track passes the quality policy it is downloaded (a few
+# kilobytes) and parsed into a timestamped transcript, and the episode never
+# goes through audio download, preprocessing or Whisper; otherwise Whisper is
+# the fallback. Policies (PODCAST_CAPTIONS):
+#   off    - always transcribe the audio
+#   manual - use subtitles uploaded by the channel (the default)
+#   auto   - also use YouTube's automatic captions, in the video's own language
+#            only (not machine translations), when no subtitles qualify
+# Either kind must cover most of the episode with a plausible amount of speech.
+CAPTIONS = os.environ.get("PODCAST_CAPTIONS", "manual")
+CAPTION_POLICIES = ("off", "manual", "auto")
+CAPTION_LANGUAGES = os.environ.get("PODCAST_CAPTION_LANGUAGES", "")  # e.g. "en,de"; "" = the video's language, or en
+CAPTION_FORMATS = ("vtt", "srv3", "srv2", "srv1")  # in order of preference
+CAPTION_MIN_COVERAGE = 0.8          # share of the episode the captions must reach into
+CAPTION_MIN_WORDS_PER_MINUTE = 60   # conversation runs at 120-180; less means missing speech
+CAPTION_TIMEOUT = (10, 60)
+
+metrics.REGISTRY.describe("podcast_captions_total", "YouTube episodes by transcript source (captions or audio).")
+
+_VTT_TIMING = re.compile(r"((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})")
+_TAG = re.compile(r"<[^>]*>")
+# Sound descriptions such as [Music] or [Laughter] are not speech
+_SOUND = re.compile(r"\[[^\]]*\]|\u266a+")
+
+
+def _seconds(timestamp):
+    seconds = 0.0
+    for part in timestamp.replace(",", ".").split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _clean(text):
+    return " ".join(_SOUND.sub(" ", html.unescape(_TAG.sub("", text))).split())
+
+
+def parse_vtt(text):
+    """
+    [{"start", "end", "text"}] from a WebVTT file. The rolling cues of
+    automatic captions, which repeat the previous line, are joined without
+    the repeats.
+    """
+    segments, recent = [], []
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        for number, line in enumerate(lines):
+            timing = _VTT_TIMING.search(line)
+            if timing:
+                break
+        else:
+            continue  # header, NOTE or STYLE block
+        new_lines = []
+        for line in lines[number + 1:]:
+            line = _clean(line)
+            if line and line not in recent:
+                new_lines.append(line)
+                recent = (recent + [line])[-2:]
+        if new_lines:
+            segments.append({"start": round(_seconds(timing.group(1)), 2), "end": round(_seconds(timing.group(2)), 2),
+                             "text": " ".join(new_lines)})
+    return segments
+
+
+def parse_srv(text):
+    """
+    [{"start", "end", "text"}] from YouTube's timed-text XML: srv1 (<text
+    start dur> in seconds) or srv2/srv3 (<text t d> / <p t d> in milliseconds).
+    """
+    segments = []
+    for element in ET.fromstring(text).iter():
+        if element.tag not in ("text", "p"):
+            continue
+        if "start" in element.attrib:
+            start, duration = float(element.get("start")), float(element.get("dur", 0))
+        else:
+            start, duration = int(element.get("t", 0)) / 1000.0, int(element.get("d", 0)) / 1000.0
+        # srv1 text is escaped twice; the parser undoes the first
+        line = _clean("".join(element.itertext()))
+        if line:
+            segments.append({"start": round(start, 2), "end": round(start + duration, 2), "text": line})
+    return segments
+
+
+def parse_captions(text, ext):
+    return parse_vtt(text) if ext == "vtt" else parse_srv(text)
+
+
+def caption_languages(info, languages=None):
+    languages = CAPTION_LANGUAGES if languages is None else languages
+    wanted = [language.strip().lower() for language in languages.split(",") if language.strip()]
+    return wanted or [(info.get("language") or "en").lower()]
+
+
+def _matches(track_language, language):
+    track_language = track_language.lower()
+    return track_language == language or track_language.startswith(language + "-")
+
+
+def caption_tracks(info, policy=CAPTIONS, languages=None):
+    """
+    Caption tracks the policy allows, best first: [{"language", "automatic",
+    "ext", "url"}], one per language and kind in the preferred format.
+    """
+    if policy not in CAPTION_POLICIES:
+        raise ValueError(f"Unknown caption policy '{policy}' (expected one of {', '.join(CAPTION_POLICIES)})")
+    if policy == "off":
+        return []
+    wanted = caption_languages(info, languages)
+    sources = [(False, info.get("subtitles") or {})]
+    if policy == "auto":
+        video_language = (info.get("language") or "").lower()
+        sources.append((True, info.get("automatic_captions") or {}))
+
+    tracks = []
+    for automatic, available in sources:
+        for language in wanted:
+            if automatic and video_language and not _matches(video_language, language):
+                continue  # automatic captions in another language are machine translations
+            for track_language, formats in available.items():
+                if not _matches(track_language, language):
+                    continue
+                by_ext = {entry.get("ext"): entry for entry in formats or []
+                          if entry.get("url") and "tlang=" not in entry["url"]}
+                ext = next((ext for ext in CAPTION_FORMATS if ext in by_ext), None)
+                if ext:
+                    tracks.append({"language": track_language, "automatic": automatic, "ext": ext,
+                                   "url": by_ext[ext]["url"]})
+                    break
+    return tracks
+
+
+def check_quality(segments, duration=None):
+    """
+    None if the captions are good enough to summarize from, else the reason they are not.
+    """
+    if not segments:
+        return "no captions in the track"
+    words = sum(len(segment["text"].split()) for segment in segments)
+    if duration:
+        coverage = min(segments[-1]["end"], duration) / duration
+        if coverage < CAPTION_MIN_COVERAGE:
+            return f"captions end at {coverage:.0%} of the episode"
+        rate = words / (duration / 60.0)
+        if rate < CAPTION_MIN_WORDS_PER_MINUTE:
+            return f"only {rate:.0f} words per minute"
+    return None
+
+
+def download_captions(track):
+    response = requests.get(track["url"], timeout=CAPTION_TIMEOUT)
+    response.raise_for_status()
+    metrics.record(bytes_in=len(response.content))
+    return response.content.decode("utf-8", errors="replace")
+
+
+def fetch_captions(info, policy=CAPTIONS, languages=None):
+    """
+    The transcript of the first caption track that passes the quality policy:
+    ({"text", "duration", "segments", "track"}, None), or (None, reason) if
+    the audio has to be transcribed.
+    """
+    reasons = []
+    for track in caption_tracks(info, policy, languages):
+        kind = "automatic captions" if track["automatic"] else "subtitles"
+        try:
+            text = download_captions(track)
+        except requests.RequestException as e:
+            reasons.append(f"{track['language']} {kind}: {e}")
+            continue
+        try:
+            segments = parse_captions(text, track["ext"])
+        except (ET.ParseError, ValueError, TypeError) as e:
+            # Malformed times or markup: this track is unusable, the next one (or Whisper) may not be
+            reasons.append(f"{track['language']} {kind}: could not be parsed ({e})")
+            continue
+        problem = check_quality(segments, info.get("duration"))
+        if problem:
+            reasons.append(f"{track['language']} {kind}: {problem}")
+            continue
+        metrics.REGISTRY.inc("podcast_captions_total", source="automatic" if track["automatic"] else "manual")
+        track = {key: track[key] for key in ("language", "automatic", "ext")}
+        return {"text": " ".join(segment["text"] for segment in segments),
+                "duration": float(info.get("duration") or segments[-1]["end"]),
+                "segments": segments, "track": track}, None
+    metrics.REGISTRY.inc("podcast_captions_total", source="audio")
+    if policy == "off":
+        return None, "captions are switched off"
+    return None, "; ".join(reasons) or "no captions in the wanted languages"
@@ -0,0 +1,166 @@
+"""
+Headless entry point: summarize one episode without Streamlit.
+
+    python cli.py episode.mp3 --summary summary.txt --audio summary.mp3
+    python cli.py "https://www.youtube.com/watch?v=..." --transcript transcript.txt
+    python cli.py episode.mp3 --ask "What did the guest say about pricing?"
+    python cli.py episode.mp3 --outputs 1min,15min,bullets,chapters --output-dir out/
+
+Azure settings are read from the environment (AZURE_OPENAI_*), a .env file or
+--config FILE (TOML or JSON). For whole playlists and feeds use batch.py.
+YouTube episodes with good subtitles use them as the transcript instead of
+Whisper (PODCAST_CAPTIONS, see captions.py).
+--ask answers from the episode's transcript index; an episode that has not
+been processed yet is processed first. --outputs derives other summary lengths
+and formats in the same run; with --output-dir each is saved as <name>.txt
+(and <name>.mp3 for spoken summaries).
+"""
+import os
+import sys
+import json
+import shutil
+import asyncio
+import argparse
+from config import configure, ConfigError
+
+
+def _print_event(event):
+    if event["type"] == "stage":
+        print(f"{event['stage']}: {event['status']}", file=sys.stderr, flush=True)
+    elif event["type"] == "progress":
+        print(f"  {event['text']}", file=sys.stderr, flush=True)
+    elif event["type"] == "audio_segment":
+        print(f"  audio part {event['index'] + 1} ready ({event['seconds']:.1f}s after summarizing started)",
+              file=sys.stderr, flush=True)
+    elif event["type"] == "output":
+        print(f"  output {event['name']} ready", file=sys.stderr, flush=True)
+    elif event["type"] == "error":
+        print(f"{event['stage']} failed: {event['message']}", file=sys.stderr, flush=True)
+
+
+def _print_answer(answer, as_json=False):
+    if as_json:
+        print(json.dumps(answer, indent=2))
+        return
+    from transcript_index import format_timestamp
+    print(answer["answer"])
+    for passage in answer["passages"]:
+        print(f"  [{format_timestamp(passage['start'])}-{format_timestamp(passage['end'])}] "
+              f"{passage['text'][:100]}...", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="podcast-summarize",
+        description="Transcribe and summarize a podcast episode (audio file or YouTube URL).")
+    parser.add_argument("source", help="path of an audio file or a YouTube URL")
+    parser.add_argument("--config", help="TOML or JSON file with the AZURE_OPENAI_* settings")
+    parser.add_argument("--title", help="episode title (defaults to the YouTube title)")
+    parser.add_argument("--transcript", metavar="PATH", help="write the transcript to PATH")
+    parser.add_argument("--summary", metavar="PATH", help="write the summary to PATH (default: stdout)")
+    parser.add_argument("--audio", metavar="PATH", help="synthesize the spoken summary and save the MP3 to PATH")
+    parser.add_argument("--ask", metavar="QUESTION", help="answer a question about the episode instead of printing "
+                                                         "the summary")
+    parser.add_argument("--outputs", metavar="SPEC", default="",
+                        help="extra outputs from the same run, e.g. 1min,15min,bullets,chapters")
+    parser.add_argument("--output-dir", metavar="DIR", help="save the extra outputs to DIR (with audio)")
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON instead of the summary")
+    parser.add_argument("--workers", type=int, default=4, help="parallel requests per stage")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.config:
+            configure(args.config)
+    except (ConfigError, OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.output_dir and not args.outputs:
+        parser.error("--output-dir needs --outputs")
+
+    # Imported here so --help and argument errors stay instant
+    from pipeline import process_podcast, query_podcast
+    from outputs import parse_outputs
+    try:
+        parse_outputs(args.outputs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.ask and not (args.transcript or args.summary or args.audio):
+        try:
+            answer = asyncio.run(query_podcast(args.source, args.ask))
+        except LookupError:
+            answer = None  # not transcribed yet: process it below
+        except ConfigError as e:
+            print(e, file=sys.stderr)
+            return 2
+        except Exception as e:
+            print(f"Query failed: {e}", file=sys.stderr)
+            return 1
+        if answer is not None:
+            _print_answer(answer, args.json)
+            return 0
+
+    try:
+        result = asyncio.run(process_podcast(args.source, title=args.title, max_workers=args.workers,
+                                             tts=args.audio is not None or bool(args.output_dir),
+                                             outputs=args.outputs,
+                                             on_event=None if args.quiet else _print_event))
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+    except Exception as e:
+        print(f"Processing failed: {e}", file=sys.stderr)
+        return 1
+
+    compaction = result["summary_stats"].get("compaction")
+    if compaction and not args.quiet:
+        print(f"transcript compacted: {compaction['tokens_before']} -> {compaction['tokens_after']} tokens "
+              f"(-{compaction['reduction']:.0%})", file=sys.stderr)
+
+    source = result["transcript_source"]
+    if source["kind"] == "captions" and not args.quiet:
+        kind = "automatic captions" if source["automatic"] else "subtitles"
+        print(f"transcript: the video's {source['language']} {kind} (no audio transcribed)", file=sys.stderr)
+
+    if not args.quiet:
+        print("stage times: " + ", ".join(f"{stage} {span['seconds']:.1f}s"
+                                          for stage, span in result["trace"]["stages"].items()), file=sys.stderr)
+
+    if args.transcript:
+        with open(args.transcript, "w", encoding="utf-8") as f:
+            f.write(result["transcript"])
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(result["summary"])
+    if args.audio and result["audio_summary_path"]:
+        shutil.copyfile(result["audio_summary_path"], args.audio)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name, output in result["outputs"].items():
+            if output.get("error"):
+                continue
+            with open(os.path.join(args.output_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(output["text"])
+            if output.get("audio_path"):
+                shutil.copyfile(output["audio_path"], os.path.join(args.output_dir, f"{name}.mp3"))
+
+    if args.ask:
+        try:
+            answer = asyncio.run(query_podcast(args.source, args.ask))
+        except Exception as e:
+            print(f"Query failed: {e}", file=sys.stderr)
+            return 1
+        _print_answer(answer, args.json)
+    elif args.json:
+        print(json.dumps(result, indent=2))
+    elif not args.summary:
+        print(result["summary"])
+        for name, output in result["outputs"].items():
+            if not args.output_dir and not output.get("error"):
+                print(f"\n== {name} ==\n{output['text']}")
+    failed = any(output.get("error") for output in result["outputs"].values())
+    return 1 if (args.audio and result["tts_error"]) or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import os
+import re
+import time
+
+# Transcript compaction before summarization.
+# Spoken transcripts carry a lot of tokens the summarizer does not need:
+# filler words, stutters, phrases said twice, Whisper's repeated-sentence
+# artifacts and (optionally) sponsor reads. Removing them locally, with plain
+# regular expressions, shrinks the input of the slowest and most expensive call.
+COMPACT_TRANSCRIPTS = os.environ.get("PODCAST_COMPACT_TRANSCRIPTS", "1") != "0"
+DROP_ADS = os.environ.get("PODCAST_DROP_ADS", "0") == "1"
+MAX_REPEAT_NGRAM = 6       # longest phrase checked for immediate repetition
+AD_MIN_CUES = 2            # sponsor cues needed before a block of sentences is dropped
+AD_GAP_SENTENCES = 2       # cue sentences at most this far apart belong to the same block
+TOKEN_ENCODING = "o200k_base"
+
+_FILLERS = re.compile(r"(?:^|(?<=[\s,.!?]))(?:mm+-?hmm+|uh-huh|u+h+m*|u+m+|e+r+m+|a+h+|h+m+|mm+)\b[,.]?\s*",
+                      re.IGNORECASE)
+_DISCOURSE = re.compile(r",\s*(?:you know|i mean|like|sort of|kind of),", re.IGNORECASE)
+# Words only: repeated numbers ("the score was 10 10") are content, not stutter
+_STUTTER = re.compile(r"\b([A-Za-z]+)\b(?:,?\s+\1\b)+", re.IGNORECASE)
+_VALID_DOUBLES = {"that", "had", "is"}  # "that that", "had had" can be grammatical
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_AD_CUES = re.compile(
+    r"sponsored by|brought to you by|today'?s sponsor|our sponsors?\b|thanks to our|promo code|discount code|"
+    r"use (?:the )?code|percent off|\d+\s?% off|free trial|first month free|"
+    r"(?:go|head) (?:over )?to \w+\s?(?:\.|dot)\s?com|\w+\.com/\w+|dot com slash",
+    re.IGNORECASE)
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Token count of text, using tiktoken when it is installed and a
+    four-characters-per-token estimate otherwise.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception:
+            _encoding = False  # not installed, or its vocabulary cannot be loaded offline
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def strip_disfluencies(text):
+    """
+    Remove filler words, discourse markers and stuttered words. Returns (text, removed).
+    """
+    text, fillers = _FILLERS.subn("", text)
+    text, markers = _DISCOURSE.subn(",", text)
+    text, stutters = _STUTTER.subn(
+        lambda match: match.group(0) if match.group(1).lower() in _VALID_DOUBLES else match.group(1), text)
+    return text, fillers + markers + stutters
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def strip_repeated_ngrams(text, max_n=MAX_REPEAT_NGRAM):
+    """
+    Drop phrases of up to max_n words that are immediately repeated
+    ("we need to we need to" -> "we need to"). Returns (text, removed).
+    """
+    words = text.split()
+    normalized = [_normalize(word) for word in words]
+    kept, kept_normalized, removed = [], [], 0
+    for word, norm in zip(words, normalized):
+        kept.append(word)
+        kept_normalized.append(norm)
+        for n in range(max_n, 1, -1):
+            if len(kept_normalized) >= 2 * n and kept_normalized[-n:] == kept_normalized[-2 * n:-n]:
+                del kept[-n:], kept_normalized[-n:]
+                removed += 1
+                break
+    return " ".join(kept), removed
+
+
+def strip_repeated_sentences(sentences):
+    """
+    Drop sentences identical to the one before (a common Whisper artifact).
+    """
+    kept = []
+    for sentence in sentences:
+        if not kept or _normalize_sentence(sentence) != _normalize_sentence(kept[-1]):
+            kept.append(sentence)
+    return kept, len(sentences) - len(kept)
+
+
+def _normalize_sentence(sentence):
+    return " ".join(_normalize(word) for word in sentence.split())
+
+
+def drop_ad_segments(sentences, min_cues=AD_MIN_CUES, gap=AD_GAP_SENTENCES):
+    """
+    Remove blocks of sentences that look like sponsor reads: runs of sentences
+    with sponsor cues (promo codes, "brought to you by", URLs...) close together.
+    Returns (sentences, removed).
+    """
+    cue_indices = [i for i, sentence in enumerate(sentences) if _AD_CUES.search(sentence)]
+    blocks, block = [], []
+    for index in cue_indices:
+        if block and index - block[-1] > gap:
+            blocks.append(block)
+            block = []
+        block.append(index)
+    if block:
+        blocks.append(block)
+
+    dropped = set()
+    for block in blocks:
+        if len(block) >= min_cues:
+            dropped.update(range(block[0], block[-1] + 1))
+    return [sentence for i, sentence in enumerate(sentences) if i not in dropped], len(dropped)
+
+
+def compact_transcript(text, drop_ads=DROP_ADS):
+    """
+    Compact a transcript for summarization.
+
+    Returns (compacted_text, report); the report holds the token counts before
+    and after, the reduction and how many items each step removed.
+    """
+    started = time.perf_counter()
+    tokens_before = count_tokens(text)
+
+    compacted, disfluencies = strip_disfluencies(text)
+    compacted, repeats = strip_repeated_ngrams(compacted)
+    sentences, repeated_sentences = strip_repeated_sentences(_SENTENCE_SPLIT.split(compacted.strip()))
+    ad_sentences = 0
+    if drop_ads:
+        sentences, ad_sentences = drop_ad_segments(sentences)
+    # Fillers at the start of a sentence leave it lowercase; that costs nothing, so it is left alone
+    compacted = " ".join(sentence for sentence in sentences if sentence)
+
+    tokens_after = count_tokens(compacted)
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "reduction": (tokens_before - tokens_after) / tokens_before if tokens_before else 0.0,
+        "disfluencies_removed": disfluencies,
+        "repeats_removed": repeats + repeated_sentences,
+        "ad_sentences_removed": ad_sentences,
+        "seconds": time.perf_counter() - started,
+    }
+    return compacted, report
+
+
+def merge_reports(reports):
+    """
+    Combine the reports of several compacted segments into one.
+    """
+    merged = {key: sum(report[key] for report in reports)
+              for key in ("tokens_before", "tokens_after", "tokens_saved", "disfluencies_removed",
+                          "repeats_removed", "ad_sentences_removed", "seconds")}
+    merged["reduction"] = merged["tokens_saved"] / merged["tokens_before"] if merged["tokens_before"] else 0.0
+    return merged
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import threading
+
+# Azure OpenAI settings for the library, resolved on first use instead of at
+# import time, so the pipeline runs the same way from Streamlit, a CLI, a
+# worker or a test. Sources, highest precedence first:
+#   1. an object, mapping or file passed to configure()
+#   2. environment variables (a .env file is loaded if python-dotenv is installed)
+#   3. the TOML/JSON file named by PODCAST_CONFIG_FILE
+#   4. Streamlit secrets, only when the app is running under Streamlit
+CONFIG_FILE = os.environ.get("PODCAST_CONFIG_FILE")
+CONFIG_KEYS = {
+    "endpoint": "AZURE_OPENAI_ENDPOINT",
+    "api_key": "AZURE_OPENAI_API_KEY",
+    "deployment": "AZURE_OPENAI_DEPLOYMENT",
+    "api_version": "AZURE_OPENAI_API_VERSION",
+}
+
+
+class ConfigError(RuntimeError):
+    pass
+
+
+def normalize_keys(values):
+    """
+    values with attribute names (endpoint, api_key, ...) renamed to their
+    AZURE_OPENAI_* names, so sources can be merged by precedence alone. A
+    value under the AZURE_OPENAI_* name wins over the attribute name.
+    """
+    normalized = {CONFIG_KEYS.get(name, name): value for name, value in values.items() if name in CONFIG_KEYS}
+    normalized.update({key: value for key, value in values.items() if key not in CONFIG_KEYS})
+    return normalized
+
+
+class AzureConfig:
+    """
+    Endpoint, key, chat deployment and API version of the Azure OpenAI resource.
+    """
+
+    def __init__(self, endpoint, api_key, deployment, api_version):
+        self.endpoint = endpoint if endpoint.endswith("/") else endpoint + "/"
+        self.api_key = api_key
+        self.deployment = deployment
+        self.api_version = api_version
+
+    @classmethod
+    def from_mapping(cls, values):
+        """
+        Build from a mapping keyed by either the attribute or the AZURE_OPENAI_* names.
+        """
+        values = normalize_keys(values)
+        resolved = {name: values.get(key) for name, key in CONFIG_KEYS.items()}
+        missing = [CONFIG_KEYS[name] for name, value in resolved.items() if not value]
+        if missing:
+            raise ConfigError(f"Missing Azure OpenAI settings: {', '.join(missing)}. Set them as environment "
+                              f"variables, in a config file (PODCAST_CONFIG_FILE) or in Streamlit secrets.")
+        return cls(**resolved)
+
+    def url(self, deployment, path):
+        return f"{self.endpoint}openai/deployments/{deployment}/{path}?api-version={self.api_version}"
+
+    @property
+    def headers(self):
+        return {"Content-Type": "application/json", "api-key": self.api_key}
+
+
+def read_config_file(path):
+    """
+    Settings from a .toml or .json file.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    import tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _streamlit_secrets():
+    # Only consulted when Streamlit is already loaded; never imported just for this
+    if "streamlit" not in sys.modules:
+        return {}
+    try:
+        secrets = sys.modules["streamlit"].secrets
+        return {key: secrets[key] for key in CONFIG_KEYS.values() if key in secrets}
+    except Exception:
+        return {}
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Resolve the settings from the environment, the config file and Streamlit secrets.
+    """
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    values = dict(_streamlit_secrets())
+    if path:
+        values.update(normalize_keys(read_config_file(path)))
+    values.update({key: os.environ[key] for key in CONFIG_KEYS.values() if os.environ.get(key)})
+    return AzureConfig.from_mapping(values)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def configure(config=None, **values):
+    """
+    Set the settings explicitly: an AzureConfig, a mapping, a config file path,
+    or keyword values (endpoint=..., api_key=..., ...). Returns the AzureConfig.
+    """
+    global _config
+    if isinstance(config, str):
+        config = read_config_file(config)
+    if not isinstance(config, AzureConfig):
+        config = AzureConfig.from_mapping({**normalize_keys(config or {}), **normalize_keys(values)})
+    with _config_lock:
+        _config = config
+    return config
+
+
+def get_config():
+    """
+    The configured settings, loaded on first use.
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_config()
+        return _config
@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import threading
+import email.utils
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+from scheduler import get_scheduler
+
+# Shared HTTP client for every Azure OpenAI call.
+# One pooled Session keeps TCP+TLS connections alive between requests, and
+# throttled (429) or failed (5xx, connection errors) requests are retried with
+# jittered exponential backoff that honors the server's Retry-After hint.
+# Every attempt waits for its deployment's quota in the scheduler, which is
+# where request rate limits live.
+# Every attempt is reported to metrics (latency, status, bytes, retries).
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("AZURE_HTTP_CONNECT_TIMEOUT", 10))
+HTTP_READ_TIMEOUT = float(os.environ.get("AZURE_HTTP_READ_TIMEOUT", 300))
+HTTP_POOL_SIZE = int(os.environ.get("AZURE_HTTP_POOL_SIZE", 16))
+HTTP_MAX_RETRIES = int(os.environ.get("AZURE_HTTP_MAX_RETRIES", 5))
+HTTP_BACKOFF_BASE = 0.5   # seconds
+HTTP_BACKOFF_MAX = 30.0   # seconds
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+QUEUED_MIN_WAIT = 0.05    # seconds; shorter scheduler waits are lock handoffs, not queueing
+
+
+def parse_retry_after(response):
+    """
+    Seconds the server asked us to wait, or None if it gave no usable hint.
+    """
+    # Azure OpenAI sends a millisecond-precision variant alongside the standard header
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AzureHTTPClient:
+    """
+    Pooled requests Session with timeouts, retries and retry/throttle counters.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 max_retries=HTTP_MAX_RETRIES, backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX,
+                 scheduler=None):
+        self.timeout = timeout
+        self.scheduler = scheduler or get_scheduler()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttles": 0, "server_errors": 0,
+                      "connection_errors": 0, "failures": 0, "queued": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        """
+        Copy of the counters, safe to read while requests are in flight.
+        """
+        with self._lock:
+            return dict(self.stats)
+
+    def backoff(self, attempt):
+        """
+        Full-jitter exponential backoff delay for the given retry attempt.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, url, **kwargs):
+        """
+        POST with retries. Returns the final response; callers still check its status.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        files = kwargs.get("files") or {}
+
+        for attempt in range(self.max_retries + 1):
+            # Uploaded file objects must be re-read from the start on every attempt
+            for value in files.values():
+                handle = value[1] if isinstance(value, tuple) else value
+                if hasattr(handle, "seek"):
+                    handle.seek(0)
+
+            if self.scheduler.acquire(url, kwargs.get("json"), files) >= QUEUED_MIN_WAIT:
+                self._count("queued")
+            self._count("requests")
+            started = time.perf_counter()
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.record_request(url, "error", time.perf_counter() - started, retry=attempt > 0)
+                self._count("connection_errors")
+                if attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                metrics.record_request(url, response.status_code, time.perf_counter() - started,
+                                       _body_size(response.request.body), _response_size(response, kwargs.get("stream")),
+                                       retry=attempt > 0)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                retry_after = parse_retry_after(response)
+                if response.status_code == 429:
+                    self._count("throttles")
+                    self.scheduler.throttled(url, retry_after)
+                else:
+                    self._count("server_errors")
+                if attempt == self.max_retries:
+                    self._count("failures")
+                    return response
+                # The server's hint is honored in full; only our own backoff is capped
+                delay = retry_after if retry_after is not None else self.backoff(attempt)
+                response.close()
+
+            self._count("retries")
+            time.sleep(delay)
+
+
+def _body_size(body):
+    return len(body) if isinstance(body, (bytes, str)) else 0
+
+
+def _response_size(response, streamed):
+    # A streamed body has not been read yet; only its declared length is known
+    if streamed:
+        return int(response.headers.get("Content-Length") or 0)
+    return len(response.content)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide client shared by all Azure calls.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AzureHTTPClient()
+        return _client
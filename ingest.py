@@ -0,0 +1,235 @@
+import os
+import re
+import tempfile
+import subprocess
+import urllib.parse
+import requests
+import mp3
+import metrics
+from cache import get_cache, file_digest
+from audio_preprocess import PREPROCESS_SAMPLE_RATE, PREPROCESS_BITRATE_KBPS, whisper_encoder_args
+
+# Whisper only needs mono 16 kHz speech, so YouTube audio is converted straight
+# to a small MP3 instead of a 192 kbps stereo re-encode. In streaming mode the
+# audio is cut into segments while it downloads, and each finished segment is
+# handed to transcription immediately. FFmpeg cuts at fixed times, which can
+# split a word, so each segment is cut again at the quietest point of its last
+# seconds and the rest is moved to the start of the next one. Segments do not
+# overlap: their transcripts are joined as they are.
+STREAM_SEGMENT_SECONDS = 300
+STREAM_PAUSE_SEARCH_MS = 10 * 1000  # how far back from a segment's end to look for a pause
+YOUTUBE_STREAMING = os.environ.get("PODCAST_YOUTUBE_STREAMING", "1") != "0"
+DOWNLOAD_BLOCK = 1024 * 1024
+
+
+# Parse the video ID from a YouTube URL without a network round-trip
+def youtube_video_id(url):
+    match = re.search(r'(?:v=|youtu\.be/|shorts/|embed/)([\w-]{11})', url)
+    return match.group(1) if match else None
+
+
+def is_youtube_url(source):
+    return "youtube.com" in source or "youtu.be" in source
+
+
+def is_youtube_collection(url):
+    """
+    True for playlist and channel URLs (as opposed to a single video).
+    """
+    return is_youtube_url(url) and bool(re.search(r'[?&]list=|/playlist|/@|/channel/|/c/|/user/', url))
+
+
+def list_youtube_videos(url):
+    """
+    Videos of a playlist or channel as dicts with source, title and duration
+    (seconds, may be None), read from the flat listing without downloading.
+    """
+    # A bare channel URL lists its tabs; ask for the uploads instead
+    if re.search(r'/(@[^/?]+|channel/[^/?]+|c/[^/?]+|user/[^/?]+)/?$', url):
+        url = url.rstrip('/') + '/videos'
+    with _youtube_dl(extract_flat='in_playlist') as ydl:
+        info = ydl.extract_info(url, download=False)
+    videos = []
+    for entry in info.get('entries') or []:
+        if entry and entry.get('id'):
+            videos.append({
+                "source": f"https://www.youtube.com/watch?v={entry['id']}",
+                "title": entry.get('title') or entry['id'],
+                "duration": entry.get('duration'),
+            })
+    return videos
+
+
+def download_audio_url(url, out_dir, block_size=DOWNLOAD_BLOCK):
+    """
+    Stream a direct audio URL (e.g. a podcast RSS enclosure) to a file in out_dir.
+    """
+    name = os.path.basename(urllib.parse.urlsplit(url).path) or "episode.mp3"
+    path = os.path.join(out_dir, re.sub(r'[^\w.-]', '_', name))
+    with requests.get(url, stream=True, timeout=(10, 300)) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for block in response.iter_content(block_size):
+                f.write(block)
+    return path
+
+
+def source_identity(source, digest=None):
+    """
+    Stable identity of an episode: the YouTube video ID or the audio content
+    hash (digest, if the caller has already computed it).
+    """
+    if is_youtube_url(source):
+        return "youtube:" + (youtube_video_id(source) or source.split('&')[0])
+    return "sha256:" + (digest or file_digest(source))
+
+
+def _ydl_opts(**extra):
+    return {'format': 'bestaudio/best', 'quiet': True, 'no_warnings': True, **extra}
+
+
+def _youtube_dl(**extra):
+    # yt-dlp is slow to import, so it is only loaded once YouTube is actually used
+    from yt_dlp import YoutubeDL
+    return YoutubeDL(_ydl_opts(**extra))
+
+
+# Fetch video metadata (title, formats, direct stream URL) once; pass it on to avoid re-extraction
+def fetch_youtube_info(url):
+    with _youtube_dl() as ydl:
+        return ydl.extract_info(url.split('&')[0], download=False)
+
+
+def cached_youtube_title(url):
+    video_id = youtube_video_id(url)
+    if not video_id:
+        return None
+    cached_meta = get_cache().get_json(get_cache().key("youtube_title", video_id=video_id))
+    return cached_meta["title"] if cached_meta else None
+
+
+def remember_youtube_title(url, title):
+    video_id = youtube_video_id(url)
+    if video_id:
+        get_cache().put_json(get_cache().key("youtube_title", video_id=video_id), {"title": title})
+
+
+def cached_youtube_audio(url):
+    """
+    (path, title) of a previously downloaded episode, or (None, None).
+    """
+    cache = get_cache()
+    video_id = youtube_video_id(url)
+    if not video_id:
+        return None, None
+    cached_path = cache.get_path(_audio_key(cache, video_id))
+    cached_title = cached_youtube_title(url)
+    if cached_path and cached_title:
+        return cached_path, cached_title
+    return None, None
+
+
+def _audio_key(cache, video_id):
+    return cache.key("youtube_audio", video_id=video_id, codec="mp3", sample_rate=PREPROCESS_SAMPLE_RATE,
+                     channels=1, bitrate=PREPROCESS_BITRATE_KBPS) + ".mp3"
+
+
+def stream_youtube_audio(info, out_dir, segment_seconds=STREAM_SEGMENT_SECONDS):
+    """
+    Download and convert the audio stream with FFmpeg, yielding the path of each
+    mono 16 kHz MP3 segment as soon as FFmpeg finishes writing it. Segments
+    are consecutive and end at a pause; the audio after the last one's pause
+    comes as a short final segment.
+    """
+    from audio_trim import split_at_pause
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    headers = info.get('http_headers') or {}
+    if headers:
+        cmd += ['-headers', ''.join(f"{name}: {value}\r\n" for name, value in headers.items())]
+    cmd += ['-i', info['url']] + whisper_encoder_args() + [
+        '-f', 'segment', '-segment_time', str(segment_seconds), '-reset_timestamps', '1',
+        # FFmpeg prints each segment name here once the segment is complete
+        '-segment_list', 'pipe:1', '-segment_list_type', 'flat',
+        os.path.join(out_dir, 'segment_%04d.mp3'),
+    ]
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    carried = b""  # audio after the previous segment's pause
+    try:
+        for line in process.stdout:
+            name = line.strip()
+            if name:
+                path = os.path.join(out_dir, os.path.basename(name))
+                with open(path, "rb") as f:
+                    data = mp3.concat([carried, f.read()])
+                data, carried = split_at_pause(data, STREAM_PAUSE_SEARCH_MS)
+                with open(path, "wb") as f:
+                    f.write(data)
+                yield path
+        if process.wait() != 0:
+            raise RuntimeError(f"FFmpeg streaming failed: {process.stderr.read().strip()}")
+        if carried:
+            path = os.path.join(out_dir, "segment_end.mp3")
+            with open(path, "wb") as f:
+                f.write(carried)
+            yield path
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+# Audio extraction from YouTube; progress is an optional callback(fraction, text)
+def extract_audio_from_youtube(url, progress=None, info=None, work_dir=None):
+    # Remove unnecessary URL parameters
+    url = url.split('&')[0]
+
+    # Serve previously downloaded episodes straight from the cache
+    cached_path, cached_title = cached_youtube_audio(url)
+    if cached_path:
+        if progress:
+            progress(0.6, "Loaded audio from cache")
+        return cached_path, cached_title
+
+    temp_dir = tempfile.mkdtemp(prefix="youtube_", dir=work_dir)
+    audio_file_path = os.path.join(temp_dir, '%(title)s.%(ext)s')
+
+    ydl_options = dict(
+        outtmpl=audio_file_path,
+        postprocessors=[{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': str(PREPROCESS_BITRATE_KBPS),
+        }],
+        postprocessor_args={'extractaudio': ['-ac', '1', '-ar', str(PREPROCESS_SAMPLE_RATE)]},
+    )
+
+    # Update progress
+    if progress:
+        progress(0.2, "Fetching video information...")
+
+    with _youtube_dl(**ydl_options) as ydl:
+        if info is None:
+            info = ydl.extract_info(url, download=False)
+        title = info.get('title', 'Unknown Title')
+
+        if progress:
+            progress(0.3, f"Downloading audio from '{title}'...")
+
+        # Reuse the metadata we already have instead of extracting it a second time
+        info_dict = ydl.process_ie_result(info, download=True)
+        downloaded_file = ydl.prepare_filename(info_dict).rsplit('.', 1)[0] + ".mp3"
+
+        if progress:
+            progress(0.6, "Audio extraction complete")
+
+    if not os.path.exists(downloaded_file):
+        raise RuntimeError("Audio extraction failed. File not found.")
+    metrics.record(bytes_out=os.path.getsize(downloaded_file))
+
+    video_id = youtube_video_id(url)
+    if video_id:
+        cache = get_cache()
+        downloaded_file = cache.put_file(_audio_key(cache, video_id), downloaded_file, move=True)
+        remember_youtube_title(url, title)
+    return downloaded_file, title
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import mp3
+from ingest import source_identity
+from pipeline import process_podcast
+from media_server import get_artifact_store, get_live_stream, open_live_stream
+from workspace import get_workspace_manager
+
+# Background job subsystem.
+# Jobs are persisted in SQLite so any script run, tab or browser refresh can
+# look them up by ID, and executed by a local worker pool instead of inside
+# the Streamlit script thread. Identical in-flight jobs are deduplicated.
+# While the summary is being spoken, its finished audio segments are appended
+# to a live stream on the media server so the UI can start playback early.
+# Several processes may share the database: each one regularly touches
+# updated_at of the jobs it holds (queued or running), and a job whose
+# heartbeat has stopped (its process died) is reclaimed by whichever process
+# notices first.
+JOBS_DB = os.environ.get("PODCAST_JOBS_DB", os.path.join(".cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("PODCAST_JOB_WORKERS", 2))
+JOB_HEARTBEAT = int(os.environ.get("PODCAST_JOB_HEARTBEAT", 15))  # seconds
+JOB_STALE_AFTER = 4 * JOB_HEARTBEAT  # seconds without a heartbeat before a job is reclaimed
+ACTIVE_STATUSES = ("queued", "running")
+
+# Progress fraction and label recorded when each pipeline stage starts
+STAGE_PROGRESS = {
+    "download": (0.1, "Extracting audio from YouTube..."),
+    "preprocess": (0.2, "Optimizing audio for transcription..."),
+    "transcribe": (0.3, "Transcribing audio..."),
+    "summarize": (0.6, "Summarizing transcript..."),
+    "tts": (0.8, "Converting summary to speech..."),
+}
+
+
+class JobStore:
+    """
+    SQLite table of jobs with their status, progress and result.
+    """
+
+    def __init__(self, db_path=JOBS_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    dedup_key TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def insert_or_get_active(self, dedup_key, source, title):
+        """
+        Create a queued job, or return the ID of an identical queued/running one.
+        Returns (job_id, created).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                    (dedup_key, *ACTIVE_STATUSES)).fetchone()
+                if row:
+                    self._conn.execute("COMMIT")
+                    return row["id"], False
+                job_id = uuid.uuid4().hex
+                now = time.time()
+                self._conn.execute(
+                    "INSERT INTO jobs (id, dedup_key, source, title, status, message, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', 'Waiting for a worker...', ?, ?)",
+                    (job_id, dedup_key, source, title, now, now))
+                self._conn.execute("COMMIT")
+                return job_id, True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(rows[0])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def touch(self, job_ids):
+        """
+        Record a heartbeat for jobs this process holds.
+        """
+        if job_ids:
+            job_ids = list(job_ids)
+            self._execute(f"UPDATE jobs SET updated_at = ? WHERE id IN ({', '.join('?' * len(job_ids))})",
+                          (time.time(), *job_ids))
+
+    def claim_stale(self, stale_after=JOB_STALE_AFTER):
+        """
+        Requeue the active jobs without a heartbeat for stale_after seconds and
+        return their IDs, oldest first. The claim is atomic, so a job is never
+        taken over by two processes.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                job_ids = [row["id"] for row in self._conn.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ? ORDER BY created_at",
+                    (*ACTIVE_STATUSES, now - stale_after)).fetchall()]
+                for job_id in job_ids:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', progress = 0, message = 'Resuming after restart...', "
+                        "updated_at = ? WHERE id = ?", (now, job_id))
+                self._conn.execute("COMMIT")
+                return job_ids
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class JobManager:
+    """
+    Submit podcast jobs to a local worker pool and query their state.
+    """
+
+    def __init__(self, db_path=JOBS_DB, max_workers=JOB_WORKERS, heartbeat=JOB_HEARTBEAT,
+                 stale_after=JOB_STALE_AFTER):
+        self.store = JobStore(db_path)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="podcast-job")
+        # Job ID -> ID of the live stream of its audio summary (in-process only). The
+        # media server owns the stream and drops it LIVE_STREAM_TTL after it closes.
+        self._live_stream_ids = {}
+        self._held = set()  # IDs of the jobs queued or running in this process
+        self._held_lock = threading.Lock()
+        # Jobs of processes that died (including an earlier run of this one) are picked up again
+        self.stale_after = stale_after
+        self._claim_stale()
+        threading.Thread(target=self._heartbeat_loop, args=(heartbeat,), daemon=True,
+                         name="podcast-job-heartbeat").start()
+
+    def _enqueue(self, job_id):
+        with self._held_lock:
+            self._held.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _claim_stale(self):
+        for job_id in self.store.claim_stale(self.stale_after):
+            self._enqueue(job_id)
+
+    def _heartbeat_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self._held_lock:
+                    held = set(self._held)
+                self.store.touch(held)
+                self._claim_stale()
+            except sqlite3.Error:
+                pass  # the database is busy or locked; try again next time
+
+    def submit(self, source, title=None, digest=None):
+        """
+        Queue a job for source (YouTube URL or audio path) and return its ID.
+        digest is the SHA-256 of an audio file, if already known (e.g. from
+        Workspace.spool). Submitting the same episode while it is still in
+        flight returns the existing job.
+        """
+        job_id, created = self.store.insert_or_get_active(source_identity(source, digest), source, title)
+        if created:
+            self._enqueue(job_id)
+        return job_id
+
+    def status(self, job_id):
+        """
+        The job record: status, progress (0-1), message, result/error once
+        finished, and live_stream_id once the first audio segment is ready.
+        """
+        job = self.store.get(job_id)
+        if job:
+            stream_id = self._live_stream_ids.get(job_id)
+            if stream_id and get_live_stream(stream_id) is None:
+                self._live_stream_ids.pop(job_id, None)  # expired
+                stream_id = None
+            job["live_stream_id"] = stream_id
+        return job
+
+    def progress(self, job_id):
+        job = self.store.get(job_id)
+        return (job["progress"], job["message"]) if job else (None, None)
+
+    def result(self, job_id):
+        """
+        The pipeline result dict of a finished job, or None if it is not done.
+        """
+        job = self.store.get(job_id)
+        return job["result"] if job and job["status"] == "done" else None
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        self.store.update(job_id, status="running", message="Starting...")
+        chunks_done = [0]
+        live_stream = [None]
+
+        def on_event(event):
+            if event["type"] == "stage" and event["status"] == "started" and event["stage"] in STAGE_PROGRESS:
+                progress, message = STAGE_PROGRESS[event["stage"]]
+                self.store.update(job_id, progress=progress, message=message)
+            elif event["type"] == "progress":
+                self.store.update(job_id, message=event["text"])
+            elif event["type"] == "transcript_chunk":
+                chunks_done[0] += 1
+                self.store.update(job_id, message=f"Transcribing audio... ({chunks_done[0]} parts done)")
+            elif event["type"] == "audio_segment":
+                if live_stream[0] is None:
+                    live_stream[0] = open_live_stream()
+                    self._live_stream_ids[job_id] = live_stream[0].id
+                with open(event["path"], "rb") as f:
+                    live_stream[0].append(mp3.audio_frames(f.read()))
+
+        # Each job works in its own directory, collected in the background once released
+        workspace = get_workspace_manager().create(f"job-{job_id}")
+        try:
+            result = asyncio.run(process_podcast(job["source"], title=job["title"], on_event=on_event,
+                                                 workspace=workspace, identity=job["dedup_key"]))
+            self._publish(result)
+            self.store.update(job_id, status="done", progress=1.0, message="Done", result=json.dumps(result))
+        except Exception as e:
+            self.store.update(job_id, status="failed", message=str(e), error=traceback.format_exc())
+        finally:
+            if live_stream[0] is not None:
+                live_stream[0].close()
+            workspace.release()
+            with self._held_lock:
+                self._held.discard(job_id)
+
+    def _publish(self, result):
+        # Register the outputs with the media server so the UI can link them by ID
+        store = get_artifact_store()
+        name = (result["title"] or "podcast").replace(" ", "_")
+        result["text_artifact_id"] = store.put_text(result["summary"], f"{name}_summary.txt")
+        result["audio_artifact_id"] = None
+        if result["audio_summary_path"]:
+            result["audio_artifact_id"] = store.put_file(result["audio_summary_path"], "audio/mpeg", f"{name}_summary.mp3")
+        for output_name, output in result.get("outputs", {}).items():
+            if output.get("error"):
+                continue
+            output["text_artifact_id"] = store.put_text(output["text"], f"{name}_{output_name}.txt")
+            output["audio_artifact_id"] = None
+            if output.get("audio_path"):
+                output["audio_artifact_id"] = store.put_file(output["audio_path"], "audio/mpeg",
+                                                             f"{name}_{output_name}.mp3")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """
+    Process-wide job manager configured from PODCAST_JOBS_DB / PODCAST_JOB_WORKERS.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
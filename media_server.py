@@ -0,0 +1,361 @@
+import os
+import re
+import json
+import mmap
+import uuid
+import shutil
+import time
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import metrics
+from cache import CACHE_MAX_AGE, CACHE_MAX_BYTES, EVICT_INTERVAL, file_digest, text_digest
+
+# Artifact store + streaming media endpoint.
+# Finished summaries are stored once under a content-derived ID and served
+# over HTTP with Range support straight from a memory map, so the results page
+# only embeds a URL: reruns never re-read, base64-encode or resend the audio.
+# Audio that is still being synthesized is served from a live stream: one
+# response that carries each segment as it is appended and ends on close().
+# GET /metrics exports the pipeline metrics for Prometheus.
+# Artifacts are evicted like cache entries (by age and total size) and the
+# server only listens on the loopback interface unless told otherwise: it has
+# no authentication.
+ARTIFACT_DIR = os.environ.get("PODCAST_ARTIFACT_DIR", os.path.join(".cache", "artifacts"))
+ARTIFACT_MAX_BYTES = int(os.environ.get("PODCAST_ARTIFACT_MAX_BYTES", CACHE_MAX_BYTES))
+ARTIFACT_MAX_AGE = int(os.environ.get("PODCAST_ARTIFACT_MAX_AGE", CACHE_MAX_AGE))  # since last published
+MEDIA_HOST = os.environ.get("PODCAST_MEDIA_HOST", "127.0.0.1")
+MEDIA_PORT = int(os.environ.get("PODCAST_MEDIA_PORT", 8502))
+# Public address of the media server as seen by the browser, e.g.
+# http://localhost:8502 when app and browser share a machine. Unset, nothing
+# links to the server (remote browsers could not reach it) and the app serves
+# media through Streamlit.
+MEDIA_BASE_URL = os.environ.get("PODCAST_MEDIA_BASE_URL", "")
+SEND_BLOCK = 256 * 1024
+LIVE_STREAM_TTL = 3600  # seconds a closed live stream stays available for replay
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ArtifactStore:
+    """
+    Directory of immutable artifacts addressed by the hash of their content,
+    with size- and age-based eviction.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR, max_bytes=ARTIFACT_MAX_BYTES, max_age=ARTIFACT_MAX_AGE):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, artifact_id):
+        return os.path.join(self.root, artifact_id)
+
+    def put_file(self, file_path, content_type="audio/mpeg", filename=None):
+        """
+        Store a file (hard-linked when possible, otherwise copied) and return its ID.
+        """
+        artifact_id = file_digest(file_path)[:32]
+        path = self._path(artifact_id)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                os.link(file_path, tmp_path)
+            except OSError:
+                shutil.copyfile(file_path, tmp_path)
+            os.replace(tmp_path, path)
+        self._write_meta(artifact_id, content_type, filename or os.path.basename(file_path))
+        return artifact_id
+
+    def put_text(self, text, filename, content_type="text/plain; charset=utf-8"):
+        """
+        Store a string as UTF-8 and return its ID.
+        """
+        artifact_id = text_digest(text)[:32]
+        path = self._path(artifact_id)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(text.encode("utf-8"))
+            os.replace(tmp_path, path)
+        self._write_meta(artifact_id, content_type, filename)
+        return artifact_id
+
+    def _write_meta(self, artifact_id, content_type, filename):
+        # The metadata file is rewritten on every put, so its mtime is when the artifact was last published
+        with open(self._path(artifact_id) + ".json", "w", encoding="utf-8") as f:
+            json.dump({"content_type": content_type, "filename": filename}, f)
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop artifacts not published for max_age, then the least recently
+        published ones until under max_bytes.
+        """
+        with self._lock:
+            self._last_evict = time.time()
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith(".tmp"):
+                    # Leftover from an interrupted write
+                    try:
+                        if self._last_evict - os.stat(path).st_mtime > 3600:
+                            self._remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if not _ID_PATTERN.match(name):
+                    continue
+                try:
+                    size = os.stat(path).st_size
+                except OSError:
+                    continue
+                try:
+                    published = os.stat(path + ".json").st_mtime
+                except OSError:
+                    published = 0.0  # no metadata: the artifact cannot be served
+                if self._last_evict - published > self.max_age:
+                    self._remove(path)
+                else:
+                    entries.append((published, size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        # Responses already streaming the artifact keep their open file
+        for file_path in (path, path + ".json"):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def get(self, artifact_id):
+        """
+        (path, metadata) of an artifact, or (None, None) if the ID is unknown.
+        """
+        if not _ID_PATTERN.match(artifact_id or ""):
+            return None, None
+        path = self._path(artifact_id)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except OSError:
+            return None, None
+        return (path, meta) if os.path.exists(path) else (None, None)
+
+
+class LiveStream:
+    """
+    Audio that is still being produced. Every listener gets everything
+    appended so far, then each new chunk as it arrives, until close().
+    """
+
+    def __init__(self, content_type="audio/mpeg"):
+        self.id = uuid.uuid4().hex
+        self.content_type = content_type
+        self.closed = False
+        self._chunks = []
+        self._condition = threading.Condition()
+
+    def append(self, data):
+        with self._condition:
+            self._chunks.append(data)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        # Kept for replays for a while, then unregistered
+        expiry = threading.Timer(LIVE_STREAM_TTL, _live_streams.pop, (self.id, None))
+        expiry.daemon = True
+        expiry.start()
+
+    def iter_chunks(self):
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: index < len(self._chunks) or self.closed)
+                chunks = self._chunks[index:]
+                if not chunks and self.closed:
+                    return
+            index += len(chunks)
+            yield from chunks
+
+
+_live_streams = {}
+_live_streams_lock = threading.Lock()
+
+
+def open_live_stream(content_type="audio/mpeg"):
+    """
+    Register a new LiveStream; it is dropped LIVE_STREAM_TTL seconds after it is closed.
+    """
+    stream = LiveStream(content_type)
+    with _live_streams_lock:
+        _live_streams[stream.id] = stream
+    return stream
+
+
+def get_live_stream(stream_id):
+    with _live_streams_lock:
+        return _live_streams.get(stream_id)
+
+
+def live_stream_url(stream_id):
+    return f"{MEDIA_BASE_URL.rstrip('/')}/live/{stream_id}"
+
+
+def artifact_url(artifact_id, download_name=None):
+    """
+    Browser URL of an artifact; with download_name the response is sent as an attachment.
+    """
+    url = f"{MEDIA_BASE_URL.rstrip('/')}/artifacts/{artifact_id}"
+    if download_name:
+        url += "?" + urllib.parse.urlencode({"download": download_name})
+    return url
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET/HEAD /artifacts/<id>[?download=name] with single byte-range support,
+    GET/HEAD /live/<id> for live streams and GET /metrics (Prometheus text format).
+    """
+    store = None
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/metrics":
+            self._serve_metrics(send_body)
+            return
+        live = re.match(r"^/live/([0-9a-f]{32})$", url.path)
+        if live:
+            self._serve_live(get_live_stream(live.group(1)), send_body)
+            return
+        match = re.match(r"^/artifacts/([^/]+)$", url.path)
+        path, meta = self.store.get(match.group(1)) if match else (None, None)
+        if path is None:
+            self.send_error(404)
+            return
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start, end = 0, size - 1
+            status = 200
+
+            requested = _RANGE_PATTERN.match(self.headers.get("Range", ""))
+            if requested and size:
+                first, last = requested.groups()
+                if first:
+                    start, end = int(first), min(int(last), size - 1) if last else size - 1
+                elif last:
+                    start = max(size - int(last), 0)
+                if start > end or start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+
+            self.send_response(status)
+            self.send_header("Content-Type", meta["content_type"])
+            self.send_header("Content-Length", str(end - start + 1 if size else 0))
+            self.send_header("Accept-Ranges", "bytes")
+            # Content-addressed, so the browser may cache it forever
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.send_header("ETag", f'"{match.group(1)}"')
+            self.send_header("Access-Control-Allow-Origin", "*")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            download = urllib.parse.parse_qs(url.query).get("download")
+            if download:
+                filename = urllib.parse.quote(download[0])
+                self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{filename}")
+            self.end_headers()
+
+            if not send_body or not size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(start, end + 1, SEND_BLOCK):
+                        self.wfile.write(view[offset:min(offset + SEND_BLOCK, end + 1)])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the player seeked or closed the connection
+                finally:
+                    view.release()
+
+    def _serve_metrics(self, send_body):
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _serve_live(self, stream, send_body):
+        if stream is None:
+            self.send_error(404)
+            return
+        # Length unknown until the stream closes: the body ends with the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", stream.content_type)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            for chunk in stream.iter_chunks():
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_media_server(store, host=MEDIA_HOST, port=MEDIA_PORT):
+    """
+    Serve store on a background thread and return the server.
+    """
+    handler = type("BoundMediaRequestHandler", (MediaRequestHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="media-server").start()
+    return server
+
+
+_store = None
+
+
+def get_artifact_store():
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import contextlib
+import contextvars
+
+# Pipeline instrumentation.
+# Every run records a trace: one span per stage (download, preprocess,
+# transcribe, index, summarize, mood, tts, postprocess) with its wall time, bytes in
+# and out, tokens, and the count, retries and latency of its Azure requests.
+# The current span travels with the code through contextvars; work handed to
+# another thread is wrapped with bind() so it is attributed to the same stage.
+# Finished traces are appended to a JSON-lines file and aggregated into a
+# process-wide registry that is exported in the Prometheus text format.
+TRACE_FILE = os.environ.get("PODCAST_TRACE_FILE", os.path.join(".cache", "traces.jsonl"))  # "" = no trace file
+STAGES = ("download", "captions", "preprocess", "transcribe", "index", "summarize", "mood", "tts", "postprocess", "outputs")
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+API_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SPAN_COUNTERS = ("bytes_in", "bytes_out", "tokens_in", "tokens_out", "requests", "retries", "api_seconds",
+                 "queue_seconds")
+
+
+class Registry:
+    """
+    Counters, gauges and histograms with labels, rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self._buckets = {}
+
+    def describe(self, name, help_text, buckets=None):
+        self._help[name] = help_text
+        if buckets:
+            self._buckets[name] = buckets
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets[name]
+        with self._lock:
+            counts, total, count = self._histograms.get(key, ([0] * len(buckets), 0.0, 0))
+            counts = [n + (value <= bound) for n, bound in zip(counts, buckets)]
+            self._histograms[key] = (counts, total + value, count + 1)
+
+    def prometheus_text(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+
+        lines = []
+        for name in sorted({key[0] for key in counters}):
+            lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} counter"]
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for name in sorted({key[0] for key in gauges}):
+            lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} gauge"]
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for name in sorted({key[0] for key in histograms}):
+            lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} histogram"]
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, n in zip(self._buckets[name], counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {n}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+REGISTRY.describe("podcast_runs_total", "Pipeline runs by outcome.")
+REGISTRY.describe("podcast_stage_seconds", "Wall time of a pipeline stage per run.", STAGE_BUCKETS)
+REGISTRY.describe("podcast_stage_bytes_in_total", "Bytes consumed by a stage (files read, API responses).")
+REGISTRY.describe("podcast_stage_bytes_out_total", "Bytes produced by a stage (files written, API uploads).")
+REGISTRY.describe("podcast_stage_tokens_total", "Chat tokens by stage and direction (prompt/completion).")
+REGISTRY.describe("podcast_api_requests_total", "Azure OpenAI requests by endpoint and HTTP status.")
+REGISTRY.describe("podcast_api_retries_total", "Azure OpenAI requests that were retries.")
+REGISTRY.describe("podcast_api_latency_seconds", "Azure OpenAI request latency.", API_BUCKETS)
+
+
+class Span:
+    """
+    Accumulated measurements of one stage of one run. A stage may be entered
+    several times, also concurrently; seconds is the wall time during which
+    at least one entry was active.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.active = 0
+        self.opened = None
+        self.busy = 0.0
+        self.errors = 0
+        self.counts = dict.fromkeys(SPAN_COUNTERS, 0)
+
+    @property
+    def seconds(self):
+        return self.busy + (time.perf_counter() - self.opened if self.active else 0.0)
+
+    def as_dict(self):
+        return {"stage": self.stage, "seconds": round(self.seconds, 4), "errors": self.errors,
+                **{name: round(value, 4) if isinstance(value, float) else value for name, value in self.counts.items()}}
+
+
+class Trace:
+    """
+    The spans of one pipeline run.
+    """
+
+    def __init__(self, source=None):
+        self.run_id = uuid.uuid4().hex
+        self.source = source
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def _span(self, stage):
+        with self._lock:
+            if stage not in self.spans:
+                self.spans[stage] = Span(stage)
+            return self.spans[stage]
+
+    def enter(self, stage):
+        span = self._span(stage)
+        with self._lock:
+            if span.active == 0:
+                span.opened = time.perf_counter()
+            span.active += 1
+        return span
+
+    def exit(self, span, failed=False):
+        with self._lock:
+            span.active -= 1
+            if span.active == 0:
+                span.busy += time.perf_counter() - span.opened
+            span.errors += failed
+
+    def add(self, stage, **counts):
+        span = self._span(stage)
+        with self._lock:
+            for name, value in counts.items():
+                span.counts[name] += value
+
+    def summary(self):
+        """
+        {stage: span dict} in pipeline order.
+        """
+        with self._lock:
+            spans = list(self.spans.values())
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        return {span.stage: span.as_dict() for span in sorted(spans, key=lambda span: order.get(span.stage, len(order)))}
+
+    def finish(self, error=None, path=TRACE_FILE):
+        """
+        Record the run in the registry and append it to the trace file. Returns the record.
+        """
+        record = {
+            "run_id": self.run_id,
+            "source": self.source,
+            "started_at": self.started_at,
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "status": "failed" if error else "done",
+            "error": (str(error) or type(error).__name__) if error else None,
+            "stages": self.summary(),
+        }
+        REGISTRY.inc("podcast_runs_total", status=record["status"])
+        for stage, span in record["stages"].items():
+            REGISTRY.observe("podcast_stage_seconds", span["seconds"], stage=stage)
+            REGISTRY.inc("podcast_stage_bytes_in_total", span["bytes_in"], stage=stage)
+            REGISTRY.inc("podcast_stage_bytes_out_total", span["bytes_out"], stage=stage)
+            REGISTRY.inc("podcast_stage_tokens_total", span["tokens_in"], stage=stage, direction="prompt")
+            REGISTRY.inc("podcast_stage_tokens_total", span["tokens_out"], stage=stage, direction="completion")
+        if path:
+            append_trace(record, path)
+        return record
+
+
+_current = contextvars.ContextVar("podcast_span", default=(None, None))  # (trace, stage)
+_trace_file_lock = threading.Lock()
+
+
+def append_trace(record, path=TRACE_FILE):
+    line = json.dumps(record) + "\n"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _trace_file_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextlib.contextmanager
+def tracing(trace):
+    """
+    Make trace the current trace of this context (task or thread).
+    """
+    token = _current.set((trace, None))
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Attribute the time and everything recorded inside the block to stage
+    `name` of the current trace; a no-op when no trace is active.
+    """
+    trace, _ = _current.get()
+    if trace is None:
+        yield
+        return
+    span = trace.enter(name)
+    token = _current.set((trace, name))
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _current.reset(token)
+        trace.exit(span, failed)
+
+
+def record(**counts):
+    """
+    Add bytes_in/bytes_out/tokens_in/tokens_out/queue_seconds to the current stage.
+    """
+    trace, name = _current.get()
+    if trace is not None and name is not None:
+        trace.add(name, **counts)
+
+
+def current_run_id():
+    """
+    run_id of the trace active in this context, or None outside a run.
+    """
+    trace, _ = _current.get()
+    return trace.run_id if trace is not None else None
+
+
+def endpoint_kind(url):
+    if "/chat/completions" in url:
+        return "chat"
+    if "/audio/transcriptions" in url:
+        return "whisper"
+    if "/audio/speech" in url:
+        return "tts"
+    if "/embeddings" in url:
+        return "embeddings"
+    return "other"
+
+
+def record_request(url, status, seconds, bytes_out=0, bytes_in=0, retry=False):
+    """
+    One HTTP attempt against Azure OpenAI; status is the HTTP status or "error".
+    """
+    endpoint = endpoint_kind(url)
+    REGISTRY.inc("podcast_api_requests_total", endpoint=endpoint, status=status)
+    REGISTRY.observe("podcast_api_latency_seconds", seconds, endpoint=endpoint)
+    if retry:
+        REGISTRY.inc("podcast_api_retries_total", endpoint=endpoint)
+    record(requests=1, retries=int(retry), api_seconds=seconds, bytes_out=bytes_out, bytes_in=bytes_in)
+
+
+def bind(func, stage_name=None):
+    """
+    func wrapped to run in the current trace context (optionally inside stage
+    stage_name) when it is called on another thread.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        if stage_name is None:
+            return context.copy().run(func, *args, **kwargs)
+
+        def staged():
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return context.copy().run(staged)
+
+    return run
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+
+def read_traces(path=TRACE_FILE):
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)] if values else 0.0
+
+
+def summarize_traces(records):
+    """
+    Per-stage aggregates over trace records: runs, p50/p95/mean seconds,
+    share of total run time and the summed counters.
+    """
+    total_seconds = sum(record["seconds"] for record in records) or 1.0
+    rows = []
+    stages = sorted({stage for record in records for stage in record["stages"]},
+                    key=lambda stage: STAGES.index(stage) if stage in STAGES else len(STAGES))
+    for stage in stages:
+        spans = [record["stages"][stage] for record in records if stage in record["stages"]]
+        seconds = [span["seconds"] for span in spans]
+        row = {"stage": stage, "runs": len(spans), "p50_seconds": _percentile(seconds, 0.5),
+               "p95_seconds": _percentile(seconds, 0.95), "mean_seconds": sum(seconds) / len(seconds),
+               "share": sum(seconds) / total_seconds, "errors": sum(span["errors"] for span in spans)}
+        for name in SPAN_COUNTERS:
+            row[name] = sum(span.get(name, 0) for span in spans)
+        rows.append(row)
+    return rows
+
+
+def format_summary(records):
+    rows = summarize_traces(records)
+    done = sum(record["status"] == "done" for record in records)
+    lines = [f"{len(records)} runs ({done} done, {len(records) - done} failed)",
+             f"{'stage':<12}{'runs':>6}{'p50 s':>9}{'p95 s':>9}{'mean s':>9}{'share':>7}{'MB in':>9}{'MB out':>9}"
+             f"{'tokens in':>11}{'tokens out':>11}{'requests':>10}{'retries':>9}{'api s':>9}{'queue s':>9}"]
+    for row in rows:
+        lines.append(f"{row['stage']:<12}{row['runs']:>6}{row['p50_seconds']:>9.1f}{row['p95_seconds']:>9.1f}"
+                     f"{row['mean_seconds']:>9.1f}{row['share']:>7.0%}{row['bytes_in'] / 1e6:>9.1f}"
+                     f"{row['bytes_out'] / 1e6:>9.1f}{row['tokens_in']:>11}{row['tokens_out']:>11}"
+                     f"{row['requests']:>10}{row['retries']:>9}{row['api_seconds']:>9.1f}{row['queue_seconds']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the recorded pipeline traces per stage.")
+    parser.add_argument("--trace", default=TRACE_FILE, help="JSON-lines trace file (default: %(default)s)")
+    parser.add_argument("--last", type=int, help="only the last N runs")
+    parser.add_argument("--source", help="only runs whose source contains this text")
+    args = parser.parse_args(argv)
+
+    records = read_traces(args.trace)
+    if args.source:
+        records = [record for record in records if args.source in (record["source"] or "")]
+    if args.last:
+        records = records[-args.last:]
+    if not records:
+        print(f"No traces in {args.trace}", file=sys.stderr)
+        return 1
+    print(format_summary(records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import re
+
+# How the summary's mood (which picks the TTS voice) is determined:
+#   structured - returned by the summarization request itself (JSON mode), no extra call
+#   separate   - a dedicated chat completion after the summary (the original behavior)
+#   lexicon    - a local word-list classifier, no network call at all
+MOOD_MODES = ("structured", "separate", "lexicon")
+MOOD_MODE = os.environ.get("PODCAST_MOOD_MODE", "structured")
+MOODS = ("joyful", "serious", "neutral")
+LEXICON_MIN_DENSITY = 0.004  # mood words per word needed to leave "neutral"
+LEXICON_MARGIN = 1.5         # how much one side must outweigh the other
+
+JOYFUL_WORDS = {
+    "amazing", "awesome", "celebrate", "celebrated", "celebration", "cheerful", "delight", "delighted",
+    "delightful", "enjoy", "enjoyed", "excited", "exciting", "fantastic", "fun", "funny", "glad", "great",
+    "happy", "hilarious", "inspiring", "joke", "jokes", "joy", "laugh", "laughed", "laughing", "laughter",
+    "love", "loved", "optimistic", "playful", "success", "successful", "thrilled", "win", "winning",
+    "wonderful",
+}
+SERIOUS_WORDS = {
+    "abuse", "attack", "cancer", "collapse", "concern", "concerns", "conflict", "crime", "crisis", "danger",
+    "dangerous", "death", "debt", "died", "disease", "failure", "fraud", "grief", "illness", "killed",
+    "lawsuit", "loss", "pandemic", "poverty", "recession", "risk", "risks", "serious", "suffering",
+    "threat", "threats", "tragedy", "tragic", "trauma", "violence", "war", "warning",
+}
+
+_WORD = re.compile(r"[a-z']+")
+
+
+def normalize_mood(value):
+    """
+    One of MOODS parsed from a model reply ("Serious.", "'joyful'"), or None.
+    """
+    value = re.sub(r"[^a-z]", "", str(value or "").lower())
+    return value if value in MOODS else None
+
+
+def classify_mood(text):
+    """
+    Zero-latency mood estimate from the density of joyful and serious words.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return "neutral"
+    joyful = sum(word in JOYFUL_WORDS for word in words)
+    serious = sum(word in SERIOUS_WORDS for word in words)
+    if max(joyful, serious) / len(words) < LEXICON_MIN_DENSITY:
+        return "neutral"
+    if joyful >= LEXICON_MARGIN * serious:
+        return "joyful"
+    if serious >= LEXICON_MARGIN * joyful:
+        return "serious"
+    return "neutral"
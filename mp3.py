@@ -0,0 +1,119 @@
+# Minimal MPEG audio frame parsing, enough to join and cut MP3 streams on
+# frame boundaries without decoding or re-encoding them.
+
+# Bitrates in kbps indexed by the 4-bit header field, for Layer III
+_BITRATES_V1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+_BITRATES_V2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],   # MPEG-1
+    2: [22050, 24000, 16000],   # MPEG-2
+    0: [11025, 12000, 8000],    # MPEG-2.5
+}
+
+
+def parse_header(data, offset):
+    """
+    Decode the 4-byte Layer III frame header at offset.
+
+    Returns a dict with the frame length, sample rate and samples per frame,
+    or None if there is no valid header there.
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = (data[offset + 2] >> 4) & 0x0F
+    sample_rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = (_BITRATES_V1 if version == 3 else _BITRATES_V2)[bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    samples = 1152 if version == 3 else 576
+    length = samples // 8 * bitrate // sample_rate + padding
+    return {"length": length, "sample_rate": sample_rate, "samples": samples,
+            "channels": 1 if (data[offset + 3] >> 6) == 3 else 2}
+
+
+def id3v2_size(data):
+    """
+    Length of a leading ID3v2 tag (0 if there is none).
+    """
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def iter_frames(data):
+    """
+    Yield (offset, header) for each audio frame, skipping tags and junk between frames.
+    """
+    offset = id3v2_size(data)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    while offset < end:
+        header = parse_header(data, offset)
+        if header is None or offset + header["length"] > end:
+            # Resynchronize on the next plausible frame start
+            offset = data.find(b"\xff", offset + 1, end)
+            if offset < 0:
+                return
+            continue
+        yield offset, header
+        offset += header["length"]
+
+
+def _is_info_frame(data, offset, header):
+    # Xing/Info/VBRI frames carry stream metadata, not audio
+    frame = data[offset:offset + header["length"]]
+    return b"Xing" in frame[:64] or b"Info" in frame[:64] or b"VBRI" in frame[:64]
+
+
+def audio_frames(data):
+    """
+    The raw audio frames of an MP3 file, without ID3 tags or a Xing/Info header frame.
+    """
+    frames = []
+    for index, (offset, header) in enumerate(iter_frames(data)):
+        if index == 0 and _is_info_frame(data, offset, header):
+            continue
+        frames.append(data[offset:offset + header["length"]])
+    return b"".join(frames)
+
+
+def concat(parts):
+    """
+    Join several MP3 files with the same encoding into one stream, frame by
+    frame, so no silence is inserted between them and nothing is re-encoded.
+    """
+    return b"".join(audio_frames(part) for part in parts)
+
+
+def duration_ms(data):
+    """
+    Playback length computed from the frame headers.
+    """
+    return sum(header["samples"] * 1000.0 / header["sample_rate"] for _, header in iter_frames(data))
+
+
+def offset_at(data, ms):
+    """
+    Byte offset of the first frame that starts at or after ms (len(data) if none).
+    """
+    elapsed = 0.0
+    for offset, header in iter_frames(data):
+        if elapsed >= ms:
+            return offset
+        elapsed += header["samples"] * 1000.0 / header["sample_rate"]
+    return len(data)
+
+
+def cut_leading(data, ms):
+    """
+    Drop the whole frames that start before ms, without decoding or re-encoding.
+    """
+    if ms <= 0:
+        return audio_frames(data)
+    return audio_frames(data[offset_at(data, ms):])
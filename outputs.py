@@ -0,0 +1,140 @@
+import os
+import re
+import json
+from azure_openai import chat_completion, SUMMARY_MINUTES
+from transcript_index import format_timestamp
+from ssml import SENTENCE_PAUSE
+
+# Extra versions of the summary, produced by the same run.
+# Every run writes the main SUMMARY_MINUTES-minute summary. Extra outputs are
+# derived from what the run already has instead of summarizing again:
+#   "<N>min"   a spoken summary of another length. Longer ones are written from
+#              the notes the main summary was written from (the combined
+#              segment summaries, or the compacted transcript of a short
+#              episode); shorter ones are condensed from the next longer version.
+#   "bullets"  the main summary as bullet points
+#   "chapters" chapter titles with start times, from the timestamped passages
+#              of the transcript index
+# Each output costs one request on a short input (plus TTS for audio).
+OUTPUTS = os.environ.get("PODCAST_OUTPUTS", "")  # e.g. "1min,15min,bullets,chapters"
+WORDS_PER_MINUTE = 150       # speaking rate the summary lengths are planned for
+SHORT_SUMMARY_MINUTES = 2    # summaries up to this long pause less between sentences
+SHORT_SENTENCE_PAUSE = "500ms"
+OUTLINE_WORDS = 25           # opening words of each passage in the chapter outline
+BULLETS_MAX_TOKENS = 400
+CHAPTERS_MAX_TOKENS = 600
+LONGER_PROMPT = ("Write a {minutes}-minute spoken summary (about {words} words) of a podcast from the notes below. "
+                 "Cover the points in the order of the conversation, in flowing prose with paragraphs separated "
+                 "by blank lines.")
+CONDENSE_PROMPT = ("Condense the following spoken podcast summary into a {minutes}-minute version (about {words} "
+                   "words). Keep the most important points in their order, in flowing prose with paragraphs "
+                   "separated by blank lines.")
+BULLETS_PROMPT = ("Rewrite the following podcast summary as 5 to 10 concise bullet points, one per line, "
+                  "each starting with \"- \".")
+CHAPTERS_PROMPT = ("The following is an outline of a podcast episode: the start time and opening words of each "
+                   "passage. Divide the episode into 3 to 10 chapters. Respond with a JSON object "
+                   "{\"chapters\": [{\"start\": \"m:ss\", \"title\": \"...\"}]}, taking the start times from "
+                   "the outline.")
+
+_LENGTH = re.compile(r"^(\d+(?:\.\d+)?)min$")
+
+
+def parse_outputs(spec):
+    """
+    [{"name", "kind", "minutes"}] from a comma-separated spec (or a list of
+    names) such as "1min,15min,bullets,chapters". Raises ValueError for an
+    unknown output.
+    """
+    names = spec.split(",") if isinstance(spec, str) else list(spec or [])
+    outputs = []
+    for name in (name.strip().lower() for name in names):
+        if not name or any(output["name"] == name for output in outputs):
+            continue
+        match = _LENGTH.match(name)
+        if match:
+            outputs.append({"name": name, "kind": "summary", "minutes": float(match.group(1))})
+        elif name in ("bullets", "chapters"):
+            outputs.append({"name": name, "kind": name, "minutes": None})
+        else:
+            raise ValueError(f"Unknown output '{name}' (expected <N>min, bullets or chapters)")
+    return outputs
+
+
+def summary_words(minutes):
+    return int(minutes * WORDS_PER_MINUTE)
+
+
+def sentence_pause(minutes):
+    """
+    SSML pause after each sentence of a spoken summary of this length.
+    """
+    return SHORT_SENTENCE_PAUSE if minutes and minutes <= SHORT_SUMMARY_MINUTES else SENTENCE_PAUSE
+
+
+def derivation_plan(minutes_wanted, main_minutes=SUMMARY_MINUTES):
+    """
+    [(minutes, source)] in the order to write them: source is "notes" for
+    versions longer than the main summary, otherwise the length of the
+    version to condense (the shortest longer one).
+    """
+    plan, available = [], [main_minutes]
+    for minutes in sorted(set(minutes_wanted) - {main_minutes}, reverse=True):
+        if minutes > main_minutes:
+            plan.append((minutes, "notes"))
+        else:
+            plan.append((minutes, min(length for length in available if length > minutes)))
+        available.append(minutes)
+    return plan
+
+
+def write_summary(source_text, minutes, from_notes):
+    """
+    A spoken summary of about `minutes`, written from the notes or condensed
+    from a longer summary.
+    """
+    words = summary_words(minutes)
+    prompt = (LONGER_PROMPT if from_notes else CONDENSE_PROMPT).format(minutes=f"{minutes:g}", words=words)
+    # Tokens run about 4/3 per word; the margin keeps the last sentence from being cut off
+    return chat_completion(prompt, source_text, int(words * 1.4) + 100).strip()
+
+
+def make_bullets(summary):
+    """
+    The summary as a list of bullet point strings.
+    """
+    reply = chat_completion(BULLETS_PROMPT, summary, BULLETS_MAX_TOKENS)
+    bullets = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in reply.splitlines()]
+    return [bullet for bullet in bullets if bullet]
+
+
+def parse_timestamp(text):
+    """
+    Seconds of an "h:mm:ss" / "m:ss" time, or None.
+    """
+    if not isinstance(text, str) or not re.fullmatch(r"\d+(?::\d{1,2}){1,2}", text.strip()):
+        return None
+    seconds = 0
+    for part in text.strip().split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def make_chapters(passages):
+    """
+    [{"start", "title"}] chapters of an episode from its index passages
+    ({"start", "end", "text"}); start is None when the passages have no times.
+    """
+    outline = "\n".join(f"[{format_timestamp(passage['start'])}] {' '.join(passage['text'].split()[:OUTLINE_WORDS])}"
+                        for passage in passages)
+    reply = chat_completion(CHAPTERS_PROMPT, outline, CHAPTERS_MAX_TOKENS, json_mode=True)
+    try:
+        chapters = json.loads(reply).get("chapters") or []
+    except (ValueError, AttributeError):
+        chapters = []
+    return [{"start": parse_timestamp(chapter.get("start")), "title": str(chapter.get("title", "")).strip()}
+            for chapter in chapters if isinstance(chapter, dict) and chapter.get("title")]
+
+
+def format_chapters(chapters):
+    return "\n".join(f"{format_timestamp(chapter['start'])} {chapter['title']}" if chapter["start"] is not None
+                     else chapter["title"] for chapter in chapters)
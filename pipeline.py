@@ -0,0 +1,738 @@
+import os
+import json
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from azure_openai import (iter_transcript_chunks, iter_transcribe_files, merge_transcripts, merge_segments,
+                          split_transcript, summarize_segment,
+                          combine_summaries, final_summary, summarize_text, detect_mood, format_ssml_text, voice_for_mood,
+                          split_tts_text, render_speech, build_ssml, synthesize_part, TTSPartSplitter,
+                          SUMMARY_PROMPT, SUMMARY_MINUTES, SUMMARY_SEGMENT_TOKENS, SUMMARY_FAN_IN, WHISPER_CHUNK_MS,
+                          WHISPER_OVERLAP_MS, TTS_PART_CHARS)
+import shutil
+import mp3
+import metrics
+from audio_preprocess import preprocess_for_whisper, whisper_encoder_args, REMOVE_SILENCE
+from cache import get_cache, cached_text, cached_file, text_digest
+from config import get_config
+from compaction import compact_transcript, merge_reports, COMPACT_TRANSCRIPTS, DROP_ADS
+from mood import classify_mood, MOOD_MODE
+from ingest import (is_youtube_url, source_identity, extract_audio_from_youtube, fetch_youtube_info,
+                    stream_youtube_audio, cached_youtube_audio, cached_youtube_title, remember_youtube_title,
+                    YOUTUBE_STREAMING)
+from workspace import get_workspace_manager
+from ssml import SSMLBuilder
+from captions import fetch_captions, CAPTIONS, CAPTION_LANGUAGES
+from transcript_index import build_transcript_index, load_index, answer_question, make_passages, QUERY_TOP_K
+from outputs import (parse_outputs, derivation_plan, write_summary, make_bullets, make_chapters, format_chapters,
+                     sentence_pause, OUTPUTS, LONGER_PROMPT, CONDENSE_PROMPT, BULLETS_PROMPT, CHAPTERS_PROMPT)
+
+# Asyncio pipeline: download -> transcribe -> compact -> summarize -> mood + SSML -> TTS.
+# Blocking work runs on a thread pool so independent steps overlap: YouTube
+# audio segments are transcribed while the download continues, transcript
+# chunks are handed to the map summarizer as soon as they arrive, and mood
+# detection runs alongside SSML formatting. Progress is published as events.
+# With streaming TTS the final summary request is streamed and its finished
+# paragraphs are synthesized while the rest is still being generated; each
+# audio segment is published as soon as it is ready, so playback can start early.
+# Each run is traced per stage (see metrics.py); the trace is part of the result.
+# The timestamped transcript is indexed while the summary is generated, so
+# follow-up questions (query_podcast) are answered from a few passages.
+# YouTube episodes with good captions (see captions.py) skip the audio and
+# Whisper entirely: the captions are the timestamped transcript.
+# Extra outputs (other lengths, bullets, chapters; see outputs.py) are derived
+# from the summary, its notes and the index while the main audio is synthesized.
+PIPELINE_MAX_WORKERS = 4
+STREAM_TTS = os.environ.get("PODCAST_STREAM_TTS", "1") != "0"
+INDEX_TRANSCRIPTS = os.environ.get("PODCAST_INDEX_TRANSCRIPTS", "1") != "0"
+MERGE_GUARD_WORDS = 60  # trailing words that a later chunk's overlap may still rewrite
+
+
+def _compact(text):
+    """
+    compact_transcript() unless compaction is switched off; returns (text, report or None).
+    """
+    return compact_transcript(text) if COMPACT_TRANSCRIPTS else (text, None)
+
+
+def _compact_and_summarize(segment, index):
+    compacted, report = _compact(segment)
+    return summarize_segment(compacted, index), report
+
+
+class _Emitter:
+    """
+    Event queue that can be fed from the event loop or from worker threads.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def emit(self, event_type, **fields):
+        self.queue.put_nowait({"type": event_type, **fields})
+
+    def emit_threadsafe(self, event_type, **fields):
+        self.loop.call_soon_threadsafe(functools.partial(self.emit, event_type, **fields))
+
+
+async def _in_thread(pool, func, /, *args, **kwargs):
+    # bind() carries the current trace and stage over to the worker thread
+    return await asyncio.get_running_loop().run_in_executor(pool, metrics.bind(functools.partial(func, *args, **kwargs)))
+
+
+async def _stage(emitter, name, coro):
+    """
+    Await coro as trace stage `name`, bracketing it with stage started/finished events.
+    """
+    emitter.emit("stage", stage=name, status="started")
+    started = time.perf_counter()
+    with metrics.stage(name):
+        result = await coro
+    emitter.emit("stage", stage=name, status="finished", seconds=time.perf_counter() - started)
+    return result
+
+
+async def _transcribe_and_map(chunk_texts, emitter, executor, segment_tokens, overlapping=True):
+    """
+    Consume the chunk_texts iterator (on a worker thread) and start map
+    summaries on completed segments while later chunks are still being transcribed.
+    Chunks may be timestamped transcribe_chunk() dicts. Only overlapping
+    chunks (iter_transcript_chunks) are merged at their shared words;
+    consecutive parts are joined as they are.
+
+    Returns (transcript, map_futures, timestamped segments); map_futures is
+    None when the whole transcript fits in one segment and should be
+    summarized directly.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+
+    def produce():
+        try:
+            for text in chunk_texts:
+                loop.call_soon_threadsafe(chunks.put_nowait, text)
+            loop.call_soon_threadsafe(chunks.put_nowait, None)
+        except BaseException as exc:
+            loop.call_soon_threadsafe(chunks.put_nowait, exc)
+
+    producer = loop.run_in_executor(None, metrics.bind(produce))
+
+    words, consumed, map_futures, segments = [], 0, [], []
+
+    def submit(segment):
+        map_futures.append(loop.run_in_executor(executor, metrics.bind(_compact_and_summarize, "summarize"),
+                                                segment, len(map_futures) + 1))
+
+    index = 0
+    while True:
+        item = await chunks.get()
+        if item is None:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        if isinstance(item, dict):
+            if overlapping:
+                merge_segments(segments, item["segments"])
+            else:
+                segments.extend(item["segments"])
+            item = item["text"]
+        if overlapping:
+            words = merge_transcripts([" ".join(words), item]).split()
+        else:
+            words.extend(item.split())
+        emitter.emit("transcript_chunk", index=index, text=item)
+        index += 1
+
+        # Everything except the last, still-open segment can be summarized now
+        safe_end = len(words) - (MERGE_GUARD_WORDS if overlapping else 0)
+        if safe_end > consumed:
+            for segment in split_transcript(" ".join(words[consumed:safe_end]), segment_tokens)[:-1]:
+                submit(segment)
+                consumed += len(segment.split())
+
+    await producer
+    transcript = " ".join(words)
+
+    remaining = split_transcript(" ".join(words[consumed:]), segment_tokens) if consumed < len(words) else []
+    if not map_futures and len(remaining) <= 1:
+        return transcript, None, segments
+    for segment in remaining:
+        submit(segment)
+    return transcript, map_futures, segments
+
+
+async def _summarize(transcript, map_futures, executor, fan_in, speech=None):
+    """
+    Summarize the (compacted) transcript; stats["compaction"] reports the tokens saved.
+    In structured mood mode the same request also returns the mood and key points.
+    With a _SpeechStream the final request is streamed into it. The result's
+    "notes" are the input of the final request, kept to derive other lengths from.
+    """
+    stats = {"reduce_seconds": []}
+    structured = MOOD_MODE == "structured"
+    stream = {"on_text": speech.feed, "on_mood": speech.set_mood} if speech else {}
+    if map_futures is None:
+        compacted, stats["compaction"] = await _in_thread(executor, _compact, transcript)
+        if speech and not structured:
+            speech.guess_mood(compacted)
+        summary = await _in_thread(executor, summarize_text, compacted, stats=stats, structured=structured, **stream)
+        return _summary_result(summary, stats, compacted)
+
+    started = time.perf_counter()
+    summaries, reports = zip(*await asyncio.gather(*map_futures))
+    stats["segments"] = len(summaries)
+    stats["map_seconds"] = time.perf_counter() - started
+    stats["compaction"] = merge_reports(reports) if COMPACT_TRANSCRIPTS else None
+    if speech and not structured:
+        speech.guess_mood("\n\n".join(summaries))
+    notes = "\n\n".join(await _in_thread(executor, combine_summaries, list(summaries), fan_in=fan_in,
+                                         executor=executor, stats=stats))
+    started = time.perf_counter()
+    summary = await _in_thread(executor, final_summary, notes, structured, **stream)
+    stats["reduce_seconds"].append(time.perf_counter() - started)
+    return _summary_result(summary, stats, notes)
+
+
+def _summary_result(summary, stats, notes):
+    if isinstance(summary, dict):
+        return {**summary, "stats": stats, "notes": notes}
+    return {"summary": summary, "mood": None, "key_points": [], "stats": stats, "notes": notes}
+
+
+def _mood_of(text, executor):
+    """
+    Mood of text determined apart from the summary request: the lexicon
+    classifier, or a (cached) mood request in separate mode and for
+    structured replies without a usable mood.
+    """
+    if MOOD_MODE == "lexicon":
+        return _in_thread(executor, metrics.bind(classify_mood, "mood"), text)
+    cache = get_cache()
+    return _in_thread(executor, metrics.bind(cached_text, "mood"), cache,
+                      cache.key("mood", text=text_digest(text), model=get_config().deployment),
+                      lambda: detect_mood(text))
+
+
+def _tts_key(summary, mood, pause=None):
+    return get_cache().key("tts", text=text_digest(summary), mood=mood, format="mp3", trim="leading-silence",
+                           ssml=SSMLBuilder(pause).signature) + ".mp3"
+
+
+async def _text_to_speech(summary, executor, workspace, mood=None, pause=None):
+    """
+    Determine the mood (unless the summarizer already returned it) while the
+    SSML parts are being formatted, then synthesize the parts.
+    """
+    mood_future = asyncio.sleep(0, mood) if mood is not None else _mood_of(summary, executor)
+    ssml_bodies, mood = await asyncio.gather(
+        _in_thread(executor, SSMLBuilder(pause).parts, summary, TTS_PART_CHARS),
+        mood_future)
+    voice, style = voice_for_mood(mood)
+
+    def synthesize():
+        return render_speech(ssml_bodies, voice, style, workspace.new_file(".mp3", "summary_"))
+
+    audio_path = await _in_thread(executor, cached_file, get_cache(), _tts_key(summary, mood, pause), synthesize,
+                                  move=True)
+    return mood, audio_path
+
+
+class _SpeechStream:
+    """
+    TTS of a summary that is still being generated. Summary text arrives
+    through feed() from the summarizing thread; finished parts are synthesized
+    concurrently and written to the workspace in order, each announced with an
+    "audio_segment" event so playback can start before the summary is complete.
+    """
+
+    def __init__(self, executor, workspace, emitter):
+        self.loop = asyncio.get_running_loop()
+        self.executor = executor
+        self.workspace = workspace
+        self.emitter = emitter
+        self.started = time.perf_counter()
+        self.text = asyncio.Queue()
+        self.mood = self.loop.create_future()
+        self.summary = None
+        self.pending = []
+        self.task = asyncio.ensure_future(self._run())
+
+    # Called from the summarizing thread
+    def feed(self, text):
+        self.loop.call_soon_threadsafe(self.text.put_nowait, text)
+
+    def set_mood(self, mood):
+        self.loop.call_soon_threadsafe(self._resolve_mood, mood)
+
+    def _resolve_mood(self, mood, error=None):
+        if self.mood.done():
+            return
+        if error is not None:
+            self.mood.set_exception(error)
+        else:
+            self.mood.set_result(mood)
+
+    def guess_mood(self, source_text):
+        """
+        Determine the voice from the summarizer's input while the summary is
+        generated (separate and lexicon modes, where the reply has no mood).
+        """
+        def resolve(task):
+            if task.cancelled():
+                return
+            if task.exception():
+                self._resolve_mood(None, task.exception())
+            else:
+                self._resolve_mood(task.result())
+
+        asyncio.ensure_future(_mood_of(source_text, self.executor)).add_done_callback(resolve)
+
+    async def result(self, summary, mood=None):
+        """
+        Wait for the remaining audio and join the segments. summary is the final
+        text (spoken as a whole if nothing was streamed) and mood the one parsed
+        from the reply, if any. Returns (mood, audio path).
+        """
+        if mood is not None:
+            self._resolve_mood(mood)
+        self.summary = summary
+        self.text.put_nowait(None)
+        segments = await self.task
+        mood = self.mood.result()
+
+        def join():
+            path = self.workspace.new_file(".mp3", "summary_")
+            parts = []
+            for segment in segments:
+                with open(segment, "rb") as f:
+                    parts.append(f.read())
+            with metrics.stage("postprocess"), open(path, "wb") as f:
+                audio = mp3.concat(parts)
+                f.write(audio)
+                metrics.record(bytes_in=sum(len(part) for part in parts), bytes_out=len(audio))
+            return path
+
+        audio_path = await _in_thread(self.executor, cached_file, get_cache(), _tts_key(summary, mood), join, move=True)
+        return mood, audio_path
+
+    def cancel(self):
+        self.task.cancel()
+
+    async def _run(self):
+        splitter = TTSPartSplitter()
+        synthesized = asyncio.Queue()
+        writer = asyncio.ensure_future(self._write(synthesized))
+
+        def submit(parts):
+            for part in parts:
+                task = asyncio.ensure_future(self._synthesize(part))
+                self.pending.append(task)
+                synthesized.put_nowait((part, task))
+
+        try:
+            streamed = False
+            while (text := await self.text.get()) is not None:
+                streamed = True
+                submit(splitter.feed(text))
+            submit(splitter.flush() if streamed else split_tts_text(self.summary))
+            if not self.mood.done():
+                # No mood in the reply and none guessed from the input
+                self._resolve_mood(await _mood_of(self.summary, self.executor))
+            synthesized.put_nowait(None)
+            return await writer
+        except BaseException:
+            for task in [writer, *self.pending]:
+                task.cancel()
+            raise
+
+    async def _synthesize(self, part):
+        voice, style = voice_for_mood(await self.mood)
+        with metrics.stage("tts"):
+            return await _in_thread(self.executor, synthesize_part, build_ssml(format_ssml_text(part), voice, style),
+                                    voice)
+
+    async def _write(self, synthesized):
+        segments = []
+        while (item := await synthesized.get()) is not None:
+            part, task = item
+            audio = await task
+            if not segments:
+                # Only the first part can start with a lead-in
+                from audio_trim import trim_leading_silence
+                audio, _ = await _in_thread(self.executor, metrics.bind(trim_leading_silence, "postprocess"), audio)
+            path = self.workspace.new_file(".mp3", f"summary_{len(segments):03d}_")
+            with open(path, "wb") as f:
+                f.write(audio)
+            segments.append(path)
+            self.emitter.emit("audio_segment", index=len(segments) - 1, path=path, text=part,
+                              seconds=time.perf_counter() - self.started)
+        return segments
+
+
+async def _preprocess(audio_path, result, emitter, work_dir):
+    """
+    Shrink audio to mono 16 kHz speech-bitrate MP3 before it is uploaded to Whisper.
+    """
+    output_path = os.path.join(work_dir, "preprocessed.mp3")
+    output_path, report = await _stage(emitter, "preprocess",
+                                       _in_thread(None, preprocess_for_whisper, audio_path, output_path))
+    result["preprocess"] = report
+    emitter.emit("preprocess", report=report)
+    return output_path
+
+
+async def _ingest(source, result, emitter, max_workers, work_dir):
+    """
+    Locate or download the episode audio and return (iterator of chunk
+    transcripts, whether consecutive chunks overlap). YouTube audio is
+    streamed in segments into work_dir when possible.
+    """
+    if not is_youtube_url(source):
+        result["audio_path"] = source
+        audio_path = await _preprocess(source, result, emitter, work_dir)
+        return iter_transcript_chunks(audio_path, max_workers=max_workers, work_dir=work_dir,
+                                      timestamps=INDEX_TRANSCRIPTS), True
+
+    audio_path, title = cached_youtube_audio(source)
+    if audio_path is None:
+        # Metadata is fetched once and reused by whichever download path is taken
+        info = await _stage(emitter, "download", _in_thread(None, fetch_youtube_info, source))
+        title = info.get('title', 'Unknown Title')
+        remember_youtube_title(source, title)
+
+        if CAPTIONS != "off":
+            captions, reason = await _stage(emitter, "captions", _in_thread(None, fetch_captions, info))
+            if captions:
+                track = captions.pop("track")
+                kind = "automatic captions" if track["automatic"] else "subtitles"
+                emitter.emit("progress", stage="captions", fraction=0.6,
+                             text=f"Using the {track['language']} {kind} of '{title}'; no audio needed")
+                result["title"], result["transcript_source"] = title, {"kind": "captions", **track}
+                return iter([captions]), False
+            emitter.emit("progress", stage="captions", fraction=0.3,
+                         text=f"No usable captions ({reason}); transcribing the audio")
+
+        if YOUTUBE_STREAMING and info.get('url'):
+            emitter.emit("progress", stage="download", fraction=0.3, text=f"Streaming audio from '{title}'...")
+            result["title"] = title
+            return iter_transcribe_files(stream_youtube_audio(info, work_dir), max_workers=max_workers,
+                                         timestamps=INDEX_TRANSCRIPTS), False
+
+        def progress(fraction, text):
+            emitter.emit_threadsafe("progress", stage="download", fraction=fraction, text=text)
+
+        audio_path, title = await _stage(
+            emitter, "download",
+            _in_thread(None, extract_audio_from_youtube, source, progress=progress, info=info, work_dir=work_dir))
+
+    result["audio_path"], result["title"] = audio_path, title
+    # Downloads are already Whisper-sized; only silence removal needs another pass
+    if REMOVE_SILENCE:
+        audio_path = await _preprocess(audio_path, result, emitter, work_dir)
+    return iter_transcript_chunks(audio_path, max_workers=max_workers, work_dir=work_dir,
+                                  timestamps=INDEX_TRANSCRIPTS), True
+
+
+async def _run(source, title, emitter, max_workers, segment_tokens, fan_in, workspace, tts, stream_tts, outputs,
+               identity):
+    # Intermediate files go to the caller's workspace, or to one owned by this run
+    manager = get_workspace_manager()
+    owned = workspace is None
+    if owned:
+        workspace = manager.create()
+    manager.pin(workspace.name)
+    trace = metrics.Trace(source)
+    try:
+        with metrics.tracing(trace):
+            result = await _run_in_workspace(source, title, emitter, max_workers, segment_tokens, fan_in, workspace,
+                                             tts, stream_tts, outputs, identity)
+    except BaseException as e:
+        trace.finish(error=e)
+        raise
+    finally:
+        manager.unpin(workspace.name)
+        if owned:
+            workspace.release()
+    result["trace"] = trace.finish()
+    return result
+
+
+async def _run_in_workspace(source, title, emitter, max_workers, segment_tokens, fan_in, workspace, tts,
+                            stream_tts, outputs, identity):
+    cache = get_cache()
+    result = {"source": source, "title": title, "audio_path": None, "preprocess": None, "tts_error": None,
+              "transcript_source": {"kind": "whisper"}}
+    if title is None and is_youtube_url(source):
+        result["title"] = cached_youtube_title(source)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Download + transcribe (+ map summaries of finished segments)
+        if identity is None:
+            identity = await _in_thread(executor, source_identity, source)
+        transcript_key, transcript, transcript_source = _cached_transcript(cache, identity)
+        map_futures = segments = None
+        if transcript is None:
+            work_dir = workspace.subdir("ingest_")
+            try:
+                chunk_texts, overlapping = await _ingest(source, result, emitter, max_workers, work_dir)
+                transcript, map_futures, segments = await _stage(
+                    emitter, "transcribe",
+                    _transcribe_and_map(chunk_texts, emitter, executor, segment_tokens, overlapping))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            if result["transcript_source"]["kind"] == "captions":
+                transcript_key = _captions_key(cache, identity)
+                cache.put_json(transcript_key, {"transcript": transcript, "source": result["transcript_source"]})
+            else:
+                cache.put_json(transcript_key, transcript)
+            if segments:
+                cache.put_json(_segments_key(cache, transcript_key), segments)
+        else:
+            result["transcript_source"] = transcript_source
+            if not is_youtube_url(source):
+                result["audio_path"] = source
+        result["transcript"] = transcript
+        result["title"] = result["title"] or "Unknown Title"
+        emitter.emit("transcript", text=transcript, source=result["transcript_source"])
+        index_task = (asyncio.ensure_future(_index(transcript, segments, transcript_key, emitter, executor))
+                      if INDEX_TRANSCRIPTS else None)
+
+        # Summarize (reduce)
+        summary_key = cache.key("summary", transcript=text_digest(transcript), prompt=SUMMARY_PROMPT,
+                                model=get_config().deployment, segment_tokens=segment_tokens, fan_in=fan_in,
+                                compaction=COMPACT_TRANSCRIPTS, drop_ads=DROP_ADS,
+                                structured=MOOD_MODE == "structured", notes=True)
+        summary_result = cache.get_json(summary_key)
+        speech = None
+        if summary_result is None:
+            # Streamed: the first paragraphs are spoken while the rest is generated
+            speech = _SpeechStream(executor, workspace, emitter) if tts and stream_tts else None
+            try:
+                summary_result = await _stage(emitter, "summarize",
+                                              _summarize(transcript, map_futures, executor, fan_in, speech))
+            except BaseException:
+                if speech:
+                    speech.cancel()
+                raise
+            cache.put_json(summary_key, summary_result)
+        result["summary"] = summary_result["summary"]
+        result["summary_stats"] = summary_result["stats"]
+        result["key_points"] = summary_result["key_points"]
+        emitter.emit("summary", text=result["summary"], stats=result["summary_stats"])
+
+        # Other lengths and formats, derived while the main summary is spoken
+        outputs_task = None
+        if outputs:
+            outputs_task = asyncio.ensure_future(_stage(emitter, "outputs", _outputs(
+                outputs, result, summary_result["notes"], index_task, executor, workspace, emitter, tts)))
+
+        # Mood + TTS; a failure here still leaves the text summary usable
+        result["mood"], result["audio_summary_path"] = summary_result["mood"], None
+        if tts:
+            try:
+                if speech:
+                    speech_future = speech.result(result["summary"], result["mood"])
+                else:
+                    speech_future = _text_to_speech(result["summary"], executor, workspace, result["mood"])
+                result["mood"], result["audio_summary_path"] = await _stage(emitter, "tts", speech_future)
+                emitter.emit("audio", path=result["audio_summary_path"])
+            except Exception as e:
+                result["tts_error"] = str(e)
+                emitter.emit("error", stage="tts", message=str(e))
+
+        result["index_key"] = await index_task if index_task else None
+        result["outputs"] = await outputs_task if outputs_task else {}
+        for output in result["outputs"].values():
+            if output.get("minutes") == SUMMARY_MINUTES:
+                output["audio_path"] = result["audio_summary_path"]
+
+    return result
+
+
+async def _outputs(outputs, result, notes, index_task, executor, workspace, emitter, tts):
+    """
+    Produce the extra outputs (parse_outputs() entries) from the main summary,
+    the notes it was written from and the transcript index. Returns {name:
+    output}; an output that fails has an "error" and does not stop the others.
+    """
+    cache = get_cache()
+    model = get_config().deployment
+    produced = {}
+
+    def derived(kind, source_text, compute, **params):
+        key = cache.key("output", kind=kind, source=text_digest(source_text), model=model, **params)
+        return _in_thread(executor, cached_text, cache, key, compute)
+
+    def finish(output, **fields):
+        produced[output["name"]] = {"kind": output["kind"], "minutes": output["minutes"], **fields}
+        if fields.get("error"):
+            emitter.emit("error", stage="outputs", message=f"{output['name']}: {fields['error']}")
+        else:
+            emitter.emit("output", name=output["name"], output=produced[output["name"]])
+
+    async def summaries(wanted):
+        # Longest first: each shorter version is condensed from the next longer one
+        texts = {SUMMARY_MINUTES: result["summary"]}
+        for minutes, source in derivation_plan([output["minutes"] for output in wanted]):
+            from_notes = source == "notes"
+            source_text = notes if from_notes else texts[source]
+            texts[minutes] = await derived(
+                "summary", source_text, functools.partial(write_summary, source_text, minutes, from_notes),
+                minutes=minutes, prompt=LONGER_PROMPT if from_notes else CONDENSE_PROMPT)
+
+        async def speak(output):
+            text = texts[output["minutes"]]
+            audio_path = None
+            if tts and output["minutes"] != SUMMARY_MINUTES:
+                _, audio_path = await _text_to_speech(text, executor, workspace, result["mood"],
+                                                      sentence_pause(output["minutes"]))
+            finish(output, text=text, audio_path=audio_path)
+
+        await asyncio.gather(*(speak(output) for output in wanted))
+
+    async def bullets(output):
+        items = await derived("bullets", result["summary"], functools.partial(make_bullets, result["summary"]),
+                              prompt=BULLETS_PROMPT)
+        finish(output, items=items, text="\n".join(f"- {item}" for item in items))
+
+    async def chapters(output):
+        key = await index_task if index_task else None
+        index = await _in_thread(executor, load_index, key) if key else None
+        passages = index.passages if index else make_passages(result["transcript"])
+        items = await derived("chapters", json.dumps(passages), functools.partial(make_chapters, passages),
+                              prompt=CHAPTERS_PROMPT)
+        finish(output, items=items, text=format_chapters(items))
+
+    async def guarded(group, job):
+        try:
+            await job
+        except Exception as e:
+            for output in group:
+                if output["name"] not in produced:
+                    finish(output, error=str(e))
+
+    jobs = []
+    wanted = [output for output in outputs if output["kind"] == "summary"]
+    if wanted:
+        jobs.append(guarded(wanted, summaries(wanted)))
+    for output in outputs:
+        if output["kind"] in ("bullets", "chapters"):
+            jobs.append(guarded([output], (bullets if output["kind"] == "bullets" else chapters)(output)))
+    await asyncio.gather(*jobs)
+    return {output["name"]: produced[output["name"]] for output in outputs if output["name"] in produced}
+
+
+def _transcript_key(cache, identity):
+    # The encoder arguments carry every preprocessing setting (sample rate,
+    # bitrate, silence removal and its thresholds) that changes what Whisper hears
+    return cache.key("transcript", source=identity, model="whisper", chunk_ms=WHISPER_CHUNK_MS,
+                     overlap_ms=WHISPER_OVERLAP_MS, preprocess=whisper_encoder_args(REMOVE_SILENCE))
+
+
+def _captions_key(cache, identity):
+    return cache.key("captions_transcript", source=identity, policy=CAPTIONS, languages=CAPTION_LANGUAGES)
+
+
+def _cached_transcript(cache, identity):
+    """
+    (key, transcript, source) of the episode's cached transcript, Whisper's or
+    one taken from captions; (Whisper's key, None, None) if there is none.
+    """
+    transcript_key = _transcript_key(cache, identity)
+    transcript = cache.get_json(transcript_key)
+    if transcript is not None:
+        return transcript_key, transcript, {"kind": "whisper"}
+    if CAPTIONS != "off" and identity.startswith("youtube:"):
+        captions_key = _captions_key(cache, identity)
+        captions = cache.get_json(captions_key)
+        if captions is not None:
+            return captions_key, captions["transcript"], captions["source"]
+    return transcript_key, None, None
+
+
+def _segments_key(cache, transcript_key):
+    return cache.key("segments", transcript=transcript_key)
+
+
+async def _index(transcript, segments, transcript_key, emitter, executor):
+    """
+    Build (or find) the transcript's search index, alongside summarization.
+    Returns the index key, or None if indexing failed; the run goes on either way.
+    """
+    cache = get_cache()
+
+    def build():
+        # A transcript served from the cache has its segments cached next to it
+        return build_transcript_index(transcript, segments or cache.get_json(_segments_key(cache, transcript_key)))
+
+    try:
+        key = await _stage(emitter, "index", _in_thread(executor, build))
+    except Exception as e:
+        emitter.emit("error", stage="index", message=str(e))
+        return None
+    emitter.emit("index", key=key)
+    return key
+
+
+async def query_podcast(source, question, top_k=QUERY_TOP_K):
+    """
+    Answer a follow-up question about an episode that has been processed
+    before, from the few transcript passages that match it. Returns
+    {"answer", "passages", "prompt_tokens"}; passages carry their start and
+    end time in the episode. Raises LookupError if the episode has not been
+    transcribed yet.
+    """
+    cache = get_cache()
+    transcript_key, transcript, _ = _cached_transcript(cache, await _in_thread(None, source_identity, source))
+    if transcript is None:
+        raise LookupError(f"'{source}' has not been transcribed yet; process it first.")
+
+    def answer():
+        key = build_transcript_index(transcript, cache.get_json(_segments_key(cache, transcript_key)))
+        return answer_question(load_index(key), question, top_k)
+
+    return await _in_thread(None, answer)
+
+
+async def stream_podcast(source, title=None, max_workers=PIPELINE_MAX_WORKERS,
+                         segment_tokens=SUMMARY_SEGMENT_TOKENS, fan_in=SUMMARY_FAN_IN, workspace=None, tts=True,
+                         stream_tts=STREAM_TTS, outputs=OUTPUTS, identity=None):
+    """
+    Run the pipeline for a YouTube URL or local audio path, yielding event
+    dicts as work progresses. The last event is {"type": "done", "result": ...}.
+    Intermediate files are written to workspace (a temporary one if None);
+    with tts=False no audio summary is synthesized. With stream_tts the audio
+    is also published in parts ("audio_segment" events) while the summary is
+    still being generated. outputs names extra versions of the summary (see
+    outputs.parse_outputs), published as "output" events and in result["outputs"].
+    identity is ingest.source_identity(source), if the caller already has it
+    (it hashes the whole file for local audio).
+    """
+    emitter = _Emitter()
+    task = asyncio.ensure_future(_run(source, title, emitter, max_workers, segment_tokens, fan_in, workspace, tts,
+                                      stream_tts, parse_outputs(outputs), identity))
+    task.add_done_callback(lambda _: emitter.queue.put_nowait(None))
+    try:
+        while True:
+            event = await emitter.queue.get()
+            if event is None:
+                break
+            yield event
+        yield {"type": "done", "result": task.result()}
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def process_podcast(source, title=None, on_event=None, **options):
+    """
+    Run the whole pipeline and return the result dict. on_event, if given,
+    is called with every intermediate event.
+    """
+    async for event in stream_podcast(source, title=title, **options):
+        if event["type"] == "done":
+            return event["result"]
+        if on_event:
+            on_event(event)
@@ -0,0 +1,318 @@
+import os
+import re
+import time
+import threading
+import collections
+import mp3
+import metrics
+from compaction import count_tokens
+
+# Client-side scheduling of Azure OpenAI requests.
+# Each deployment (the chat deployment, whisper, tts, embeddings) has its own
+# quota, so each gets a token bucket for requests per minute and, optionally,
+# for the unit its quota is measured in: tokens for chat (prompt + max_tokens,
+# which is what Azure counts) and embeddings, audio seconds for Whisper and
+# characters for TTS.
+# The cost of a request is estimated before it is sent and the request waits
+# until its bucket can pay for it. Waiting requests are served round-robin
+# across pipeline runs, so one long episode cannot starve the others, and a
+# 429 pauses the whole deployment for the Retry-After period instead of
+# letting every queued request run into the same limit.
+# Limits of 0 mean unlimited; with no limits requests pass straight through
+# (a 429 still pauses the deployment).
+QUOTAS = {
+    # kind: (requests per minute, units per minute)
+    "chat": (int(os.environ.get("AZURE_CHAT_RPM", 0)), int(os.environ.get("AZURE_CHAT_TPM", 0))),
+    "whisper": (int(os.environ.get("AZURE_WHISPER_RPM", 0)),
+                int(os.environ.get("AZURE_WHISPER_AUDIO_SECONDS_PER_MINUTE", 0))),
+    "tts": (int(os.environ.get("AZURE_TTS_RPM", 0)), int(os.environ.get("AZURE_TTS_CHARS_PER_MINUTE", 0))),
+    "embeddings": (int(os.environ.get("AZURE_EMBEDDINGS_RPM", 0)), int(os.environ.get("AZURE_EMBEDDINGS_TPM", 0))),
+}
+QUOTA_HEADROOM = float(os.environ.get("AZURE_QUOTA_HEADROOM", 0.9))  # share of the quota actually used
+QUOTA_BURST_SECONDS = 10  # Azure enforces quotas over short windows; bursts stay within one
+THROTTLE_PAUSE = 1.0      # seconds a deployment pauses after a 429 without Retry-After
+DEFAULT_SESSION = "default"
+AUDIO_HEADER_BYTES = 16 * 1024  # read from Whisper uploads to find the bitrate
+
+metrics.REGISTRY.describe("podcast_scheduler_queue_depth", "Azure requests waiting for quota, by deployment.")
+metrics.REGISTRY.describe("podcast_scheduler_wait_seconds", "Time Azure requests waited for quota.",
+                          metrics.API_BUCKETS)
+metrics.REGISTRY.describe("podcast_scheduler_throttles_total", "429 responses that paused a deployment.")
+
+_DEPLOYMENT_PATTERN = re.compile(r"/deployments/([^/?]+)/")
+
+
+def deployment_of(url):
+    match = _DEPLOYMENT_PATTERN.search(url)
+    return match.group(1) if match else metrics.endpoint_kind(url)
+
+
+def estimate_cost(kind, json_body=None, files=None):
+    """
+    Quota units a request will use: prompt + completion budget tokens for
+    chat, input tokens for embeddings, audio seconds for Whisper, input
+    characters for TTS.
+    """
+    if kind == "chat" and json_body:
+        prompt = sum(count_tokens(message.get("content") or "") for message in json_body.get("messages", []))
+        return prompt + int(json_body.get("max_tokens") or 0)
+    if kind == "embeddings" and json_body:
+        inputs = json_body.get("input", [])
+        return sum(count_tokens(text) for text in ([inputs] if isinstance(inputs, str) else inputs))
+    if kind == "tts" and json_body:
+        return len(re.sub(r"<[^>]+>", "", json_body.get("input", "")))
+    if kind == "whisper" and files:
+        seconds = 0.0
+        for value in files.values():
+            handle = value[1] if isinstance(value, tuple) else value
+            if hasattr(handle, "read"):
+                seconds += _audio_seconds(handle)
+        return seconds
+    return 0
+
+
+def _audio_seconds(handle):
+    # Estimated from the file size and the bitrate of the first MP3 frame, so
+    # the upload is not read on every attempt (exact for CBR, which is what
+    # preprocessing writes). Not MP3: assume 128 kbps.
+    handle.seek(0, os.SEEK_END)
+    size = handle.tell()
+    handle.seek(0)
+    head = handle.read(AUDIO_HEADER_BYTES)
+    handle.seek(0)
+    offset = mp3.id3v2_size(head)
+    if offset >= len(head):
+        # A large tag (cover art) pushes the first frame further in
+        handle.seek(offset)
+        head = handle.read(AUDIO_HEADER_BYTES)
+        handle.seek(0)
+        size, offset = size - offset, 0
+    for frame_offset, header in mp3.iter_frames(head[offset:]):
+        bytes_per_second = header["length"] * header["sample_rate"] / header["samples"]
+        return max(size - offset - frame_offset, 0) / bytes_per_second
+    return size / 16000.0
+
+
+class _Waiter:
+    __slots__ = ("session", "cost")
+
+    def __init__(self, session, cost):
+        self.session = session
+        self.cost = cost
+
+
+class DeploymentBucket:
+    """
+    Request and unit token buckets of one deployment with a fair queue of
+    waiting requests: sessions take turns, one request each.
+    """
+
+    def __init__(self, deployment, kind, rpm=0, units_per_minute=0, headroom=QUOTA_HEADROOM,
+                 burst_seconds=QUOTA_BURST_SECONDS):
+        self.deployment = deployment
+        self.kind = kind
+        self.headroom = headroom
+        self.burst_seconds = burst_seconds
+        self.request_rate = self.unit_rate = 0.0
+        self.requests = self.units = float("inf")  # filled to capacity by set_limits
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+        self._condition = threading.Condition()
+        self._queues = collections.OrderedDict()  # session -> deque of waiters, in turn order
+        self.stats = {"granted": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                      "throttles": 0, "units": 0.0}
+        self.set_limits(rpm, units_per_minute)
+
+    def set_limits(self, rpm, units_per_minute):
+        """
+        Change the quota (0 = unlimited). Tokens already in the buckets are
+        kept, up to the new burst size, and waiting requests are re-evaluated.
+        """
+        with self._condition:
+            self._refill(time.monotonic())
+            self.request_rate = rpm * self.headroom / 60.0           # per second
+            self.unit_rate = units_per_minute * self.headroom / 60.0
+            self.request_capacity = max(self.request_rate * self.burst_seconds, 1.0)
+            self.unit_capacity = self.unit_rate * self.burst_seconds
+            self.requests = min(self.requests, self.request_capacity)
+            self.units = min(self.units, self.unit_capacity)
+            self._condition.notify_all()
+
+    @property
+    def limited(self):
+        return bool(self.request_rate or self.unit_rate)
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        if self.request_rate:
+            self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        if self.unit_rate:
+            self.units = min(self.unit_capacity, self.units + elapsed * self.unit_rate)
+
+    def _delay(self, cost, now):
+        # Seconds until the bucket can pay for the request. A request larger
+        # than the burst only needs a full bucket and leaves it in debt.
+        delay = self.paused_until - now
+        if self.request_rate and self.requests < 1:
+            delay = max(delay, (1 - self.requests) / self.request_rate)
+        if self.unit_rate:
+            needed = min(cost, self.unit_capacity)
+            if self.units < needed:
+                delay = max(delay, (needed - self.units) / self.unit_rate)
+        return delay
+
+    def _head(self):
+        return next(iter(self._queues.values()))[0] if self._queues else None
+
+    def _dequeue(self, waiter, granted):
+        queue = self._queues[waiter.session]
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[waiter.session]
+        elif granted:
+            self._queues.move_to_end(waiter.session)  # back of the line for this session's next request
+
+    def acquire(self, cost=0, session=DEFAULT_SESSION):
+        """
+        Block until the request may be sent; returns the seconds waited.
+        """
+        waiter = _Waiter(session, cost)
+        started = time.monotonic()
+        with self._condition:
+            self._queues.setdefault(session, collections.deque()).append(waiter)
+            self.stats["queued"] += 1
+            self._publish_depth()
+            granted = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = None
+                    if self._head() is waiter:
+                        self._refill(now)
+                        delay = self._delay(cost, now)
+                        if delay <= 0:
+                            break
+                    self._condition.wait(delay)
+                if self.request_rate:
+                    self.requests -= 1
+                if self.unit_rate:
+                    self.units -= cost
+                granted = True
+            finally:
+                self._dequeue(waiter, granted)
+                self.stats["queued"] -= 1
+                self._publish_depth()
+                self._condition.notify_all()
+            waited = time.monotonic() - started
+            self.stats["granted"] += 1
+            self.stats["units"] += cost
+            self.stats["wait_seconds"] += waited
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+        return waited
+
+    def throttled(self, retry_after=None):
+        """
+        The server answered 429: pause the deployment and drain its buckets.
+        """
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or THROTTLE_PAUSE))
+            self.requests = min(self.requests, 0.0)
+            self.units = min(self.units, 0.0)
+            self.stats["throttles"] += 1
+            self._condition.notify_all()
+        metrics.REGISTRY.inc("podcast_scheduler_throttles_total", deployment=self.deployment)
+
+    def _publish_depth(self):
+        metrics.REGISTRY.set("podcast_scheduler_queue_depth", self.stats["queued"], deployment=self.deployment)
+
+    def snapshot(self):
+        with self._condition:
+            stats = dict(self.stats)
+            sessions = len(self._queues)
+        granted = stats["granted"] or 1
+        return {"kind": self.kind, "sessions_waiting": sessions, "mean_wait_seconds": stats["wait_seconds"] / granted,
+                "requests_per_minute": round(self.request_rate * 60, 2),
+                "units_per_minute": round(self.unit_rate * 60, 2), **stats}
+
+
+class RequestScheduler:
+    """
+    One DeploymentBucket per deployment, created on first use with the quota
+    of the deployment's kind (chat, whisper, tts).
+    """
+
+    def __init__(self, quotas=None, headroom=QUOTA_HEADROOM):
+        self.quotas = dict(QUOTAS if quotas is None else quotas)
+        self.headroom = headroom
+        self.request_limit = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        deployment = deployment_of(url)
+        with self._lock:
+            if deployment not in self._buckets:
+                kind = metrics.endpoint_kind(url)
+                self._buckets[deployment] = DeploymentBucket(deployment, kind, *self._limits(kind), self.headroom)
+            return self._buckets[deployment]
+
+    def acquire(self, url, json_body=None, files=None):
+        """
+        Wait for the quota of the request's deployment. Requests are queued per
+        pipeline run (the current trace), so concurrent runs take turns.
+        Returns the seconds waited.
+        """
+        bucket = self.bucket(url)
+        if not bucket.limited and time.monotonic() >= bucket.paused_until:
+            return 0.0
+        cost = estimate_cost(bucket.kind, json_body, files) if bucket.unit_rate else 0
+        waited = bucket.acquire(cost, metrics.current_run_id() or DEFAULT_SESSION)
+        metrics.REGISTRY.observe("podcast_scheduler_wait_seconds", waited, deployment=bucket.deployment)
+        if waited:
+            metrics.record(queue_seconds=waited)
+        return waited
+
+    def set_request_limit(self, rpm):
+        """
+        Cap the requests per minute of every deployment at rpm, on top of the
+        configured quotas (e.g. batch --max-rpm); 0 or None removes the cap.
+        """
+        with self._lock:
+            self.request_limit = rpm or 0
+            buckets = list(self._buckets.values())
+        for bucket in buckets:
+            bucket.set_limits(*self._limits(bucket.kind))
+
+    def _limits(self, kind):
+        rpm, units = self.quotas.get(kind, (0, 0))
+        if self.request_limit:
+            rpm = min(rpm, self.request_limit) if rpm else self.request_limit
+        return rpm, units
+
+    def throttled(self, url, retry_after=None):
+        self.bucket(url).throttled(retry_after)
+
+    def snapshot(self):
+        """
+        {deployment: queue depth, waits, grants and throttles}.
+        """
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {bucket.deployment: bucket.snapshot() for bucket in buckets}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Process-wide scheduler shared by all Azure calls.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
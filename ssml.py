@@ -0,0 +1,210 @@
+import os
+import re
+import functools
+
+# SSML for the TTS requests.
+# Summaries are model output and may contain &, < or quotes; unescaped, they
+# make the TTS service reject the whole request. The builder makes a single
+# pass over the text with one precompiled pattern that finds sentence ends,
+# commas, emphasis words and characters to escape (or drop: control
+# characters are not allowed in XML), so formatting stays linear in the text.
+# Every sentence becomes a segment; segments are joined with pauses, or
+# packed into parts of a bounded size for concurrent synthesis.
+# Durations are SSML times such as "1s" or "500ms". An empty comma pause keeps
+# commas as they are; no emphasis words means no emphasis.
+SENTENCE_PAUSE = os.environ.get("PODCAST_SSML_SENTENCE_PAUSE", "1s")
+PARAGRAPH_PAUSE = os.environ.get("PODCAST_SSML_PARAGRAPH_PAUSE", "")  # "" = same as the sentence pause
+COMMA_PAUSE = os.environ.get("PODCAST_SSML_COMMA_PAUSE", "500ms")
+EMPHASIS_WORDS = tuple(word.strip() for word in os.environ.get(
+    "PODCAST_SSML_EMPHASIS_WORDS", "important,key,critical,note").split(",") if word.strip())
+EMPHASIS_LEVEL = os.environ.get("PODCAST_SSML_EMPHASIS_LEVEL", "strong")
+EMPHASIS_LEVELS = ("reduced", "none", "moderate", "strong")
+
+_DURATION = re.compile(r"\d+(?:\.\d+)?(?:ms|s)")
+_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"}
+_ESCAPE = re.compile(r"[&<>\"']")
+# Characters XML 1.0 does not allow, even escaped
+_INVALID = "\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff"
+
+
+def escape(text):
+    """
+    text with the XML special characters escaped, for element content and
+    attribute values alike.
+    """
+    return _ESCAPE.sub(lambda match: _ESCAPES[match.group()], text)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile(emphasis_words, comma_breaks):
+    # A sentence ends at end punctuation (and closing quotes) before whitespace, or at a blank line
+    alternatives = [r"(?P<end>[.!?]+[\"')\]]*\s+|\n\s*\n\s*)"]
+    if emphasis_words:
+        words = "|".join(re.escape(word) for word in sorted(emphasis_words, key=len, reverse=True))
+        alternatives.append(rf"\b(?P<word>{words})\b")
+    # Single characters to replace: XML specials (and commas, which become pauses)
+    alternatives.append(r"(?P<char>[&<>\"',])" if comma_breaks else r"(?P<char>[&<>\"'])")
+    alternatives.append(rf"(?P<drop>[{_INVALID}]+)")
+    # The lookahead lets the regex engine skip ahead to characters that can start a match
+    starts = ".!?\n&<>\"'" + ("," if comma_breaks else "") + "".join(sorted({word[0] for word in emphasis_words}))
+    return re.compile(f"(?=[{re.escape(starts)}{_INVALID}])(?:{'|'.join(alternatives)})")
+
+
+def _check_duration(name, value):
+    if not _DURATION.fullmatch(value):
+        raise ValueError(f"Invalid SSML {name} '{value}' (expected e.g. 1s or 500ms)")
+    return value
+
+
+class SSMLBuilder:
+    """
+    Turns plain text into SSML: a pause after each sentence (and paragraph),
+    pauses in place of commas, emphasis on chosen words, everything else escaped.
+    """
+
+    def __init__(self, sentence_pause=None, paragraph_pause=None, comma_pause=None, emphasis_words=None,
+                 emphasis_level=None):
+        self.sentence_pause = _check_duration("sentence pause", sentence_pause or SENTENCE_PAUSE)
+        self.paragraph_pause = _check_duration("paragraph pause",
+                                               paragraph_pause or PARAGRAPH_PAUSE or self.sentence_pause)
+        self.comma_pause = COMMA_PAUSE if comma_pause is None else comma_pause
+        if self.comma_pause:
+            _check_duration("comma pause", self.comma_pause)
+        self.emphasis_words = tuple(EMPHASIS_WORDS if emphasis_words is None else emphasis_words)
+        self.emphasis_level = emphasis_level or EMPHASIS_LEVEL
+        if self.emphasis_level not in EMPHASIS_LEVELS:
+            raise ValueError(f"Invalid SSML emphasis level '{self.emphasis_level}' (expected one of "
+                             f"{', '.join(EMPHASIS_LEVELS)})")
+
+        self._pattern = _compile(self.emphasis_words, bool(self.comma_pause))
+        self._replacements = {**_ESCAPES, ",": f"<break time='{self.comma_pause}'/>"}
+        self._emphasis = (f'<emphasis level="{self.emphasis_level}">', "</emphasis>")
+        self._sentence_break = f' <break time="{self.sentence_pause}"/> '
+        self._paragraph_break = f' <break time="{self.paragraph_pause}"/> '
+
+    @property
+    def signature(self):
+        """
+        The rules as a string, for cache keys of synthesized audio.
+        """
+        return (f"sentence={self.sentence_pause};paragraph={self.paragraph_pause};comma={self.comma_pause};"
+                f"emphasis={self.emphasis_level}:{','.join(self.emphasis_words)}")
+
+    def segments(self, text):
+        """
+        [{"text", "ssml", "paragraph"}] for each sentence: the plain sentence,
+        its SSML (without the pause after it) and the number of its paragraph.
+        """
+        segments, pieces = [], []
+        append = pieces.append
+        replacements = self._replacements
+        emphasis_open, emphasis_close = self._emphasis
+        position = sentence_start = paragraph = 0
+        for match in self._pattern.finditer(text):
+            start, end = match.span()
+            append(text[position:start])
+            position = end
+            kind = match.lastgroup
+            if kind == "char":
+                append(replacements[text[start]])
+            elif kind == "end":
+                gap = match.group()
+                mark = gap.rstrip()
+                append(escape(mark) if mark[-1:] in ("\"", "'") else mark)  # closing quotes
+                self._add(segments, text[sentence_start:start + len(mark)], pieces, paragraph)
+                pieces, sentence_start = [], position
+                append = pieces.append
+                if gap.count("\n") >= 2:
+                    paragraph += 1
+            elif kind == "word":
+                append(emphasis_open + escape(match.group()) + emphasis_close)
+            # "drop": leave the characters out
+        pieces.append(text[position:])
+        self._add(segments, text[sentence_start:], pieces, paragraph)
+        return segments
+
+    @staticmethod
+    def _add(segments, sentence, pieces, paragraph):
+        sentence = sentence.strip()
+        ssml = "".join(pieces).strip()
+        if sentence and ssml:
+            segments.append({"text": sentence, "ssml": ssml, "paragraph": paragraph})
+
+    def join(self, segments):
+        """
+        One SSML body of the segments, with the pauses between them.
+        """
+        body = []
+        for index, segment in enumerate(segments):
+            if index:
+                new_paragraph = segment["paragraph"] != segments[index - 1]["paragraph"]
+                body.append(self._paragraph_break if new_paragraph else self._sentence_break)
+            body.append(segment["ssml"])
+        return "".join(body)
+
+    def format(self, text):
+        return self.join(self.segments(text))
+
+    def parts(self, text, max_chars):
+        """
+        SSML bodies for separate TTS requests, each covering at most about
+        max_chars of text. Like split_tts_text, parts break between
+        paragraphs where possible, otherwise between sentences.
+        """
+        paragraphs = []
+        for segment in self.segments(text):
+            if paragraphs and paragraphs[-1][0]["paragraph"] == segment["paragraph"]:
+                paragraphs[-1].append(segment)
+            else:
+                paragraphs.append([segment])
+
+        def length(segments):
+            return sum(len(segment["text"]) for segment in segments) + len(segments) - 1
+
+        units = []
+        for paragraph in paragraphs:
+            if length(paragraph) <= max_chars:
+                units.append(paragraph)
+                continue
+            current, current_chars = [], 0
+            for segment in paragraph:
+                if current and current_chars + len(segment["text"]) + 1 > max_chars:
+                    units.append(current)
+                    current, current_chars = [], 0
+                current_chars += len(segment["text"]) + (1 if current else 0)
+                current.append(segment)
+            units.append(current)
+
+        parts, current, current_chars = [], [], 0
+        for unit in units:
+            chars = length(unit)
+            if current and current_chars + chars + 2 > max_chars:
+                parts.append(self.join(current))
+                current, current_chars = [], 0
+            current_chars += chars + (2 if current else 0)
+            current += unit
+        if current:
+            parts.append(self.join(current))
+        return parts
+
+
+def format_ssml_text(text, sentence_pause=None):
+    """
+    Convert plain text into an SSML body with the configured pauses and emphasis.
+    """
+    return SSMLBuilder(sentence_pause).format(text)
+
+
+def build_ssml(ssml_body, voice, style):
+    """
+    Wrap already formatted SSML text in the speak/voice/style envelope.
+    """
+    return f"""<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xmlns:mstts='https://www.w3.org/2001/mstts' xml:lang='en-US'>
+        <voice name="{escape(voice)}">
+            <mstts:express-as style="{escape(style)}">
+                <prosody rate="medium">
+                    {ssml_body}
+                </prosody>
+            </mstts:express-as>
+        </voice>
+    </speak>"""
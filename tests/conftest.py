@@ -0,0 +1,66 @@
+"""
+Shared fixtures: a mock Azure OpenAI server, an isolated cache and
+workspace directory per test, and synthetic episodes.
+"""
+import os
+import sys
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("PODCAST_TRACE_FILE", "")  # keep run traces out of the working tree
+
+import cache
+import workspace
+from config import configure
+from mock_azure import MockAzureServer
+
+# No waiting: the tests check what is requested, not how long it takes
+FAST_PROFILE = {
+    "chat_latency": 0.0, "chat_tokens_per_second": 1e6, "summary_words": 120, "segment_summary_words": 40,
+    "embedding_latency": 0.0, "whisper_latency": 0.0, "whisper_seconds_per_audio_minute": 0.0,
+    "tts_latency": 0.0, "tts_chars_per_second": 1e9, "jitter": 0.0,
+}
+
+
+@pytest.fixture
+def mock_azure(request, monkeypatch):
+    """
+    A running MockAzureServer the library is configured to use. A test can
+    override profile values with @pytest.mark.mock_profile(...).
+    """
+    marker = request.node.get_closest_marker("mock_profile")
+    server = MockAzureServer({**FAST_PROFILE, **(marker.kwargs if marker else {})}).start()
+    monkeypatch.setattr("config._config", None)
+    configure(endpoint=server.url, api_key="test", deployment="gpt-4o", api_version="test")
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def isolated_dirs(tmp_path, monkeypatch):
+    # Every test gets an empty cache and its own workspaces
+    monkeypatch.setattr(cache, "_cache", cache.ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(workspace, "_manager", workspace.WorkspaceManager(str(tmp_path / "workspaces")))
+
+
+@pytest.fixture(scope="session")
+def episode(tmp_path_factory):
+    """
+    Path of a two-minute synthetic episode (tone with a pause every four seconds).
+    """
+    # pydub runs ffprobe to read files, and the episode is generated with ffmpeg
+    missing = [tool for tool in ("ffmpeg", "ffprobe") if not shutil.which(tool)]
+    if missing:
+        pytest.skip(f"{' and '.join(missing)} not installed")
+    from bench_pipeline import make_episode
+    path = str(tmp_path_factory.mktemp("corpus") / "episode_2min.mp3")
+    make_episode(path, 2)
+    return path
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mock_profile(**values): mock Azure profile overrides for the test")
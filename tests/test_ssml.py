@@ -0,0 +1,63 @@
+"""
+SSML built from hostile text must parse as XML and read out exactly that text.
+"""
+import re
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from ssml import SSMLBuilder, build_ssml, escape
+
+# Characters model output may contain that XML treats specially, or cannot carry at all
+SPECIALS = list("&<>\"',.!?;:- \n\t\r") + ["\n\n", "...", "\x00", "\x0b", "\x1f", "\ud800", "\udfff", "\ufffe",
+                                          "\uffff", "é", "€", "\U0001f399", "]]>", "<!--", "&amp;", "&#0;"]
+WORDS = ["important", "key", "critical", "note", "the", "R&D", "<5%", '"quoted"', "it's", "Q&A", "AT&T", "x > y"]
+# Custom emphasis words may contain XML specials themselves
+CUSTOM_WORDS = ("the", "a&b", "R&D", "Q&A", "<x>", "\"q\"", "it's")
+BUILDERS = [
+    SSMLBuilder(),
+    SSMLBuilder(sentence_pause="500ms", paragraph_pause="2s", comma_pause="", emphasis_words=CUSTOM_WORDS,
+                emphasis_level="moderate"),
+]
+
+
+def random_text(rng):
+    alphabet = SPECIALS + WORDS + list(CUSTOM_WORDS)
+    pieces = []
+    for _ in range(rng.randint(0, 60)):
+        roll = rng.random()
+        if roll < 0.5:
+            pieces.append(rng.choice(alphabet))
+        elif roll < 0.8:
+            pieces.append(" ")
+        else:
+            pieces.append(chr(rng.randint(0, 0x10FFFF)))
+    return "".join(pieces)
+
+
+def spoken(text, commas=False):
+    # What should be read out: the input without characters XML cannot carry,
+    # whitespace, or (when they become pauses) commas
+    return re.sub(f"[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff\\s{',' if commas else ''}]", "", text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_hostile_text_builds_valid_ssml(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        text = random_text(rng)
+        for builder in BUILDERS:
+            for bodies in ([builder.format(text)], builder.parts(text, rng.randint(5, 200))):
+                document = build_ssml("".join(bodies), "en-US-<voice>", "cheer&ful")
+                root = ET.fromstring(document)  # raises ParseError on invalid SSML
+                assert spoken("".join(root.itertext())) == spoken(text, bool(builder.comma_pause)), repr(text)
+
+
+def test_emphasis_words_are_escaped():
+    builder = SSMLBuilder(emphasis_words=("R&D",))
+    assert builder.format("Spend on R&D") == 'Spend on <emphasis level="strong">R&amp;D</emphasis>'
+
+
+def test_escape():
+    assert escape("<a href=\"x\">it's & more</a>") == "&lt;a href=&quot;x&quot;&gt;it&apos;s &amp; more&lt;/a&gt;"
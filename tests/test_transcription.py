@@ -0,0 +1,147 @@
+"""
+Whisper chunking and merging, and the result cache, against the mock Azure server.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import mp3
+from azure_openai import plan_chunks, merge_transcripts, merge_segments, iter_transcript_chunks, transcribe_audio
+from ingest import stream_youtube_audio
+
+
+def _audio_with_pauses(total_ms, pauses):
+    # A loud tone with silent gaps at the given (start_ms, end_ms) ranges
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+    audio, position = AudioSegment.empty(), 0
+    for start, end in pauses + [(total_ms, total_ms)]:
+        audio += Sine(220).to_audio_segment(duration=start - position, volume=-6)
+        audio += AudioSegment.silent(duration=end - start, frame_rate=audio.frame_rate)
+        position = end
+    return audio
+
+
+def test_plan_chunks_cuts_in_pauses():
+    pytest.importorskip("pydub")
+    pauses = [(27000, 28000), (52000, 53000)]
+    audio = _audio_with_pauses(70000, pauses)
+    chunks = plan_chunks(audio, chunk_ms=30000, overlap_ms=2000, search_ms=5000)
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(audio)
+    for (start, end), (next_start, _), (pause_start, pause_end) in zip(chunks, chunks[1:], pauses):
+        assert pause_start <= next_start <= pause_end   # cut in the pause
+        assert end == next_start + 2000                  # the chunk runs into the next by the overlap
+        assert end - start <= 30000 + 2000
+
+
+def test_plan_chunks_short_audio_is_one_chunk():
+    pytest.importorskip("pydub")
+    audio = _audio_with_pauses(20000, [])
+    assert plan_chunks(audio, chunk_ms=30000, overlap_ms=2000) == [(0, len(audio))]
+
+
+def test_merge_transcripts_drops_overlap():
+    texts = ["so the team built a product for small companies and then",
+             "Companies, and then they raised prices. That worked",
+             "prices. That worked better than expected."]
+    assert merge_transcripts(texts) == ("so the team built a product for small Companies, and then they raised "
+                                        "prices. That worked better than expected.")
+
+
+def test_merge_transcripts_keeps_short_coincidences():
+    # Fewer than min_match_words shared words is not an overlap
+    assert merge_transcripts(["we talked about the market", "the market is big"], min_match_words=3) == \
+        "we talked about the market the market is big"
+
+
+def test_merge_segments_skips_covered_audio():
+    segments = [{"start": 0.0, "end": 5.0, "text": "a"}, {"start": 5.0, "end": 29.8, "text": "b"}]
+    new_segments = [{"start": 28.0, "end": 31.0, "text": "b again"}, {"start": 29.5, "end": 33.0, "text": "c"},
+                    {"start": 33.0, "end": 40.0, "text": "d"}]
+    merged = merge_segments(segments, new_segments)
+    assert [segment["text"] for segment in merged] == ["a", "b", "c", "d"]
+
+
+@pytest.mark.mock_profile(whisper_latency=0.2, jitter=0.9, seed=3)
+def test_chunks_are_yielded_in_order(mock_azure, episode, tmp_path):
+    # Randomized latencies make later chunks finish first; results still come in episode order
+    from pydub import AudioSegment
+    ranges = plan_chunks(AudioSegment.from_file(episode), chunk_ms=30000, overlap_ms=2000)
+    chunks = list(iter_transcript_chunks(episode, max_workers=4, chunk_ms=30000, overlap_ms=2000,
+                                         work_dir=str(tmp_path), timestamps=True))
+
+    assert len(chunks) == len(ranges) > 1
+    assert mock_azure.stats["whisper"] == len(ranges)
+    for chunk, (start_ms, _) in zip(chunks, ranges):
+        assert chunk["segments"][0]["start"] == pytest.approx(start_ms / 1000.0, abs=0.01)
+
+
+def test_transcribe_audio_merges_chunks(mock_azure, episode):
+    text = transcribe_audio(episode, max_workers=4, chunk_ms=30000, overlap_ms=2000)
+    assert text and mock_azure.stats["whisper"] >= 4
+
+
+def test_rerun_is_served_from_cache(mock_azure, episode):
+    from pipeline import process_podcast
+    first = asyncio.run(process_podcast(episode, title="test"))
+    requests = dict(mock_azure.stats)
+    assert requests.get("whisper") and requests.get("chat") and requests.get("tts")
+
+    second = asyncio.run(process_podcast(episode, title="test"))
+    assert dict(mock_azure.stats) == requests  # no API calls at all
+    assert second["summary"] == first["summary"]
+    assert second["transcript"] == first["transcript"]
+
+
+def test_transcript_key_depends_on_preprocessing(monkeypatch):
+    import cache
+    import pipeline
+    import audio_preprocess
+    remove_silence = pipeline.REMOVE_SILENCE
+    key = pipeline._transcript_key(cache.get_cache(), "file:abc")
+    monkeypatch.setattr(pipeline, "REMOVE_SILENCE", not remove_silence)
+    assert pipeline._transcript_key(cache.get_cache(), "file:abc") != key
+    monkeypatch.setattr(pipeline, "REMOVE_SILENCE", remove_silence)
+    monkeypatch.setattr(audio_preprocess, "PREPROCESS_BITRATE_KBPS", 64)
+    assert pipeline._transcript_key(cache.get_cache(), "file:abc") != key
+
+
+def _transcribe_and_map(chunks, overlapping):
+    from pipeline import _Emitter, _transcribe_and_map as transcribe_and_map
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return await transcribe_and_map(iter(chunks), _Emitter(), executor, 100000, overlapping)
+    return asyncio.run(run())
+
+
+def test_consecutive_parts_are_joined_as_they_are():
+    # Streamed parts do not overlap: words they happen to share must all be kept
+    parts = ["She said it was one of the best books she had read in years and that everyone should read it",
+             "one of the best things about the show is the guests"]
+    transcript, map_futures, _ = _transcribe_and_map(parts, overlapping=False)
+    assert transcript == " ".join(parts) and map_futures is None
+
+
+def test_overlapping_chunks_are_merged():
+    transcript, _, _ = _transcribe_and_map(["we talked about the market today", "about the market today and then"],
+                                           overlapping=True)
+    assert transcript == "we talked about the market today and then"
+
+
+def test_streamed_segments_end_in_pauses(episode, tmp_path):
+    # The episode pauses for the last second of every four; FFmpeg cuts every 30 s
+    paths = list(stream_youtube_audio({"url": episode}, str(tmp_path), segment_seconds=30))
+    lengths = []
+    for path in paths:
+        with open(path, "rb") as f:
+            lengths.append(mp3.duration_ms(f.read()))
+    with open(episode, "rb") as f:
+        assert sum(lengths) == pytest.approx(mp3.duration_ms(f.read()), abs=100)
+    position = 0.0
+    for length in lengths[:-1]:
+        position += length
+        assert 2900 <= position % 4000 <= 4000
@@ -0,0 +1,243 @@
+import os
+import re
+import math
+import tempfile
+from collections import Counter
+import metrics
+from cache import get_cache, text_digest
+from azure_openai import chat_completion, embed_texts
+from compaction import count_tokens
+
+# Searchable index of an episode's transcript, for follow-up questions.
+# The transcript is cut into passages of about PASSAGE_WORDS words along
+# Whisper's timestamped segments. Passages are ranked with BM25 and, when an
+# embeddings deployment is configured, by the cosine similarity of their
+# embeddings as well; the two rankings are fused (reciprocal rank fusion).
+# Indexes live in the result cache: passages and term statistics as JSON, the
+# embeddings as a float16 NumPy array that is memory-mapped when queried.
+# A question is answered from its top passages only, so a follow-up costs a
+# prompt of a few hundred tokens instead of another pass over the transcript.
+PASSAGE_WORDS = 120
+EMBEDDING_DEPLOYMENT = os.environ.get("PODCAST_EMBEDDING_DEPLOYMENT", "")  # "" = BM25 only
+QUERY_TOP_K = 5
+QUERY_MAX_TOKENS = 300
+QUERY_PROMPT = ("You answer questions about a podcast episode using only the transcript excerpts provided, "
+                "each marked with its time in the episode. Answer concisely and cite the times of the excerpts "
+                "you used. If the excerpts do not contain the answer, say so.")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # reciprocal rank fusion damping
+
+metrics.REGISTRY.describe("podcast_index_queries_total", "Questions answered from transcript indexes.")
+
+STOPWORDS = frozenset("""a about after again all also am an and any are as at be because been but by can could did
+do does doing for from had has have he her here him his how i if in into is it its just like me more most my no not
+now of on or our out she so some than that the their them then there these they this those to too up us very was we
+were what when where which who why will with would you your""".split())
+
+
+def tokenize(text):
+    """
+    Lowercase search terms of text: words without stopwords, plural s stripped.
+    """
+    terms = []
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        word = word.strip("'")
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def format_timestamp(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+def make_passages(transcript, segments=None, passage_words=PASSAGE_WORDS):
+    """
+    [{"start", "end", "text"}] covering the episode. Whisper segments are
+    grouped whole; without segments the transcript is cut by word count and
+    the times are None.
+    """
+    passages = []
+    if segments:
+        group = []
+        for segment in segments:
+            group.append(segment)
+            if sum(len(item["text"].split()) for item in group) >= passage_words:
+                passages.append({"start": group[0]["start"], "end": group[-1]["end"],
+                                 "text": " ".join(item["text"] for item in group)})
+                group = []
+        if group:
+            passages.append({"start": group[0]["start"], "end": group[-1]["end"],
+                             "text": " ".join(item["text"] for item in group)})
+        return passages
+
+    words = transcript.split()
+    return [{"start": None, "end": None, "text": " ".join(words[start:start + passage_words])}
+            for start in range(0, len(words), passage_words)]
+
+
+class TranscriptIndex:
+    """
+    BM25 postings and optional embedding matrix over an episode's passages.
+    """
+
+    def __init__(self, passages, postings, lengths, embeddings=None, embedding_deployment=None, key=None):
+        self.passages = passages
+        self.postings = postings      # term -> [[passage, term frequency], ...]
+        self.lengths = lengths        # terms per passage
+        self.embeddings = embeddings  # (passages, dims) float16, rows normalized; or None
+        self.embedding_deployment = embedding_deployment
+        self.key = key
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, transcript, segments=None, embedding_deployment=EMBEDDING_DEPLOYMENT):
+        passages = make_passages(transcript, segments)
+        postings, lengths = {}, []
+        for number, passage in enumerate(passages):
+            terms = Counter(tokenize(passage["text"]))
+            lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                postings.setdefault(term, []).append([number, count])
+
+        embeddings = None
+        if embedding_deployment and passages:
+            import numpy as np
+            vectors = np.asarray(embed_texts([passage["text"] for passage in passages], embedding_deployment),
+                                 dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            embeddings = vectors.astype(np.float16)
+        return cls(passages, postings, lengths, embeddings, embedding_deployment or None)
+
+    def save(self, key, cache=None):
+        """
+        Store the index in the result cache under key.
+        """
+        cache = cache or get_cache()
+        embeddings_key = None
+        if self.embeddings is not None:
+            import numpy as np
+            embeddings_key = key + "-embeddings"
+            fd, tmp_path = tempfile.mkstemp(dir=cache.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, self.embeddings)
+            cache.put_file(embeddings_key, tmp_path, move=True)
+        cache.put_json(key, {"passages": self.passages, "postings": self.postings, "lengths": self.lengths,
+                             "embeddings": embeddings_key, "embedding_deployment": self.embedding_deployment})
+        self.key = key
+        return key
+
+    @classmethod
+    def load(cls, key, cache=None):
+        """
+        The index stored under key, or None if it is not (or no longer) cached.
+        """
+        cache = cache or get_cache()
+        data = cache.get_json(key)
+        if data is None:
+            return None
+        embeddings = None
+        if data["embeddings"]:
+            path = cache.get_path(data["embeddings"])
+            if path:
+                import numpy as np
+                embeddings = np.load(path, mmap_mode="r")
+        return cls(data["passages"], data["postings"], data["lengths"], embeddings,
+                   data["embedding_deployment"] if embeddings is not None else None, key)
+
+    def bm25(self, query):
+        """
+        {passage: BM25 score} for the passages matching any query term.
+        """
+        scores = {}
+        total = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[number] / (self.average_length or 1))
+                scores[number] = scores.get(number, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return scores
+
+    def similarity(self, query):
+        """
+        Cosine similarity of every passage to the query, or None without embeddings.
+        """
+        if self.embeddings is None:
+            return None
+        import numpy as np
+        try:
+            vector = np.asarray(embed_texts([query], self.embedding_deployment)[0], dtype=np.float32)
+        except Exception:
+            return None  # keyword ranking still works without the embeddings deployment
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        return np.asarray(self.embeddings, dtype=np.float32) @ vector
+
+    def search(self, query, top_k=QUERY_TOP_K):
+        """
+        The top_k passages for query, best first, each with its fused score.
+        """
+        rankings = []
+        keyword = self.bm25(query)
+        if keyword:
+            rankings.append(sorted(keyword, key=keyword.get, reverse=True))
+        semantic = self.similarity(query)
+        if semantic is not None:
+            rankings.append(sorted(range(len(self.passages)), key=lambda number: -semantic[number]))
+
+        fused = {}
+        for ranking in rankings:
+            for rank, number in enumerate(ranking):
+                fused[number] = fused.get(number, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return [{**self.passages[number], "passage": number, "score": round(fused[number], 5)} for number in best]
+
+
+def index_key(transcript, cache=None):
+    cache = cache or get_cache()
+    return cache.key("transcript_index", transcript=text_digest(transcript), passage_words=PASSAGE_WORDS,
+                     embeddings=EMBEDDING_DEPLOYMENT)
+
+
+def build_transcript_index(transcript, segments=None, cache=None):
+    """
+    Index the transcript (unless it already is) and return the index key.
+    """
+    cache = cache or get_cache()
+    key = index_key(transcript, cache)
+    if cache.get_path(key) is None:
+        TranscriptIndex.build(transcript, segments).save(key, cache)
+    return key
+
+
+def load_index(key, cache=None):
+    return TranscriptIndex.load(key, cache)
+
+
+def answer_question(index, question, top_k=QUERY_TOP_K):
+    """
+    Answer question from the index's top_k passages with one small chat request.
+    Returns {"answer", "passages", "prompt_tokens"}.
+    """
+    passages = index.search(question, top_k)
+    if not passages:
+        return {"answer": "The transcript does not mention anything matching this question.", "passages": [],
+                "prompt_tokens": 0}
+    # Excerpts in episode order read more naturally than in score order
+    excerpts = "\n\n".join(f"[{format_timestamp(passage['start'])}-{format_timestamp(passage['end'])}] "
+                           f"{passage['text']}" for passage in sorted(passages, key=lambda item: item["passage"]))
+    user_content = f"Transcript excerpts:\n\n{excerpts}\n\nQuestion: {question}"
+    answer = chat_completion(QUERY_PROMPT, user_content, QUERY_MAX_TOKENS)
+    metrics.REGISTRY.inc("podcast_index_queries_total")
+    return {"answer": answer.strip(), "passages": passages,
+            "prompt_tokens": count_tokens(QUERY_PROMPT) + count_tokens(user_content)}
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+
+# Per-session / per-job working directories.
+# Every upload, download and intermediate file lives in a workspace of its
+# own, so concurrent users never share paths. Workspaces are leased: using one
+# renews the lease, releasing it just marks it. A background sweeper removes
+# released and expired workspaces and enforces a disk quota, so no cleanup
+# (or retry sleep) ever happens in the request path.
+WORKSPACE_DIR = os.environ.get("PODCAST_WORKSPACE_DIR", os.path.join(".cache", "workspaces"))
+WORKSPACE_TTL = int(os.environ.get("PODCAST_WORKSPACE_TTL", 24 * 3600))                  # 1 day
+WORKSPACE_MAX_BYTES = int(os.environ.get("PODCAST_WORKSPACE_MAX_BYTES", 5 * 1024 ** 3))  # 5 GB
+GC_INTERVAL = int(os.environ.get("PODCAST_WORKSPACE_GC_INTERVAL", 300))                  # seconds
+SPOOL_BLOCK = 1024 * 1024  # uploads are copied to disk in blocks of this size
+
+_LEASE = ".lease"
+_RELEASED = ".released"
+_MANIFEST = "artifacts.json"
+
+
+class Workspace:
+    """
+    A private directory plus a manifest of the artifacts written into it.
+    """
+
+    def __init__(self, manager, name):
+        self.manager = manager
+        self.name = name
+        self.root = os.path.join(manager.root, name)
+        self._lock = threading.Lock()
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def new_file(self, suffix="", prefix="tmp"):
+        """
+        Path of a new, empty, uniquely named file in the workspace.
+        """
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self.root)
+        os.close(fd)
+        return path
+
+    def subdir(self, prefix="tmp"):
+        return tempfile.mkdtemp(prefix=prefix, dir=self.root)
+
+    def spool(self, kind, stream, suffix="", block_size=SPOOL_BLOCK):
+        """
+        Copy a file-like object to disk block by block, hashing it on the way,
+        and track it as kind. The file is named by its content hash, so spooling
+        the same content again reuses it. Returns (path, sha256 hex digest).
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.root)
+        try:
+            stream.seek(0)
+            with os.fdopen(fd, "wb") as f:
+                for block in iter(lambda: stream.read(block_size), b""):
+                    digest.update(block)
+                    f.write(block)
+            path = self.path(f"{kind}-{digest.hexdigest()[:16]}{suffix}")
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self.track(kind, path), digest.hexdigest()
+
+    def track(self, kind, path):
+        """
+        Record an artifact of the given kind (e.g. "upload") and return its path.
+        """
+        with self._lock:
+            artifacts = self.artifacts()
+            artifacts[kind] = os.path.abspath(path)
+            tmp_path = self.path(_MANIFEST + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(artifacts, f)
+            os.replace(tmp_path, self.path(_MANIFEST))
+        return path
+
+    def artifacts(self):
+        try:
+            with open(self.path(_MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def touch(self):
+        """
+        Renew the lease; the workspace expires WORKSPACE_TTL after the last touch.
+        """
+        with open(self.path(_LEASE), "a"):
+            pass
+        os.utime(self.path(_LEASE))
+
+    def release(self):
+        """
+        Mark the workspace for removal by the next sweep.
+        """
+        with open(self.path(_RELEASED), "a"):
+            pass
+
+
+class WorkspaceManager:
+    """
+    Creates workspaces under root and garbage-collects them in the background.
+    """
+
+    def __init__(self, root=WORKSPACE_DIR, ttl=WORKSPACE_TTL, max_bytes=WORKSPACE_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._pinned = Counter()
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, name=None):
+        """
+        Open (creating if needed) the workspace called name, or a fresh one.
+        """
+        workspace = Workspace(self, name or uuid.uuid4().hex)
+        os.makedirs(workspace.root, exist_ok=True)
+        try:
+            os.remove(workspace.path(_RELEASED))
+        except OSError:
+            pass
+        workspace.touch()
+        return workspace
+
+    def get(self, name):
+        """
+        The existing workspace called name, or None if it was collected.
+        """
+        workspace = Workspace(self, name)
+        if not os.path.isdir(workspace.root) or os.path.exists(workspace.path(_RELEASED)):
+            return None
+        return workspace
+
+    def pin(self, name):
+        # Pinned workspaces are in use by this process and never collected
+        with self._lock:
+            self._pinned[name] += 1
+
+    def unpin(self, name):
+        with self._lock:
+            self._pinned[name] -= 1
+            if self._pinned[name] <= 0:
+                del self._pinned[name]
+
+    def collect(self):
+        """
+        Remove released and expired workspaces, then the least recently used
+        ones until the total size is under max_bytes. Returns bytes freed.
+        """
+        now = time.time()
+        with self._lock:
+            pinned = set(self._pinned)
+        freed = 0
+        idle = []
+        for name in os.listdir(self.root):
+            root = os.path.join(self.root, name)
+            if name in pinned or not os.path.isdir(root):
+                continue
+            try:
+                last_used = os.stat(os.path.join(root, _LEASE)).st_mtime
+            except OSError:
+                last_used = os.stat(root).st_mtime
+            size = _tree_size(root)
+            if os.path.exists(os.path.join(root, _RELEASED)) or now - last_used > self.ttl:
+                freed += self._remove(root, size)
+            else:
+                idle.append((last_used, size, root))
+
+        total = sum(size for _, size, _ in idle) + sum(_tree_size(os.path.join(self.root, name)) for name in pinned)
+        for _, size, root in sorted(idle):
+            if total <= self.max_bytes:
+                break
+            freed += self._remove(root, size)
+            total -= size
+        return freed
+
+    def _remove(self, root, size):
+        shutil.rmtree(root, ignore_errors=True)
+        return size
+
+    def start_gc(self, interval=GC_INTERVAL):
+        """
+        Run collect() every interval seconds on a daemon thread (once per manager).
+        """
+        with self._lock:
+            if self._gc_thread is not None:
+                return
+            self._gc_thread = threading.Thread(target=self._gc_loop, args=(interval,), daemon=True,
+                                               name="workspace-gc")
+        self._gc_thread.start()
+
+    def _gc_loop(self, interval):
+        while True:
+            try:
+                self.collect()
+            except OSError:
+                pass  # a workspace vanished mid-sweep; try again next time
+            time.sleep(interval)
+
+
+def _tree_size(root):
+    total = 0
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                pass
+    return total
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_workspace_manager():
+    """
+    Process-wide workspace manager configured from PODCAST_WORKSPACE_*; starts the sweeper.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = WorkspaceManager()
+            _manager.start_gc()
+        return _manager